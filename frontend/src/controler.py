@@ -13,6 +13,8 @@ import traceback
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import threading
+import time
+import uuid
 
 # Pydantic models (moved from model_server.py)
 from pydantic import BaseModel, ConfigDict as PydanticConfigDict
@@ -26,7 +28,8 @@ print(f"System path: {sys.path}")
 
 try:
     print("Attempting to import from src.core.init_repo...")
-    from src.core.init_repo import init_repo, handle_zip_upload, get_cache
+    from src.core.init_repo import init_repo, process_zip_upload, get_cache
+    from src.core.index_store import get_index_store
     print("Successfully imported backend functions from src.core.init_repo")
 except Exception as general_e:
     print(f"An unexpected error occurred during import: {general_e}")
@@ -45,6 +48,12 @@ controller_logger = logging.getLogger(__name__)
 # Thread pool executor (moved from model_server.py)
 executor = ThreadPoolExecutor(max_workers=40)
 
+# Dedicated pool for background repository initializations, so that queued
+# ingestions never take threads from the request executor above
+init_executor = ThreadPoolExecutor(max_workers=int(os.getenv("CONTROLLER_INIT_WORKERS", "4")))
+init_jobs = {}
+init_jobs_lock = threading.Lock()
+
 # URL for Custom Documentalist (moved from model_server.py)
 custom_doc_url = "http://localhost:8001/score"
 
@@ -75,6 +84,18 @@ def add_repository_to_session(session_id, repo_name, cache_id, repo_link=None, i
             'is_local': is_local,
         }
 
+def refresh_repository_cache(session_id, repo_link):
+    """Callback for init_repo: switch a repository to the cache of its full index once background indexing finishes."""
+    repo_name = repo_link.split("/")[-1]
+
+    def on_refresh(cache_id):
+        with session_lock:
+            repo_info = repository_sessions.get(session_id, {}).get(repo_name)
+            if repo_info is not None:
+                repo_info['cache_id'] = cache_id
+        controller_logger.info(f"Repository '{repo_name}' fully indexed, cache_id: {cache_id}")
+    return on_refresh
+
 def remove_repository_from_session(session_id, repo_name):
     """Remove a repository from the session."""
     with session_lock:
@@ -83,6 +104,41 @@ def remove_repository_from_session(session_id, repo_name):
             return True
         return False
 
+def _run_init_job(job_id, repo_link, gemini_api_key, openai_api_key):
+    """Run init_repo for a background initialization job and record its outcome."""
+    with init_jobs_lock:
+        init_jobs[job_id]['status'] = 'running'
+        init_jobs[job_id]['started_at'] = time.time()
+    try:
+        repo_params, message = init_repo(
+            repo_link, gemini_api_key, openai_api_key, on_refresh=refresh_repository_cache(get_session_id(), repo_link)
+        )
+        controller_logger.info(f"init_repo returned for job {job_id}: {repo_params}, {message}")
+        if repo_params and repo_params.get('repo_name') and repo_params.get('cache_id'):
+            add_repository_to_session(get_session_id(), repo_params['repo_name'], repo_params['cache_id'], repo_link=repo_link)
+        outcome = {'status': 'succeeded', 'repo_params': repo_params, 'message': message}
+    except Exception as e:
+        controller_logger.error(f"Error in init job {job_id}: {str(e)}", exc_info=True)
+        outcome = {'status': 'failed', 'error': str(e)}
+    with init_jobs_lock:
+        init_jobs[job_id].update(outcome, finished_at=time.time())
+
+def submit_init_job(repo_link, gemini_api_key, openai_api_key):
+    """Queue a background initialization, reusing the active job of the same repository if any."""
+    with init_jobs_lock:
+        for job in init_jobs.values():
+            if job['repo_link'] == repo_link and job['status'] in ('queued', 'running'):
+                return job['job_id']
+        job_id = uuid.uuid4().hex
+        init_jobs[job_id] = {
+            'job_id': job_id,
+            'repo_link': repo_link,
+            'status': 'queued',
+            'created_at': time.time(),
+        }
+    init_executor.submit(_run_init_job, job_id, repo_link, gemini_api_key, openai_api_key)
+    return job_id
+
 # Pydantic models for request and response (moved from model_server.py)
 class GenerateRequestModel(BaseModel):
     message: str
@@ -128,12 +184,21 @@ def initialize_repo():
             openai_api_key = data.get('OPENAI_API_KEY', '')
             controller_logger.info(f"Received OPENAI_API_KEY: {openai_api_key[:5] + '...' if openai_api_key and len(openai_api_key) > 5 else openai_api_key} (length: {len(openai_api_key) if openai_api_key else 0})")
             
+            # With "async": true, answer right away with a job id to poll on /api/initialize/status/<job_id>
+            if data.get('async'):
+                job_id = submit_init_job(repo_link, gemini_api_key, openai_api_key)
+                controller_logger.info(f"Queued initialization job {job_id} for {repo_link}")
+                return jsonify({'job_id': job_id, 'status': init_jobs[job_id]['status']}), 202
+            
             controller_logger.info(f"Calling init_repo with {repo_link}")
-            repo_params, message = init_repo(repo_link, gemini_api_key, openai_api_key) # from src.core.init_repo
+            # Answers once the most important files are indexed, the cache is refreshed when all are
+            session_id = get_session_id()
+            repo_params, message = init_repo(
+                repo_link, gemini_api_key, openai_api_key, on_refresh=refresh_repository_cache(session_id, repo_link)
+            ) # from src.core.init_repo
             controller_logger.info(f"init_repo returned: {repo_params}, {message}")
             
             # Add to session
-            session_id = get_session_id()
             if repo_params and repo_params.get('repo_name') and repo_params.get('cache_id'):
                 add_repository_to_session(session_id, repo_params['repo_name'], repo_params['cache_id'], repo_link=repo_link)
             
@@ -155,6 +220,20 @@ def initialize_repo():
         controller_logger.error(f"Error in initialize_repo endpoint: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/initialize/status/<job_id>', methods=['GET', 'OPTIONS'])
+def initialize_status(job_id):
+    """Status of a background initialization, with the repository parameters once it succeeded"""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    
+    with init_jobs_lock:
+        job = dict(init_jobs[job_id]) if job_id in init_jobs else None
+    if job is None:
+        return jsonify({'error': f'Unknown initialization job {job_id}'}), 404
+    if job['status'] == 'succeeded':
+        job['all_repositories'] = get_repositories_for_session(get_session_id())
+    return jsonify(job)
+
 @app.route('/api/add_repo', methods=['POST', 'OPTIONS'])
 def add_repository():
     """Add an additional repository to the current session"""
@@ -180,12 +259,14 @@ def add_repository():
             
             openai_api_key = data.get('OPENAI_API_KEY', '')
             
-            # Process the repository
-            repo_params, message = init_repo(repo_link, gemini_api_key, openai_api_key)
+            # Process the repository, the cache is refreshed once all its files are indexed
+            session_id = get_session_id()
+            repo_params, message = init_repo(
+                repo_link, gemini_api_key, openai_api_key, on_refresh=refresh_repository_cache(session_id, repo_link)
+            )
             controller_logger.info(f"init_repo returned: {repo_params}, {message}")
             
             # Add to session
-            session_id = get_session_id()
             if repo_params and repo_params.get('repo_name') and repo_params.get('cache_id'):
                 add_repository_to_session(session_id, repo_params['repo_name'], repo_params['cache_id'], repo_link=repo_link)
             
@@ -272,18 +353,10 @@ def upload_repo():
             return jsonify({'error': 'File must be a zip archive'}), 400
         
         try:
-            temp_dir = tempfile.mkdtemp()
-            temp_path = os.path.join(temp_dir, secure_filename(file.filename))
-            file.save(temp_path)
-            
-            controller_logger.info(f"Saved uploaded file to {temp_path}")
-            
             gemini_api_key = os.getenv("GEMINI_API_KEY")
             
             # Validate that Gemini API key is available in the environment
             if not gemini_api_key or not gemini_api_key.strip():
-                if 'temp_dir' in locals() and os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
                 return jsonify({'error': 'GEMINI_API_KEY is not configured on the server. Please check the backend environment.'}), 500
             
             api_key_preview = gemini_api_key[:5] + "..." if gemini_api_key and len(gemini_api_key) > 5 else gemini_api_key
@@ -292,7 +365,10 @@ def upload_repo():
             openai_api_key = request.form.get('OPENAI_API_KEY', '')
             controller_logger.info(f"Received OPENAI_API_KEY for upload: {openai_api_key[:5] + '...' if openai_api_key and len(openai_api_key) > 5 else openai_api_key} (length: {len(openai_api_key) if openai_api_key else 0})")
             
-            repo_params, message = handle_zip_upload(temp_path, gemini_api_key, openai_api_key) # from src.core.init_repo
+            # The archive is read from the spooled upload, it is not saved again before ingestion
+            repo_params, message = process_zip_upload(
+                file.stream, gemini_api_key, openai_api_key, filename=secure_filename(file.filename)
+            ) # from src.core.init_repo
             
             controller_logger.info(f"handle_zip_upload yielded: {repo_params}, {message}")
             
@@ -304,8 +380,6 @@ def upload_repo():
             # Get all repositories for this session
             all_repositories = get_repositories_for_session(session_id)
             
-            shutil.rmtree(temp_dir)
-            
             return jsonify({
                 'repo_params': repo_params,
                 'message': message,
@@ -314,8 +388,6 @@ def upload_repo():
             
         except Exception as e:
             controller_logger.error(f"Error in handle_zip_upload call: {str(e)}", exc_info=True)
-            if 'temp_dir' in locals() and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
             return jsonify({'error': str(e)}), 500
             
     except Exception as e:
@@ -382,18 +454,12 @@ def generate_response():
                 "OPENAI_API_KEY": req_data.OPENAI_API_KEY,
             }
             
-            try:
-                # Load repository data
-                with open(f"/app/docstrings_json/{repo_name}.json", "r") as f:
-                    payload["documentation"] = json.load(f)
-                # Typo "ducomentations_json" matches original directory name
-                with open(f"/app/ducomentations_json/{repo_name}.json", "r") as f:
-                    payload["documentation_md"] = json.load(f)
-                with open(f"/app/configs_json/{repo_name}.json", "r") as f:
-                    payload["config"] = json.load(f)
-            except FileNotFoundError as fnf_error:
-                controller_logger.error(f"JSON file not found for repository {repo_name}: {fnf_error}")
-                raise Exception(f"Required JSON file not found for {repo_name}: {fnf_error.filename}") from fnf_error
+            # Load repository data
+            repository_index = get_index_store().export_json(repo_name)
+            if repository_index is None:
+                controller_logger.error(f"No index found for repository {repo_name}")
+                raise Exception(f"No index found for {repo_name}")
+            payload.update(repository_index)
             
             # Call the unified repo_chat service
             def post_to_repo_chat():
@@ -419,25 +485,17 @@ def generate_response():
             # Load data for each target repository
             for repo_name in target_repos:
                 cache_id = all_repositories[repo_name]['cache_id']
-                try:
-                    with open(f"/app/docstrings_json/{repo_name}.json", "r") as f:
-                        documentation = json.load(f)
-                    with open(f"/app/ducomentations_json/{repo_name}.json", "r") as f:
-                        documentation_md = json.load(f)
-                    with open(f"/app/configs_json/{repo_name}.json", "r") as f:
-                        config = json.load(f)
-                    
-                    payload["repository_data"][repo_name] = {
-                        "cache_id": cache_id,
-                        "documentation": documentation,
-                        "documentation_md": documentation_md,
-                        "config": config
-                    }
-                except FileNotFoundError as fnf_error:
-                    controller_logger.warning(f"JSON file not found for repository {repo_name}: {fnf_error}")
+                repository_index = get_index_store().export_json(repo_name)
+                if repository_index is None:
+                    controller_logger.warning(f"No index found for repository {repo_name}")
                     # Continue with other repositories
                     continue
 
+                payload["repository_data"][repo_name] = {
+                    "cache_id": cache_id,
+                    **repository_index,
+                }
+
             # Call the multi-repo endpoint
             multi_repo_url = "http://localhost:8001/multi_repo_score"
             
@@ -465,6 +523,7 @@ def generate_response():
                             "documentation": repo_data["documentation"],
                             "documentation_md": repo_data["documentation_md"],
                             "config": repo_data["config"],
+                            "symbols": repo_data.get("symbols", {}),
                             "GEMINI_API_KEY": req_data.GEMINI_API_KEY,
                             "ANTHROPIC_API_KEY": req_data.ANTHROPIC_API_KEY,
                             "OPENAI_API_KEY": req_data.OPENAI_API_KEY,
@@ -518,7 +577,7 @@ def check_and_recreate_cache_if_expired(repo_name, gemini_api_key):
             controller_logger.info(f"Cache for '{repo_name}' not found or expired. Recreating...")
             try:
                 if is_local:
-                    new_repo_params, message = handle_zip_upload(repo_link, gemini_api_key)
+                    new_repo_params, message = process_zip_upload(repo_link, gemini_api_key)
                 else:
                     new_repo_params, message = init_repo(repo_link, gemini_api_key)
                 
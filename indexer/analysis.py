@@ -0,0 +1,56 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.schemas.description import code_structure_context
+from .summary_cache import hash_content
+from .symbols import detect_language, extract_symbols, mask_comments_and_strings
+from .python_extractor import SymbolGap, extract_code_structure
+
+logger = logging.getLogger(__name__)
+
+# CPU-bound stages of summarization, run in the CPU pool (see src/core/cpu_pool.py):
+# module-level functions taking the file content and returning compact results.
+
+
+def digest_source(file_path: str, file_content: str, log_name: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Content hash of a file and, for source files, its symbol table.
+
+    Both are needed before the summary cache lookup.
+
+    Returns:
+        tuple: (content hash, symbol table or None)
+    """
+    symbols = extract_symbols(file_path, file_content) if log_name == "docstring" else None
+    return hash_content(file_content), symbols
+
+
+def analyze_source(
+    file_path: str,
+    file_content: str,
+    is_python: bool,
+    has_symbols: bool,
+) -> Tuple[Optional[Tuple[Dict[str, Any], List[SymbolGap]]], Optional[Dict[str, Any]]]:
+    """
+    Parse a source file whose summary is not cached.
+
+    Python files are extracted from their AST. The others, and Python files that
+    do not parse, get the validation context of their CodeStructure, built from
+    the code without comments and strings when the language is known.
+
+    Args:
+        is_python (bool): Try the AST extraction first
+        has_symbols (bool): Whether the language of the file is supported by the symbol extractors
+
+    Returns:
+        tuple: ((structure, gaps) or None, validation context or None)
+    """
+    if is_python:
+        try:
+            return extract_code_structure(file_content), None
+        except (SyntaxError, ValueError):
+            pass
+    code_text = file_content
+    if has_symbols:
+        code_text = mask_comments_and_strings(file_content, detect_language(file_path))
+    return None, code_structure_context(code_text)
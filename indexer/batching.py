@@ -0,0 +1,213 @@
+import os
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio, used to size prompts without shipping a tokenizer per provider
+CHARS_PER_TOKEN = 4
+
+# Target prompt + completion tokens per classification request
+DEFAULT_CLASSIFICATION_TOKEN_BUDGET = int(os.getenv("CLASSIFICATION_TOKEN_BUDGET", "6000"))
+
+# Completion tokens the models are allowed to produce (see max_output_tokens in service.py)
+MAX_OUTPUT_TOKENS = 8000
+
+# Tokens of the JSON wrapper the model writes around each file ({"file_id": .., "classification": ..})
+OUTPUT_TOKENS_PER_FILE = 20
+
+# Files up to this size are summarized several per request
+SUMMARY_PACK_MAX_FILE_CHARS = int(os.getenv("SUMMARY_PACK_MAX_FILE_CHARS", "3000"))
+
+# Prompt tokens of the files of one packed summary request
+SUMMARY_PACK_TOKEN_BUDGET = int(os.getenv("SUMMARY_PACK_TOKEN_BUDGET", "6000"))
+
+# Files per packed summary request, each summary takes a share of the completion tokens
+SUMMARY_PACK_MAX_FILES = int(os.getenv("SUMMARY_PACK_MAX_FILES", "8"))
+
+# Never shrink a budget below this fraction of its configured value
+MIN_BUDGET_FACTOR = 0.25
+
+# Weight of the latest outcome in the failure rate moving average
+FAILURE_RATE_ALPHA = 0.2
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text from its length."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def parse_model_budgets(value: str) -> Dict[str, int]:
+    """
+    Parse per-model budgets written as "model_a=8000,model_b=4000".
+
+    Args:
+        value (str): Content of the CLASSIFICATION_TOKEN_BUDGETS environment variable
+
+    Returns:
+        dict: Token budget per model name
+    """
+    budgets = {}
+    for item in value.split(","):
+        model_name, _, budget = item.strip().partition("=")
+        if model_name and budget.strip().isdigit():
+            budgets[model_name.strip()] = int(budget)
+    return budgets
+
+
+def pack_small_files(
+    file_sizes: List[Tuple[str, int]],
+    token_budget: int = SUMMARY_PACK_TOKEN_BUDGET,
+    max_files: int = SUMMARY_PACK_MAX_FILES,
+) -> List[List[str]]:
+    """
+    Greedily group small files into packed summary requests.
+
+    Args:
+        file_sizes (list): (file path, size in characters) of the candidate files
+        token_budget (int): Prompt tokens of the files of one pack
+        max_files (int): Files per pack
+
+    Returns:
+        list: Packs of file paths, in the order of file_sizes
+    """
+    packs: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for file_path, size in file_sizes:
+        tokens = size // CHARS_PER_TOKEN + 1
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_files):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(file_path)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+class ClassificationBatchPacker:
+    """
+    Packs files into classification batches sized by a token budget per model.
+
+    The budget of a model shrinks with its observed validation failure rate, so
+    models that drop files on large batches get smaller ones, and grows back as
+    their batches validate again.
+    """
+
+    def __init__(
+        self,
+        default_budget: int = DEFAULT_CLASSIFICATION_TOKEN_BUDGET,
+        model_budgets: Optional[Dict[str, int]] = None,
+    ):
+        self.default_budget = default_budget
+        self.model_budgets = model_budgets if model_budgets is not None else parse_model_budgets(
+            os.getenv("CLASSIFICATION_TOKEN_BUDGETS", "")
+        )
+        self._lock = threading.Lock()
+        self._failure_rates: Dict[str, float] = {}
+        self._outcomes: Dict[str, Dict[str, int]] = {}
+        self.last_layout: List[Dict[str, Any]] = []
+
+    def budget_for(self, model_name: str) -> int:
+        """Current token budget of a model, after the failure rate adjustment."""
+        budget = self.model_budgets.get(model_name, self.default_budget)
+        with self._lock:
+            failure_rate = self._failure_rates.get(model_name, 0.0)
+        return max(int(budget * max(MIN_BUDGET_FACTOR, 1.0 - failure_rate)), 1)
+
+    def record(self, model_name: str, success: bool) -> None:
+        """Record whether a batch sent to model_name passed the classification validator."""
+        with self._lock:
+            previous = self._failure_rates.get(model_name, 0.0)
+            outcome = 0.0 if success else 1.0
+            self._failure_rates[model_name] = (1 - FAILURE_RATE_ALPHA) * previous + FAILURE_RATE_ALPHA * outcome
+            counters = self._outcomes.setdefault(model_name, {"success": 0, "failure": 0})
+            counters["success" if success else "failure"] += 1
+
+    def pack(
+        self, file_names: List[Dict], model_names: List[str], base_prompt: str = ""
+    ) -> List[Tuple[List[Dict], int]]:
+        """
+        Greedily fill batches up to the token budget of the model they are assigned to.
+
+        Models are assigned round robin, like the fixed-size batching this replaces.
+
+        Args:
+            file_names (list): Files to classify ({'file_name', 'file_id'})
+            model_names (list): Names of the available models, by client index
+            base_prompt (str): System + user prompt sent with every batch
+
+        Returns:
+            list: (batch, client_index) pairs
+        """
+        base_tokens = estimate_tokens(base_prompt)
+        output_budget = int(MAX_OUTPUT_TOKENS * 0.8)
+
+        batches = []
+        current: List[Dict] = []
+        current_tokens = base_tokens
+        current_output = 0
+        client_index = 0
+        budget = self.budget_for(model_names[client_index])
+
+        for file_info in file_names:
+            item_tokens = estimate_tokens(str(file_info))
+            item_output = item_tokens + OUTPUT_TOKENS_PER_FILE
+            if current and (
+                current_tokens + item_tokens + current_output + item_output > budget
+                or current_output + item_output > output_budget
+            ):
+                batches.append((current, client_index, current_tokens + current_output))
+                client_index = len(batches) % len(model_names)
+                budget = self.budget_for(model_names[client_index])
+                current, current_tokens, current_output = [], base_tokens, 0
+            current.append(file_info)
+            current_tokens += item_tokens
+            current_output += item_output
+
+        if current:
+            batches.append((current, client_index, current_tokens + current_output))
+
+        layout = [
+            {"model": model_names[index], "files": len(batch), "estimated_tokens": tokens}
+            for batch, index, tokens in batches
+        ]
+        with self._lock:
+            self.last_layout = layout
+        logger.info(
+            f"Packed {len(file_names)} files into {len(batches)} classification batches: "
+            + ", ".join(f"{item['model']}:{item['files']} files/{item['estimated_tokens']} tok" for item in layout)
+        )
+
+        return [(batch, index) for batch, index, _ in batches]
+
+    def stats(self) -> Dict[str, Any]:
+        """Budgets, failure rates and last batch layout, for monitoring."""
+        with self._lock:
+            models = {
+                model_name: {
+                    "failure_rate": round(self._failure_rates.get(model_name, 0.0), 3),
+                    **self._outcomes.get(model_name, {}),
+                }
+                for model_name in set(self._failure_rates) | set(self.model_budgets)
+            }
+            last_layout = list(self.last_layout)
+        for model_name in models:
+            models[model_name]["budget"] = self.budget_for(model_name)
+        return {"default_budget": self.default_budget, "models": models, "last_layout": last_layout}
+
+
+# Module-level singleton, so failure rates are learned across indexing jobs
+_batch_packer: Optional[ClassificationBatchPacker] = None
+_batch_packer_lock = threading.Lock()
+
+
+def get_batch_packer() -> ClassificationBatchPacker:
+    """Initialize and return the process-wide classification batch packer."""
+    global _batch_packer
+    with _batch_packer_lock:
+        if _batch_packer is None:
+            _batch_packer = ClassificationBatchPacker()
+    return _batch_packer
@@ -0,0 +1,192 @@
+import os
+import re
+import ast
+from typing import Any, Dict, List
+
+# Source files above this size are summarized in chunks instead of one prompt
+CHUNK_THRESHOLD_CHARS = int(os.getenv("SUMMARY_CHUNK_THRESHOLD_CHARS", "24000"))
+
+# Target size of each chunk
+CHUNK_TARGET_CHARS = int(os.getenv("SUMMARY_CHUNK_TARGET_CHARS", "12000"))
+
+# Source files above this size are summarized from their symbol outline alone, not chunk by chunk
+SKELETON_ONLY_THRESHOLD_CHARS = int(os.getenv("SUMMARY_SKELETON_ONLY_THRESHOLD_CHARS", "200000"))
+
+
+# A line as numbered by the Python tokenizer: unlike str.splitlines, it only breaks on \r\n, \r and \n
+_SOURCE_LINE = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+\Z")
+
+
+def _source_lines(content: str) -> List[str]:
+    """Lines of content, newlines kept, numbered like the lineno of its AST nodes."""
+    return _SOURCE_LINE.findall(content)
+
+
+def _group_segments(segments: List[str], target_chars: int) -> List[str]:
+    """Concatenate consecutive segments into chunks of at most target_chars (unless a segment is bigger)."""
+    chunks = []
+    current = ""
+    for segment in segments:
+        if current and len(current) + len(segment) > target_chars:
+            chunks.append(current)
+            current = ""
+        current += segment
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_lines_at(lines: List[str], starts: List[int]) -> List[str]:
+    """Cut lines into segments starting at the given 0-based line indexes."""
+    starts = sorted(set([0] + [start for start in starts if 0 < start < len(lines)]))
+    bounds = starts + [len(lines)]
+    return ["".join(lines[bounds[i] : bounds[i + 1]]) for i in range(len(starts))]
+
+
+def _node_start(node: ast.AST) -> int:
+    """0-based first line of a node, decorators included."""
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [decorator.lineno for decorator in decorators]) - 1
+
+
+def split_python_source(content: str, target_chars: int = CHUNK_TARGET_CHARS) -> List[str]:
+    """
+    Split Python source on top-level class and function boundaries.
+
+    Classes bigger than target_chars are split on their method boundaries; each
+    part is prefixed with the class header so the model keeps the class context.
+
+    Raises:
+        SyntaxError: If the content is not valid Python
+    """
+    tree = ast.parse(content)
+    lines = _source_lines(content)
+
+    segments = _split_lines_at(lines, [_node_start(node) for node in tree.body])
+
+    # Split oversized classes on their methods
+    classes_by_start = {
+        _node_start(node): node for node in tree.body if isinstance(node, ast.ClassDef) and node.body
+    }
+    result_segments = []
+    line_index = 0
+    for segment in segments:
+        segment_line_count = len(_source_lines(segment))
+        class_node = classes_by_start.get(line_index)
+        if class_node is not None and len(segment) > target_chars:
+            body_start = _node_start(class_node.body[0])
+            header = "".join(lines[line_index:body_start])
+            class_lines = lines[body_start : line_index + segment_line_count]
+            method_starts = [_node_start(child) - body_start for child in class_node.body]
+            for part in _group_segments(_split_lines_at(class_lines, method_starts), target_chars):
+                result_segments.append(header + part)
+        else:
+            result_segments.append(segment)
+        line_index += segment_line_count
+
+    return _group_segments(result_segments, target_chars)
+
+
+def split_generic_source(content: str, target_chars: int = CHUNK_TARGET_CHARS) -> List[str]:
+    """
+    Split non-Python source on top-level block boundaries.
+
+    Brace languages are cut after lines that bring the brace depth back to zero;
+    other files are cut before non-indented lines. Strings and comments are not
+    parsed, which is fine for choosing cut points.
+    """
+    lines = content.splitlines(keepends=True)
+    starts = []
+
+    if "{" in content:
+        depth = 0
+        for index, line in enumerate(lines):
+            depth += line.count("{") - line.count("}")
+            if depth <= 0 and ("}" in line or line.rstrip().endswith(";")):
+                depth = 0
+                starts.append(index + 1)
+    else:
+        for index, line in enumerate(lines):
+            if line.strip() and not line[0].isspace():
+                starts.append(index)
+
+    segments = _split_lines_at(lines, starts)
+
+    # Hard split segments that have no usable boundary
+    bounded_segments = []
+    for segment in segments:
+        if len(segment) <= target_chars:
+            bounded_segments.append(segment)
+            continue
+        segment_lines = segment.splitlines(keepends=True)
+        bounded_segments.extend(_group_segments(segment_lines, target_chars))
+
+    return _group_segments(bounded_segments, target_chars)
+
+
+def split_source(file_path: str, content: str, target_chars: int = CHUNK_TARGET_CHARS) -> List[str]:
+    """
+    Split a source file into chunks on class/function boundaries.
+
+    Args:
+        file_path (str): Path of the file, used to pick the splitting strategy
+        content (str): Content of the file
+        target_chars (int): Target size of each chunk
+
+    Returns:
+        list: Chunks covering the whole content, in order
+    """
+    if file_path.endswith(".py"):
+        try:
+            return split_python_source(content, target_chars)
+        except SyntaxError:
+            pass
+    return split_generic_source(content, target_chars)
+
+
+def _merge_named(items: List[Dict[str, Any]], name_key: str) -> List[Dict[str, Any]]:
+    merged = {}
+    for item in items:
+        merged.setdefault(item[name_key], item)
+    return list(merged.values())
+
+
+def merge_code_structures(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge the CodeStructure results of the chunks of a file into one result.
+
+    Classes split across chunks are merged by name, their attributes and methods
+    deduplicated by name.
+    """
+    descriptions = []
+    functions = []
+    classes: Dict[str, Dict[str, Any]] = {}
+
+    for part in parts:
+        description = (part.get("global_code_description") or "").strip()
+        if description and description not in descriptions:
+            descriptions.append(description)
+        functions.extend(part.get("functions_out_class") or [])
+        for class_info in part.get("classes") or []:
+            existing = classes.get(class_info["class_name"])
+            if existing is None:
+                classes[class_info["class_name"]] = {
+                    **class_info,
+                    "attributes": list(class_info.get("attributes") or []),
+                    "functions_in_class": list(class_info.get("functions_in_class") or []),
+                }
+                continue
+            if not existing.get("class_description"):
+                existing["class_description"] = class_info.get("class_description", "")
+            existing["attributes"] = _merge_named(
+                existing["attributes"] + list(class_info.get("attributes") or []), "attribute_name"
+            )
+            existing["functions_in_class"] = _merge_named(
+                existing["functions_in_class"] + list(class_info.get("functions_in_class") or []), "function_name"
+            )
+
+    return {
+        "global_code_description": " ".join(descriptions),
+        "functions_out_class": _merge_named(functions, "function_name"),
+        "classes": list(classes.values()),
+    }
@@ -0,0 +1,281 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Window bounds of every model, in concurrent requests
+INITIAL_CONCURRENCY = float(os.getenv("LLM_CONCURRENCY_INITIAL", "8"))
+MIN_CONCURRENCY = float(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+MAX_CONCURRENCY = float(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+
+# Multiplicative decrease applied on throttling, and on a latency or error rate degradation
+THROTTLE_DECREASE = 0.5
+DEGRADATION_DECREASE = 0.9
+
+# Latency EWMA above this multiple of the best EWMA observed counts as degraded
+LATENCY_TOLERANCE = float(os.getenv("LLM_LATENCY_TOLERANCE", "2.0"))
+
+# Error rate EWMA above which the window shrinks even without throttling
+ERROR_RATE_THRESHOLD = 0.2
+
+# Weight of the latest request in the latency / error rate moving averages
+EWMA_ALPHA = 0.1
+
+# Retry-After values are capped, a misbehaving hint should not stall a whole job
+MAX_RETRY_AFTER = 60.0
+
+_RETRY_IN_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry after ([\d.]+)", re.IGNORECASE),
+]
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    for attribute in ("status_code", "code", "http_status"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """Whether an SDK exception means the provider is rate limiting or overloaded."""
+    if _status_code(error) in (429, 503, 529):
+        return True
+    name = type(error).__name__
+    if name in ("RateLimitError", "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "OverloadedError"):
+        return True
+    return "429" in str(error) or "quota" in str(error).lower()
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Extract the server retry hint of an SDK exception.
+
+    Reads the Retry-After header of OpenAI / Anthropic errors, and the retry delay
+    Gemini writes in the error message.
+
+    Returns:
+        Optional[float]: Seconds to wait, None if the error carries no hint
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        for header in ("retry-after-ms", "retry-after"):
+            value = headers.get(header)
+            if value is None:
+                continue
+            try:
+                seconds = float(value) / (1000.0 if header.endswith("-ms") else 1.0)
+            except ValueError:
+                continue
+            return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+    message = str(error)
+    for pattern in _RETRY_IN_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return min(float(match.group(1)), MAX_RETRY_AFTER)
+    return None
+
+
+def backoff_delay(attempt: int, initial_delay: float = 1.0, retry_after: Optional[float] = None) -> float:
+    """
+    Full-jitter exponential backoff, never shorter than the server retry hint.
+
+    Args:
+        attempt (int): 1-based number of the failed attempt
+        initial_delay (float): Base delay of the first retry
+        retry_after (float): Server retry hint, if any
+    """
+    delay = random.uniform(0, initial_delay * (2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, initial_delay))
+    return delay
+
+
+class ModelLimiter:
+    """
+    AIMD concurrency window of one model.
+
+    The window grows by one request per window of successful requests while the
+    latency and error rate stay healthy, is multiplied by THROTTLE_DECREASE on
+    throttling (at most once per round trip, so a burst of 429s from one window
+    counts once) and by DEGRADATION_DECREASE when latency or errors degrade.
+    A Retry-After hint pauses new requests to the model until it expires.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        initial: float = INITIAL_CONCURRENCY,
+        minimum: float = MIN_CONCURRENCY,
+        maximum: float = MAX_CONCURRENCY,
+    ):
+        self.model_name = model_name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(initial, minimum), maximum)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.best_latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.last_decrease = 0.0
+        self.counters = {"success": 0, "throttled": 0, "error": 0, "cancelled": 0}
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created lazily so that it binds to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                try:
+                    await asyncio.wait_for(condition.wait(), timeout=wait if wait > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, latency: float, outcome: str, retry_after: Optional[float] = None) -> None:
+        """
+        Free a slot and adapt the window.
+
+        Args:
+            latency (float): Duration of the request in seconds
+            outcome (str): "success", "throttled", "error" or "cancelled"
+            retry_after (float): Server retry hint of a throttled request
+        """
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            self.counters[outcome] += 1
+            if outcome != "cancelled":
+                self._adapt(latency, outcome, retry_after)
+            condition.notify_all()
+
+    def _decrease(self, factor: float, latency: float, reason: str) -> None:
+        now = time.monotonic()
+        # One decrease per round trip: requests already in flight saw the same conditions
+        if now - self.last_decrease < max(latency, 1.0):
+            return
+        previous = self.limit
+        self.limit = max(self.minimum, self.limit * factor)
+        self.last_decrease = now
+        logger.info(f"Concurrency of {self.model_name} reduced {previous:.1f} -> {self.limit:.1f} ({reason})")
+
+    def _adapt(self, latency: float, outcome: str, retry_after: Optional[float]) -> None:
+        self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA * (outcome != "success")
+
+        if outcome == "throttled":
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self._decrease(THROTTLE_DECREASE, latency, "throttled")
+            return
+
+        if outcome == "success":
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma = (1 - EWMA_ALPHA) * self.latency_ewma + EWMA_ALPHA * latency
+            if self.best_latency_ewma is None or self.latency_ewma < self.best_latency_ewma:
+                self.best_latency_ewma = self.latency_ewma
+
+        if self.error_rate > ERROR_RATE_THRESHOLD:
+            self._decrease(DEGRADATION_DECREASE, latency, f"error rate {self.error_rate:.2f}")
+        elif self.latency_ewma and self.best_latency_ewma and self.latency_ewma > LATENCY_TOLERANCE * self.best_latency_ewma:
+            self._decrease(DEGRADATION_DECREASE, latency, f"latency {self.latency_ewma:.2f}s")
+        elif outcome == "success" and self.in_flight + 1 >= int(self.limit):
+            # Additive increase, only when the window is actually used
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            **self.counters,
+        }
+
+
+class ConcurrencyGovernor:
+    """
+    Process-wide registry of per-model limiters, shared by all indexing jobs so
+    that concurrent jobs on the same key split the quota instead of each
+    assuming it owns it.
+    """
+
+    def __init__(self):
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, model_name: str) -> ModelLimiter:
+        with self._lock:
+            if model_name not in self._limiters:
+                self._limiters[model_name] = ModelLimiter(model_name)
+            return self._limiters[model_name]
+
+    @asynccontextmanager
+    async def slot(self, model_name: str):
+        """
+        Hold a concurrency slot of model_name for the duration of one request.
+
+        Exceptions raised in the block are classified (throttling or error), fed to
+        the limiter with their Retry-After hint, and re-raised.
+        """
+        limiter = self.limiter(model_name)
+        await limiter.acquire()
+        start = time.monotonic()
+        outcome, retry_after = "success", None
+        try:
+            yield limiter
+        except asyncio.CancelledError:
+            # Cancelled by the caller (e.g. the loser of a hedged request), says nothing about the model
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            if is_throttling_error(e):
+                outcome, retry_after = "throttled", retry_after_seconds(e)
+            else:
+                outcome = "error"
+            raise
+        finally:
+            await limiter.release(time.monotonic() - start, outcome, retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {model_name: limiter.stats() for model_name, limiter in limiters.items()}
+
+
+# Module-level singleton shared by all indexing jobs of the process
+_concurrency_governor: Optional[ConcurrencyGovernor] = None
+_concurrency_governor_lock = threading.Lock()
+
+
+def get_concurrency_governor() -> ConcurrencyGovernor:
+    """Initialize and return the process-wide concurrency governor."""
+    global _concurrency_governor
+    with _concurrency_governor_lock:
+        if _concurrency_governor is None:
+            _concurrency_governor = ConcurrencyGovernor()
+    return _concurrency_governor
@@ -0,0 +1,89 @@
+import os
+import re
+import hashlib
+import logging
+import functools
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from src.core.cpu_pool import get_cpu_pool
+
+logger = logging.getLogger(__name__)
+
+# Also treat as copies the files that only differ by whitespace or by their leading license header
+INDEXER_NEAR_DUPLICATES = os.getenv("INDEXER_NEAR_DUPLICATES", "false").lower() == "true"
+
+# A leading comment block is a license header when it mentions one of these
+_LICENSE_MARKERS = re.compile(r"licen[cs]e|copyright|spdx-license-identifier|\(c\)", re.IGNORECASE)
+
+# Leading comment blocks: runs of #, //, -- or ; lines, or a /* ... */ block
+_LEADING_COMMENT = re.compile(
+    r"\A\s*(?:(?:(?:#|//|--|;)[^\n]*\n\s*)+|/\*.*?\*/\s*)",
+    re.DOTALL,
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_for_dedup(content: str) -> str:
+    """
+    Content of a file with its leading license header removed and whitespace collapsed.
+
+    A shebang line is kept out of the header detection, and only comment blocks
+    mentioning a license or copyright are removed.
+    """
+    if content.startswith("#!"):
+        content = content.split("\n", 1)[1] if "\n" in content else ""
+    while True:
+        match = _LEADING_COMMENT.match(content)
+        if match is None or not _LICENSE_MARKERS.search(match.group(0)):
+            break
+        content = content[match.end():]
+    return _WHITESPACE.sub(" ", content).strip()
+
+
+def _content_key(file_path: str, near_duplicates: bool) -> Optional[str]:
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if near_duplicates:
+        data = normalize_for_dedup(data.decode("utf-8", errors="replace")).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def find_duplicates(
+    files: List[Tuple[str, str]],
+    near_duplicates: bool = INDEXER_NEAR_DUPLICATES,
+) -> Dict[str, str]:
+    """
+    Find the files whose content is a copy of an earlier file of the same category.
+
+    Args:
+        files (list): (file path, summary category) pairs, in processing order
+        near_duplicates (bool): Compare normalized content (see normalize_for_dedup) instead of bytes
+
+    Returns:
+        dict: Representative file path by duplicate file path; the first file of
+        each group is its representative and is not a key
+    """
+    # Files are read and hashed by the CPU pool workers, in chunks
+    keys = get_cpu_pool().map(
+        functools.partial(_content_key, near_duplicates=near_duplicates), [file_path for file_path, _ in files]
+    )
+    groups: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+    for (file_path, category), key in zip(files, keys):
+        if key is not None:
+            groups[(category, key)].append(file_path)
+
+    duplicates = {}
+    for paths in groups.values():
+        for file_path in paths[1:]:
+            duplicates[file_path] = paths[0]
+    if duplicates:
+        logger.info(
+            f"{len(duplicates)} of {len(files)} files are copies of another file, "
+            f"{sum(len(paths) > 1 for paths in groups.values())} unique contents summarized once"
+        )
+    return duplicates
@@ -0,0 +1,389 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .utils import ignore_list, has_file_extension
+
+# Entries of ignore_list that are only meaningful as part of a longer name
+NAME_ALIASES = {"pycache": "__pycache__"}
+
+# Extra names that were historically skipped by the substring matching of list_all_files
+EXTRA_IGNORED_NAMES = ["env_arxflix", ".gitattributes", ".gitmodules"]
+
+# Ignore list entries lifted by include_md
+MD_AND_YAML_PATTERNS = {".md", ".yaml", ".yml"}
+
+# Files holding the ignore rules of a repository, read by the discovery even though their names are ignored
+RULE_FILES = (".gitignore", ".gitattributes")
+
+# .gitattributes attributes marking files that are not worth indexing
+SKIPPED_ATTRIBUTES = {"binary", "linguist-generated", "linguist-vendored"}
+
+
+@dataclass
+class DiscoveryConfig:
+    """
+    Per-call configuration of the file discovery.
+
+    ignore_patterns follows the ignore_list conventions: entries starting with
+    "." or "~" match name suffixes (extensions, .git, .egg-info...), other
+    entries match a whole file or directory name.
+    """
+
+    ignore_patterns: List[str] = field(default_factory=lambda: list(ignore_list) + EXTRA_IGNORED_NAMES)
+    respect_gitignore: bool = True
+    respect_gitattributes: bool = True
+    require_extension: bool = True
+
+    @classmethod
+    def for_listing(cls, include_md: bool, **kwargs) -> "DiscoveryConfig":
+        """Build the configuration used by list_all_files without touching the global ignore_list."""
+        config = cls(**kwargs)
+        if include_md:
+            config.ignore_patterns = [
+                pattern for pattern in config.ignore_patterns if pattern not in MD_AND_YAML_PATTERNS
+            ]
+        return config
+
+
+class NameMatcher:
+    """
+    Compiled form of an ignore list, matching a single path component in O(1) + one endswith call.
+    """
+
+    def __init__(self, patterns: List[str]):
+        names = set()
+        suffixes = set()
+        for pattern in patterns:
+            pattern = NAME_ALIASES.get(pattern, pattern)
+            if pattern.startswith((".", "~")):
+                suffixes.add(pattern)
+            else:
+                names.add(pattern)
+        self.names = frozenset(names)
+        self.suffixes = tuple(sorted(suffixes))
+
+    def matches(self, name: str) -> bool:
+        return name in self.names or name.endswith(self.suffixes)
+
+
+def translate_git_pattern(pattern: str) -> Tuple[str, bool]:
+    """
+    Translate a .gitignore / .gitattributes glob into a regular expression.
+
+    Args:
+        pattern (str): Glob without negation prefix nor trailing slash
+
+    Returns:
+        tuple: (regex source matched against the path relative to the ignore file directory,
+                whether the pattern is anchored to that directory)
+    """
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    regex = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            regex.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            regex.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            regex.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                regex.append(re.escape("["))
+                i += 1
+                continue
+            content = pattern[i + 1 : end]
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            regex.append("[" + content.replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < n:
+            regex.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            regex.append(re.escape(pattern[i]))
+            i += 1
+
+    return "".join(regex), anchored
+
+
+def _compile_git_pattern(pattern: str) -> "re.Pattern":
+    regex, anchored = translate_git_pattern(pattern)
+    prefix = "" if anchored else "(?:.*/)?"
+    return re.compile(prefix + regex + "$")
+
+
+class GitIgnoreFile:
+    """
+    Rules of one .gitignore file. Paths are matched relative to the directory holding the file.
+    """
+
+    def __init__(self, base: str, lines: List[str]):
+        self.base = base
+        self.rules = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip("\r")
+            if not line.strip() or line.startswith("#"):
+                continue
+            # Trailing spaces are ignored unless escaped
+            if not line.endswith("\\ "):
+                line = line.rstrip(" ")
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            self.rules.append((_compile_git_pattern(line), negate, dir_only))
+
+        # Fast rejection: a single alternation telling whether any rule can match
+        self.any_rule = re.compile("|".join(f"(?:{rule.pattern})" for rule, _, _ in self.rules)) if self.rules else None
+
+    @classmethod
+    def load(cls, directory: str, base: str) -> Optional["GitIgnoreFile"]:
+        path = os.path.join(directory, ".gitignore")
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                ignore_file = cls(base, f.readlines())
+        except OSError:
+            return None
+        return ignore_file if ignore_file.rules else None
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Returns:
+            Optional[bool]: True if ignored, False if explicitly re-included, None if no rule applies
+        """
+        if self.base:
+            if not relative_path.startswith(self.base + "/"):
+                return None
+            relative_path = relative_path[len(self.base) + 1 :]
+        if self.any_rule is None or not self.any_rule.match(relative_path):
+            return None
+
+        result = None
+        for rule, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if rule.match(relative_path):
+                result = not negate
+        return result
+
+
+class GitAttributesFile:
+    """
+    Patterns of one .gitattributes file that set or unset SKIPPED_ATTRIBUTES.
+    """
+
+    def __init__(self, base: str, lines: List[str]):
+        self.base = base
+        self.rules = []
+        for line in lines:
+            parts = line.strip().split()
+            if len(parts) < 2 or parts[0].startswith("#"):
+                continue
+            state = None
+            for attribute in parts[1:]:
+                name, _, value = attribute.partition("=")
+                if name.startswith(("-", "!")) and name[1:] in SKIPPED_ATTRIBUTES:
+                    state = False
+                elif name in SKIPPED_ATTRIBUTES:
+                    state = value.lower() not in ("false", "0")
+            if state is not None:
+                self.rules.append((_compile_git_pattern(parts[0].rstrip("/")), state))
+
+    @classmethod
+    def load(cls, directory: str, base: str) -> Optional["GitAttributesFile"]:
+        path = os.path.join(directory, ".gitattributes")
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                attributes_file = cls(base, f.readlines())
+        except OSError:
+            return None
+        return attributes_file if attributes_file.rules else None
+
+    def match(self, relative_path: str) -> Optional[bool]:
+        if self.base:
+            if not relative_path.startswith(self.base + "/"):
+                return None
+            relative_path = relative_path[len(self.base) + 1 :]
+        result = None
+        for rule, state in self.rules:
+            if rule.match(relative_path):
+                result = state
+        return result
+
+
+def _is_git_ignored(ignore_files: List[GitIgnoreFile], relative_path: str, is_dir: bool) -> bool:
+    ignored = False
+    for ignore_file in ignore_files:
+        result = ignore_file.match(relative_path, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+
+def _is_skipped_by_attributes(attributes_files: List[GitAttributesFile], relative_path: str) -> bool:
+    skipped = False
+    for attributes_file in attributes_files:
+        result = attributes_file.match(relative_path)
+        if result is not None:
+            skipped = result
+    return skipped
+
+
+def iter_files(folder_path: str, config: Optional[DiscoveryConfig] = None) -> Iterator[str]:
+    """
+    Stream the indexable files of a folder.
+
+    Directories are pruned before descending, using the compiled ignore list and
+    the .gitignore files found along the way. Files flagged binary, generated or
+    vendored in .gitattributes are skipped. Entries are visited in sorted order so
+    that two scans of the same tree yield the same sequence.
+
+    Args:
+        folder_path (str): Root folder to scan
+        config (DiscoveryConfig): Per-call configuration, defaults to the indexer ignore list
+
+    Yields:
+        str: Full path of each valid file
+    """
+    config = config or DiscoveryConfig()
+    name_matcher = NameMatcher(config.ignore_patterns)
+
+    # Each stack entry: (absolute directory, path relative to the root, active ignore files, active attributes files)
+    stack = [(folder_path, "", [], [])]
+    while stack:
+        directory, relative_dir, ignore_files, attributes_files = stack.pop()
+
+        if config.respect_gitignore:
+            ignore_file = GitIgnoreFile.load(directory, relative_dir)
+            if ignore_file:
+                ignore_files = ignore_files + [ignore_file]
+        if config.respect_gitattributes:
+            attributes_file = GitAttributesFile.load(directory, relative_dir)
+            if attributes_file:
+                attributes_files = attributes_files + [attributes_file]
+
+        try:
+            with os.scandir(directory) as scanner:
+                entries = sorted(scanner, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            name = entry.name
+            if name_matcher.matches(name):
+                continue
+
+            relative_path = f"{relative_dir}/{name}" if relative_dir else name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+
+            if ignore_files and _is_git_ignored(ignore_files, relative_path, is_dir):
+                continue
+
+            if is_dir:
+                subdirectories.append((entry.path, relative_path, ignore_files, attributes_files))
+                continue
+
+            if not entry.is_file():
+                continue
+            if config.require_extension and not has_file_extension(name):
+                continue
+            if attributes_files and _is_skipped_by_attributes(attributes_files, relative_path):
+                continue
+
+            yield os.path.join(directory, name)
+
+        # Reverse so that the stack pops subdirectories in sorted order
+        stack.extend(reversed(subdirectories))
+
+
+def filter_files(folder_path: str, relative_paths: Iterable[str], config: Optional[DiscoveryConfig] = None) -> List[str]:
+    """
+    Keep the files of an explicit list that iter_files would yield, without scanning the folder.
+
+    Only the .gitignore and .gitattributes files of the directories leading to the
+    given paths are read, so the cost follows the number of paths, not the tree.
+
+    Args:
+        folder_path (str): Root folder the paths are relative to
+        relative_paths (Iterable[str]): Slash-separated paths relative to folder_path
+        config (DiscoveryConfig): Per-call configuration, defaults to the indexer ignore list
+
+    Returns:
+        List[str]: Full path of each valid file, in the order of relative_paths
+    """
+    config = config or DiscoveryConfig()
+    name_matcher = NameMatcher(config.ignore_patterns)
+
+    # Active ignore and attributes files by directory relative to the root, loaded once per directory
+    rules: Dict[str, Tuple[List[GitIgnoreFile], List[GitAttributesFile]]] = {}
+
+    def rules_for(relative_dir: str) -> Tuple[List[GitIgnoreFile], List[GitAttributesFile]]:
+        if relative_dir in rules:
+            return rules[relative_dir]
+        if relative_dir:
+            ignore_files, attributes_files = rules_for(relative_dir.rpartition("/")[0])
+        else:
+            ignore_files, attributes_files = [], []
+        directory = os.path.join(folder_path, relative_dir)
+        if config.respect_gitignore:
+            ignore_file = GitIgnoreFile.load(directory, relative_dir)
+            if ignore_file:
+                ignore_files = ignore_files + [ignore_file]
+        if config.respect_gitattributes:
+            attributes_file = GitAttributesFile.load(directory, relative_dir)
+            if attributes_file:
+                attributes_files = attributes_files + [attributes_file]
+        rules[relative_dir] = (ignore_files, attributes_files)
+        return rules[relative_dir]
+
+    valid = []
+    for relative_path in relative_paths:
+        parts = [part for part in relative_path.replace(os.sep, "/").split("/") if part and part != "."]
+        if not parts or ".." in parts or any(name_matcher.matches(part) for part in parts):
+            continue
+        relative_path = "/".join(parts)
+
+        # A file is only reachable if none of its parent directories is ignored
+        ignored = False
+        for depth in range(1, len(parts) + 1):
+            ignore_files, _ = rules_for("/".join(parts[: depth - 1]))
+            if ignore_files and _is_git_ignored(ignore_files, "/".join(parts[:depth]), depth < len(parts)):
+                ignored = True
+                break
+        if ignored:
+            continue
+
+        full_path = os.path.join(folder_path, *parts)
+        if not os.path.isfile(full_path):
+            continue
+        if config.require_extension and not has_file_extension(parts[-1]):
+            continue
+        _, attributes_files = rules_for("/".join(parts[:-1]))
+        if attributes_files and _is_skipped_by_attributes(attributes_files, relative_path):
+            continue
+        valid.append(full_path)
+    return valid
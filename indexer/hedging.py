@@ -0,0 +1,86 @@
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# Latency percentile of a model after which a duplicate request is sent to the next fallback model
+HEDGE_PERCENTILE = float(os.getenv("SUMMARY_HEDGE_PERCENTILE", "0.95"))
+
+# Hedge delay used until a model has enough samples for a meaningful percentile
+DEFAULT_HEDGE_DELAY = float(os.getenv("SUMMARY_HEDGE_DEFAULT_DELAY", "4.0"))
+
+# Never hedge sooner than this, duplicate requests are not free
+MIN_HEDGE_DELAY = float(os.getenv("SUMMARY_HEDGE_MIN_DELAY", "0.5"))
+
+# Number of recent latencies kept per model, so the percentile follows load changes
+LATENCY_WINDOW = 500
+MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """
+    Sliding window of the successful request latencies of each model, giving the
+    online percentiles the summarizer uses to decide when to hedge.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, model_name: str, latency: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(model_name, deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, model_name: str, quantile: float) -> Optional[float]:
+        """Latency quantile of a model, None until it has MIN_SAMPLES samples."""
+        with self._lock:
+            samples = sorted(self._latencies.get(model_name, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(quantile * len(samples)))]
+
+    def hedge_delay(self, model_name: str) -> float:
+        """Seconds to wait for model_name before sending a duplicate request elsewhere."""
+        delay = self.percentile(model_name, HEDGE_PERCENTILE)
+        return max(MIN_HEDGE_DELAY, delay if delay is not None else DEFAULT_HEDGE_DELAY)
+
+    def record_hedge(self, won: bool) -> None:
+        """Count a hedged request, and whether the duplicate returned first."""
+        with self._lock:
+            self.hedges += 1
+            self.hedge_wins += won
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = list(self._latencies)
+            hedges, hedge_wins = self.hedges, self.hedge_wins
+        return {
+            "hedges": hedges,
+            "hedge_wins": hedge_wins,
+            "models": {
+                model_name: {
+                    "p50": self.percentile(model_name, 0.5),
+                    "p95": self.percentile(model_name, 0.95),
+                    "p99": self.percentile(model_name, 0.99),
+                    "hedge_delay": self.hedge_delay(model_name),
+                }
+                for model_name in models
+            },
+        }
+
+
+# Module-level singleton, latencies are learned across indexing jobs
+_latency_tracker: Optional[LatencyTracker] = None
+_latency_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Initialize and return the process-wide latency tracker."""
+    global _latency_tracker
+    with _latency_tracker_lock:
+        if _latency_tracker is None:
+            _latency_tracker = LatencyTracker()
+    return _latency_tracker
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import traceback
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Directory holding one JSON state file (and one result file) per job
+INDEXER_JOBS_DIR = os.getenv("INDEXER_JOBS_DIR", "indexer_jobs")
+
+# Number of indexing jobs running at the same time, the others wait in the queue
+INDEXER_JOB_WORKERS = int(os.getenv("INDEXER_JOB_WORKERS", "2"))
+
+# Finished jobs older than this are forgotten at startup
+INDEXER_JOB_RETENTION_SECONDS = int(os.getenv("INDEXER_JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+# Request fields that are never written to disk
+CREDENTIAL_FIELDS = ("GEMINI_API_KEY", "ANTHROPIC_API_KEY", "OPENAI_API_KEY")
+
+
+@dataclass
+class IndexingJob:
+    """State of one indexing job, as persisted and returned by the status endpoint."""
+
+    job_id: str
+    folder_path: str
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndexingJob":
+        return cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+
+
+def _write_json_atomic(path: Path, data: Any) -> None:
+    """Write through a temporary file so a crash never leaves a truncated state file."""
+    temp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+class JobManager:
+    """
+    Queue of indexing jobs served by a bounded pool of asyncio workers.
+
+    Submitting a folder that already has a queued or running job returns that
+    job instead of starting a second one. Job states are persisted as JSON so
+    that jobs interrupted by a restart are queued again (the summary cache makes
+    the rerun cheap); API keys stay in memory and reruns fall back to the
+    environment keys.
+    """
+
+    def __init__(
+        self,
+        pipeline: Callable[..., Awaitable[dict]],
+        jobs_dir: str = INDEXER_JOBS_DIR,
+        workers: int = INDEXER_JOB_WORKERS,
+    ):
+        self.pipeline = pipeline
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, workers)
+        self.jobs: Dict[str, IndexingJob] = {}
+        self._credentials: Dict[str, Dict[str, str]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._load()
+
+    # --- Persistence ---
+
+    def _state_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def _result_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.result.json"
+
+    def _partial_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.partial.json"
+
+    def _save(self, job: IndexingJob) -> None:
+        try:
+            _write_json_atomic(self._state_path(job.job_id), job.to_dict())
+        except OSError as e:
+            logger.warning(f"Failed to persist state of job {job.job_id}: {e}")
+
+    def _load(self) -> None:
+        now = time.time()
+        for path in self.jobs_dir.glob("*.json"):
+            if path.name.endswith((".result.json", ".partial.json")):
+                continue
+            try:
+                with open(path, "r") as f:
+                    job = IndexingJob.from_dict(json.load(f))
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Ignoring unreadable job state {path}: {e}")
+                continue
+
+            if job.status in FINISHED_STATUSES and now - (job.finished_at or job.created_at) > INDEXER_JOB_RETENTION_SECONDS:
+                path.unlink(missing_ok=True)
+                self._result_path(job.job_id).unlink(missing_ok=True)
+                self._partial_path(job.job_id).unlink(missing_ok=True)
+                continue
+            if job.status == "running":
+                # Interrupted by a restart, run it again
+                job.status = "queued"
+                job.started_at = None
+                self._save(job)
+            self.jobs[job.job_id] = job
+
+    # --- Lifecycle ---
+
+    def start(self) -> None:
+        """Start the workers on the running event loop and queue the jobs left by a previous run."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        for job in sorted(self.jobs.values(), key=lambda job: job.created_at):
+            if job.status == "queued":
+                self._queue.put_nowait(job.job_id)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Started {self.workers} indexing job workers, {self._queue.qsize()} jobs queued")
+
+    async def stop(self) -> None:
+        """Stop the workers. Running jobs stay persisted as running and are queued again on restart."""
+        for task in self._worker_tasks + list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = self.jobs.get(job_id)
+        if job is None or job.status != "queued":
+            # Cancelled while waiting in the queue
+            return
+
+        job.status = "running"
+        job.started_at = time.time()
+        self._save(job)
+        logger.info(f"Indexing job {job_id} started for {job.folder_path}")
+
+        def on_progress(event: dict) -> None:
+            if event.get("event") == "progress":
+                job.progress[event["stage"]] = {"done": event["done"], "total": event["total"]}
+            elif event.get("event") == "partial":
+                # Index of the most important files, usable before the job finishes
+                try:
+                    _write_json_atomic(self._partial_path(job_id), event["result"])
+                except OSError as e:
+                    logger.warning(f"Failed to persist partial result of job {job_id}: {e}")
+                    return
+                job.progress["partial"] = {"tier": event["tier"], "tiers": event["tiers"]}
+                self._save(job)
+
+        pipeline_task = asyncio.create_task(
+            self.pipeline(
+                folder_path=job.folder_path,
+                progress=on_progress,
+                **job.parameters,
+                **self._credentials.get(job_id, {}),
+            )
+        )
+        self._running[job_id] = pipeline_task
+        try:
+            result = await pipeline_task
+            _write_json_atomic(self._result_path(job_id), result)
+            self._partial_path(job_id).unlink(missing_ok=True)
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            if job.status != "cancelled":
+                # The worker itself is shutting down, leave the job to the next start
+                raise
+        except Exception as e:
+            logger.error(f"Indexing job {job_id} failed: {e}\n{traceback.format_exc()}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            self._running.pop(job_id, None)
+            if job.status in FINISHED_STATUSES:
+                job.finished_at = time.time()
+                self._credentials.pop(job_id, None)
+                self._save(job)
+                logger.info(f"Indexing job {job_id} {job.status}")
+
+    # --- API ---
+
+    def submit(self, folder_path: str, parameters: Dict[str, Any]) -> Tuple[IndexingJob, bool]:
+        """
+        Queue an indexing job for a folder, unless one is already queued or running.
+
+        Args:
+            folder_path (str): Folder to index
+            parameters (dict): Other run_pipeline arguments, API keys included
+
+        Returns:
+            tuple: (job, whether it was newly created)
+        """
+        folder_path = os.path.normpath(folder_path)
+        for job in self.jobs.values():
+            if job.folder_path == folder_path and job.status in ACTIVE_STATUSES:
+                logger.info(f"Folder {folder_path} already has active job {job.job_id}")
+                return job, False
+
+        job = IndexingJob(
+            job_id=uuid.uuid4().hex,
+            folder_path=folder_path,
+            parameters={key: value for key, value in parameters.items() if key not in CREDENTIAL_FIELDS},
+        )
+        self._credentials[job.job_id] = {
+            key: value for key, value in parameters.items() if key in CREDENTIAL_FIELDS and value
+        }
+        self.jobs[job.job_id] = job
+        self._save(job)
+        if self._queue is None:
+            self.start()
+        self._queue.put_nowait(job.job_id)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[IndexingJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[IndexingJob]:
+        return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[IndexingJob]:
+        """Cancel a queued or running job. Finished jobs are returned unchanged."""
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return job
+        job.status = "cancelled"
+        pipeline_task = self._running.get(job_id)
+        if pipeline_task is not None:
+            pipeline_task.cancel()
+        else:
+            job.finished_at = time.time()
+            self._credentials.pop(job_id, None)
+            self._save(job)
+        return job
+
+    def result(self, job_id: str, partial: bool = False) -> Optional[dict]:
+        """Result of a succeeded job (or latest partial result of a running one), None if it has none."""
+        path = self._partial_path(job_id) if partial else self._result_path(job_id)
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
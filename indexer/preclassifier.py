@@ -0,0 +1,163 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.utils import classify_file
+
+CODE_FILE = "code_file"
+DOC_FILE = "doc_file"
+CONFIGURATION_FILE = "configuration_file"
+
+# File names that fully determine the classification, whatever their extension says.
+# Names discovery ignores (.json, .cfg, .ini, .xml, .conf, .txt...) never get here.
+# Dotfiles have no extension for os.path.splitext, they are matched here by name.
+WELL_KNOWN_FILES = {
+    "setup.py": CODE_FILE,
+    "conftest.py": CODE_FILE,
+    "manage.py": CODE_FILE,
+    "wsgi.py": CODE_FILE,
+    "asgi.py": CODE_FILE,
+    "readme.md": DOC_FILE,
+    "readme.rst": DOC_FILE,
+    "changelog.md": DOC_FILE,
+    "contributing.md": DOC_FILE,
+    "code_of_conduct.md": DOC_FILE,
+    "security.md": DOC_FILE,
+    "license.md": DOC_FILE,
+    "pyproject.toml": CONFIGURATION_FILE,
+    "cargo.toml": CONFIGURATION_FILE,
+    "go.mod": CONFIGURATION_FILE,
+    "build.gradle": CONFIGURATION_FILE,
+    "settings.gradle": CONFIGURATION_FILE,
+    "docker-compose.yml": CONFIGURATION_FILE,
+    "docker-compose.yaml": CONFIGURATION_FILE,
+    ".pre-commit-config.yaml": CONFIGURATION_FILE,
+    ".editorconfig": CONFIGURATION_FILE,
+}
+
+# Extensions that classify_file does not know about
+EXTRA_EXTENSIONS = {
+    CODE_FILE: {
+        ".ts", ".tsx", ".jsx", ".mjs", ".cjs", ".vue", ".svelte",
+        ".c", ".h", ".cc", ".cxx", ".hpp", ".cs", ".rs", ".kt", ".kts",
+        ".scala", ".groovy", ".dart", ".lua", ".pl", ".pm", ".r", ".jl",
+        ".ex", ".exs", ".erl", ".hs", ".clj", ".ml", ".sh", ".bash",
+        ".zsh", ".ps1", ".scss", ".sass", ".less", ".proto", ".graphql",
+    },
+    DOC_FILE: {".rst", ".adoc", ".asciidoc", ".org", ".tex"},
+    CONFIGURATION_FILE: {".toml", ".properties", ".tf", ".hcl"},
+}
+
+# Directory conventions, used only when the name and extension are not conclusive
+PATH_CONVENTIONS = {
+    DOC_FILE: {"docs", "doc", "documentation", "manual", "wiki"},
+    CONFIGURATION_FILE: {".github", ".circleci", ".gitlab", "config", "configs", "conf", "deploy", "k8s", "helm", "requirements"},
+}
+
+# Interpreters recognised in a shebang line
+SHEBANG_INTERPRETERS = ("python", "node", "bash", "sh", "zsh", "ruby", "perl", "php", "deno", "bun")
+
+
+def sniff_shebang(file_path: str) -> bool:
+    """
+    Check whether a file starts with a shebang pointing to a known interpreter.
+
+    Args:
+        file_path (str): Full path of the file to check
+
+    Returns:
+        bool: True if the first line is a script shebang, False otherwise
+    """
+    try:
+        with open(file_path, "rb") as f:
+            first_line = f.readline(256)
+    except OSError:
+        return False
+
+    if not first_line.startswith(b"#!"):
+        return False
+
+    # "#!/usr/bin/env python3" and "#!/bin/bash" both end with the interpreter
+    command = first_line[2:].decode("utf-8", errors="ignore").strip().split()
+    if not command:
+        return False
+    interpreter = os.path.basename(command[1] if command[0].endswith("/env") and len(command) > 1 else command[0])
+    return interpreter.startswith(SHEBANG_INTERPRETERS)
+
+
+def preclassify_file(file_path: str, folder_path: Optional[str] = None) -> Optional[str]:
+    """
+    Classify a file without the LLM when its name, extension or location is conclusive.
+
+    Rules are applied in order: well-known file names, the extension table of
+    classify_file (extended with EXTRA_EXTENSIONS), directory conventions and
+    finally shebang sniffing.
+
+    Args:
+        file_path (str): Full path of the file to classify
+        folder_path (str): Root of the repository, only the directories below it are
+            matched against the directory conventions (a checkout under /srv/docs/ is
+            not documentation). The whole path is matched when None
+
+    Returns:
+        Optional[str]: code_file, doc_file or configuration_file, None if the file is ambiguous
+    """
+    file_name = os.path.basename(file_path).lower()
+
+    if file_name in WELL_KNOWN_FILES:
+        return WELL_KNOWN_FILES[file_name]
+
+    classification = classify_file(file_name)
+    if classification != "other":
+        return classification
+
+    _, extension = os.path.splitext(file_name)
+    for extra_classification, extensions in EXTRA_EXTENSIONS.items():
+        if extension in extensions:
+            return extra_classification
+
+    location = os.path.relpath(file_path, folder_path) if folder_path else file_path
+    directories = {part.lower() for part in os.path.dirname(location).split(os.sep)}
+    for convention_classification, convention_directories in PATH_CONVENTIONS.items():
+        if directories & convention_directories:
+            return convention_classification
+
+    if sniff_shebang(file_path):
+        return CODE_FILE
+
+    return None
+
+
+def split_files_by_rules(
+    file_names: List[Dict], files_paths: List[str], folder_path: Optional[str] = None
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Split the discovered files between the ones classified locally and the ambiguous ones.
+
+    Args:
+        file_names (list): Items of list_all_files()["all_files_no_path"] ({'file_name', 'file_id'})
+        files_paths (list): list_all_files()["all_files_with_path"], indexed by file_id
+        folder_path (str): Root of the repository the files were discovered in
+
+    Returns:
+        tuple: (classifications, ambiguous_files) where classifications follow the
+               llmclassifier output format and ambiguous_files keep the input format
+    """
+    classifications = []
+    ambiguous_files = []
+
+    for file_info in file_names:
+        file_path = files_paths[file_info["file_id"]]
+        classification = preclassify_file(file_path, folder_path)
+        if classification is None:
+            ambiguous_files.append(file_info)
+        else:
+            classifications.append(
+                {
+                    "file_id": file_info["file_id"],
+                    "file_name": file_info["file_name"],
+                    "classification": classification,
+                    "file_paths": file_path,
+                }
+            )
+
+    return classifications, ambiguous_files
@@ -0,0 +1,226 @@
+import os
+import re
+import math
+import logging
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from src.core.cpu_pool import get_cpu_pool
+
+logger = logging.getLogger(__name__)
+
+# Number of most important files indexed (and published) before the rest of the repository
+INDEXER_FIRST_TIER_FILES = int(os.getenv("INDEXER_FIRST_TIER_FILES", "150"))
+
+# Imports are read from the head of each file only, that is where they are declared
+IMPORT_SCAN_BYTES = 16384
+
+# Base scores of the files a reader looks at first
+README_SCORE = 100.0
+TOP_LEVEL_DOC_SCORE = 60.0
+ENTRY_POINT_SCORE = 50.0
+PACKAGE_EXPORT_SCORE = 20.0
+
+# Points per doubling of the number of files importing a module
+IMPORTED_BY_SCORE = 10.0
+
+# Penalty per directory level, and for tests, examples and vendored code
+DEPTH_PENALTY = 3.0
+SECONDARY_PENALTY = 30.0
+
+ENTRY_POINT_NAMES = {
+    "main.py", "__main__.py", "app.py", "server.py", "cli.py", "manage.py", "wsgi.py", "asgi.py",
+    "setup.py", "pyproject.toml", "package.json", "cargo.toml", "go.mod", "pom.xml", "build.gradle",
+    "index.js", "index.ts", "main.js", "main.ts", "app.js", "app.ts", "server.js", "server.ts",
+    "main.go", "main.rs", "lib.rs", "main.java", "application.java",
+}
+
+SECONDARY_DIRECTORIES = {
+    "test", "tests", "__tests__", "spec", "specs", "testing", "example", "examples", "sample", "samples",
+    "benchmark", "benchmarks", "vendor", "third_party", "thirdparty", "fixtures", "migrations", "scripts",
+}
+
+# File names standing for their directory when a module is imported by package name
+PACKAGE_FILES = {"__init__.py", "index.js", "index.ts", "index.tsx", "mod.rs", "lib.rs"}
+
+_PYTHON_IMPORT = re.compile(r"^\s*(?:from\s+(\.*[\w.]*)\s+import\s+([\w., ()*]+)|import\s+([\w., ]+))", re.MULTILINE)
+_JS_IMPORT = re.compile(r"""(?:\bfrom\s*|\bimport\s*\(?\s*|\brequire\(\s*)['"]([^'"]+)['"]""")
+_GO_IMPORT = re.compile(r'^\s*(?:import\s+)?(?:[\w.]+\s+)?"([\w./-]+)"', re.MULTILINE)
+_JAVA_IMPORT = re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+)\s*;", re.MULTILINE)
+_RUST_IMPORT = re.compile(r"^\s*(?:pub\s+)?(?:use|mod)\s+((?:crate|super|self)?(?:::)?[\w:]+)", re.MULTILINE)
+
+
+def _module_key(relative_path: str) -> str:
+    """Slash-separated module path of a file, packages being keyed by their directory."""
+    directory, name = os.path.split(relative_path)
+    if name in PACKAGE_FILES:
+        return directory
+    return os.path.splitext(relative_path)[0]
+
+
+def _read_head(file_path: str) -> str:
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read(IMPORT_SCAN_BYTES)
+    except OSError:
+        return ""
+
+
+def _imported_modules(relative_path: str, head: str) -> List[str]:
+    """Module paths imported by a file, as slash-separated candidates relative to some root."""
+    extension = os.path.splitext(relative_path)[1].lower()
+    directory = os.path.dirname(relative_path)
+    modules = []
+    if extension == ".py":
+        for from_module, names, imported in _PYTHON_IMPORT.findall(head):
+            if imported:
+                modules += [name.split(" as ")[0].strip().replace(".", "/") for name in imported.split(",")]
+                continue
+            level = len(from_module) - len(from_module.lstrip("."))
+            base = from_module.lstrip(".").replace(".", "/")
+            if level:
+                parent = directory
+                for _ in range(level - 1):
+                    parent = os.path.dirname(parent)
+                base = os.path.join(parent, base) if base else parent
+            modules.append(base)
+            # "from package import module" imports submodules as well as names
+            for name in names.strip("() ").split(","):
+                name = name.split(" as ")[0].strip()
+                if name and name != "*":
+                    modules.append(f"{base}/{name}" if base else name)
+    elif extension in (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts"):
+        for module in _JS_IMPORT.findall(head):
+            if module.startswith("."):
+                module = os.path.normpath(os.path.join(directory, module))
+            modules.append(os.path.splitext(module)[0] if os.path.splitext(module)[1] in (".js", ".ts") else module)
+    elif extension == ".go":
+        modules += _GO_IMPORT.findall(head)
+    elif extension == ".java":
+        modules += [module.replace(".", "/") for module in _JAVA_IMPORT.findall(head)]
+    elif extension == ".rs":
+        for module in _RUST_IMPORT.findall(head):
+            parts = [part for part in module.split("::") if part and part not in ("crate", "self", "super")]
+            modules.append("/".join(parts))
+    return [module.strip("/") for module in modules if module and module.strip("/")]
+
+
+def _file_imports(item: Tuple[str, str]) -> List[str]:
+    """Modules imported by one (full path, relative path) file, run by the CPU pool workers."""
+    path, relative_path = item
+    return _imported_modules(relative_path, _read_head(path))
+
+
+def _package_files(folder_path: str, relative_paths: Set[str]) -> List[Tuple[str, str]]:
+    """
+    (full path, relative path) of the package files of the directories holding relative_paths, but not among them.
+
+    Discovery ignores __init__.py files (see utils.py), so they are never among
+    the indexed files, but what they import is what their package exports.
+    """
+    directories = set()
+    for relative_path in relative_paths:
+        directory = os.path.dirname(relative_path)
+        while directory not in directories:
+            directories.add(directory)
+            if not directory:
+                break
+            directory = os.path.dirname(directory)
+    package_files = []
+    for directory in sorted(directories):
+        for name in sorted(PACKAGE_FILES):
+            relative_path = f"{directory}/{name}" if directory else name
+            path = os.path.join(folder_path, relative_path)
+            if relative_path not in relative_paths and os.path.isfile(path):
+                package_files.append((path, relative_path))
+    return package_files
+
+
+def score_files(folder_path: str, file_paths: List[str]) -> Dict[str, float]:
+    """
+    Importance score of each file, higher first.
+
+    Scores READMEs and top-level documentation, entry points and manifests,
+    modules re-exported by a package __init__, and modules by the number of
+    files importing them (resolved by module path suffix, so absolute and
+    relative imports of the same module both count), minus a penalty for depth
+    and for tests, examples and vendored code. The package files of the scored
+    directories are read as importers even when they are not scored themselves.
+
+    Args:
+        folder_path (str): Root of the repository
+        file_paths (list): Full paths of the files to score
+
+    Returns:
+        dict: Score by full path
+    """
+    relative_paths = {path: os.path.relpath(path, folder_path).replace(os.sep, "/") for path in file_paths}
+
+    # Every suffix of a module path resolves to the files it may designate
+    modules_by_suffix: Dict[str, List[str]] = defaultdict(list)
+    for path, relative_path in relative_paths.items():
+        parts = _module_key(relative_path).split("/")
+        for start in range(len(parts)):
+            modules_by_suffix["/".join(parts[start:])].append(path)
+
+    sources = [
+        (path, relative_path) for path, relative_path in relative_paths.items()
+        if os.path.splitext(path)[1].lower() in (".py", ".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".go", ".java", ".rs")
+    ]
+    sources += _package_files(folder_path, set(relative_paths.values()))
+    imports = get_cpu_pool().map(_file_imports, sources)
+
+    imported_by: Dict[str, int] = defaultdict(int)
+    package_exports = set()
+    for (path, relative_path), modules in zip(sources, imports):
+        targets = set()
+        for module in modules:
+            candidates = modules_by_suffix.get(module)
+            # A suffix matching many files ("utils") says nothing about which one is meant
+            if candidates and len(candidates) <= 3:
+                targets.update(candidates)
+        targets.discard(path)
+        for target in targets:
+            imported_by[target] += 1
+        if os.path.basename(path) in PACKAGE_FILES:
+            package_exports.update(targets)
+
+    scores = {}
+    for path, relative_path in relative_paths.items():
+        parts = relative_path.split("/")
+        name = parts[-1].lower()
+        depth = len(parts) - 1
+        score = 0.0
+        if name.startswith("readme"):
+            score += README_SCORE if depth == 0 else TOP_LEVEL_DOC_SCORE / 2
+        elif name.endswith((".md", ".rst")) and depth <= 1:
+            score += TOP_LEVEL_DOC_SCORE if depth == 0 else TOP_LEVEL_DOC_SCORE / 2
+        if name in ENTRY_POINT_NAMES:
+            score += ENTRY_POINT_SCORE
+        if path in package_exports:
+            score += PACKAGE_EXPORT_SCORE
+        score += IMPORTED_BY_SCORE * math.log2(1 + imported_by.get(path, 0))
+        score -= DEPTH_PENALTY * depth
+        if any(part.lower() in SECONDARY_DIRECTORIES for part in parts[:-1]) or name.startswith("test_"):
+            score -= SECONDARY_PENALTY
+        scores[path] = score
+    return scores
+
+
+def prioritize_files(folder_path: str, file_paths: List[str]) -> List[str]:
+    """File paths sorted by decreasing importance, ties kept in discovery order."""
+    scores = score_files(folder_path, file_paths)
+    order = {path: index for index, path in enumerate(file_paths)}
+    return sorted(file_paths, key=lambda path: (-scores[path], order[path]))
+
+
+def split_tiers(ordered_paths: List[str], first_tier_size: int = INDEXER_FIRST_TIER_FILES) -> List[List[str]]:
+    """
+    Split prioritized files into the first tier, indexed and published first, and the rest.
+
+    Returns:
+        list: One or two lists of file paths
+    """
+    if first_tier_size <= 0 or len(ordered_paths) <= first_tier_size:
+        return [ordered_paths]
+    return [ordered_paths[:first_tier_size], ordered_paths[first_tier_size:]]
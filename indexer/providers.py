@@ -0,0 +1,226 @@
+import os
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import httpx
+import instructor
+import google.generativeai as genai
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
+
+from .utils import SAFE
+
+logger = logging.getLogger(__name__)
+
+# Size of the pooled HTTP transport shared by the OpenAI / Anthropic async clients
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+
+GENERATION_CONFIG = {
+    "temperature": 0.0,
+    "top_p": 1,
+    "candidate_count": 1,
+    "max_output_tokens": 8000,
+}
+
+Messages = Union[str, Dict[str, Any], List[Any]]
+
+
+def _pooled_http_client() -> httpx.AsyncClient:
+    """Async HTTP transport whose connection pool matches the configured concurrency."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+
+
+def to_chat_messages(messages: Messages) -> List[Dict[str, str]]:
+    """Normalize a prompt (string, message dict or list of either) to [{'role', 'content'}] messages."""
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+    if isinstance(messages, dict):
+        messages = [messages]
+
+    chat_messages = []
+    for message in messages:
+        if isinstance(message, dict) and "content" in message:
+            chat_messages.append({"role": message.get("role", "user"), "content": str(message["content"])})
+        elif isinstance(message, dict) and "parts" in message:
+            text = "".join(part.get("text", "") for part in message["parts"])
+            role = "assistant" if message.get("role") == "model" else "user"
+            chat_messages.append({"role": role, "content": text})
+        else:
+            chat_messages.append({"role": "user", "content": str(message)})
+    return chat_messages
+
+
+class AsyncLLMProvider(ABC):
+    """
+    Async client for one model, exposing the two call shapes the indexer needs:
+    raw text generation (classification) and structured output through instructor
+    (summaries). Both return the raw SDK response as well, for usage(). Implementations use the SDKs' native async clients so that no
+    call pins a thread of the default executor.
+    """
+
+    provider = ""
+
+    def __init__(self, model_name: str, api_key: str = ""):
+        self.model_name = model_name
+        # Only used to key the rate limits, the SDK clients hold their own copy
+        self.api_key = api_key
+
+    @abstractmethod
+    async def generate_text(self, messages: Messages) -> Tuple[str, Any]:
+        """Text completion of messages, and the raw SDK response."""
+
+    @abstractmethod
+    async def create_structured(
+        self,
+        messages: List[Dict[str, str]],
+        response_model,
+        max_retries: int = 1,
+        validation_context: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Any, Any]:
+        """Instance of response_model validated by instructor, and the raw SDK response."""
+
+    def usage(self, raw) -> Dict[str, int]:
+        """Prompt / completion token counts of a raw response, for Langfuse."""
+        return {"input": 0, "output": 0}
+
+
+class GeminiProvider(AsyncLLMProvider):
+    provider = "gemini"
+
+    def __init__(self, model_name: str, api_key: str = ""):
+        super().__init__(model_name, api_key)
+        self.client = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=GENERATION_CONFIG,
+            safety_settings=SAFE,
+        )
+        self.structured_client = instructor.from_gemini(
+            client=self.client,
+            mode=instructor.Mode.GEMINI_JSON,
+            use_async=True,
+        )
+
+    @staticmethod
+    def to_gemini_contents(messages: Messages) -> List[Dict[str, Any]]:
+        """Convert chat messages to Gemini contents (every turn but the model's is sent as user)."""
+        if isinstance(messages, list) and messages and isinstance(messages[0], dict) and "parts" in messages[0]:
+            return messages
+        return [
+            {
+                "role": "model" if message["role"] == "assistant" else "user",
+                "parts": [{"text": message["content"]}],
+            }
+            for message in to_chat_messages(messages)
+        ]
+
+    async def generate_text(self, messages: Messages) -> Tuple[str, Any]:
+        response = await self.client.generate_content_async(
+            contents=self.to_gemini_contents(messages),
+            generation_config=GENERATION_CONFIG,
+        )
+        if hasattr(response, "text"):
+            return response.text, response
+        return response.candidates[0].content.parts[0].text, response
+
+    async def create_structured(self, messages, response_model, max_retries=1, validation_context=None):
+        return await self.structured_client.chat.create_with_completion(
+            messages=messages,
+            response_model=response_model,
+            generation_config=GENERATION_CONFIG,
+            max_retries=max_retries,
+            validation_context=validation_context,
+        )
+
+    def usage(self, raw) -> Dict[str, int]:
+        metadata = getattr(raw, "usage_metadata", None)
+        if metadata is None:
+            return super().usage(raw)
+        return {"input": metadata.prompt_token_count, "output": metadata.candidates_token_count}
+
+
+class OpenAIProvider(AsyncLLMProvider):
+    provider = "openai"
+
+    def __init__(self, model_name: str, api_key: str):
+        super().__init__(model_name, api_key)
+        self.client = AsyncOpenAI(api_key=api_key, http_client=_pooled_http_client())
+        self.structured_client = instructor.from_openai(self.client)
+
+    async def generate_text(self, messages: Messages) -> Tuple[str, Any]:
+        response = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=to_chat_messages(messages),
+            temperature=0.0,
+            max_tokens=8000,
+        )
+        return response.choices[0].message.content, response
+
+    async def create_structured(self, messages, response_model, max_retries=1, validation_context=None):
+        return await self.structured_client.chat.completions.create_with_completion(
+            model=self.model_name,
+            messages=messages,
+            response_model=response_model,
+            temperature=0.0,
+            top_p=1,
+            max_tokens=8000,
+            max_retries=max_retries,
+            validation_context=validation_context,
+        )
+
+    def usage(self, raw) -> Dict[str, int]:
+        usage = getattr(raw, "usage", None)
+        if usage is None:
+            return super().usage(raw)
+        return {"input": usage.prompt_tokens, "output": usage.completion_tokens}
+
+
+class AnthropicProvider(AsyncLLMProvider):
+    provider = "anthropic"
+
+    def __init__(self, model_name: str, api_key: str):
+        super().__init__(model_name, api_key)
+        self.client = AsyncAnthropic(api_key=api_key, http_client=_pooled_http_client())
+        self.structured_client = instructor.from_anthropic(self.client)
+
+    @staticmethod
+    def split_system(messages: Messages) -> Tuple[str, List[Dict[str, str]]]:
+        """Anthropic takes the system prompt as a parameter, not as a message."""
+        chat_messages = to_chat_messages(messages)
+        system = "\n\n".join(m["content"] for m in chat_messages if m["role"] == "system")
+        return system, [m for m in chat_messages if m["role"] != "system"]
+
+    async def generate_text(self, messages: Messages) -> Tuple[str, Any]:
+        system, chat_messages = self.split_system(messages)
+        response = await self.client.messages.create(
+            model=self.model_name,
+            system=system,
+            messages=chat_messages,
+            temperature=0.0,
+            max_tokens=8000,
+        )
+        return response.content[0].text, response
+
+    async def create_structured(self, messages, response_model, max_retries=1, validation_context=None):
+        # instructor moves the system message to the system parameter itself
+        return await self.structured_client.messages.create_with_completion(
+            model=self.model_name,
+            messages=messages,
+            response_model=response_model,
+            temperature=0.0,
+            max_tokens=8000,
+            max_retries=max_retries,
+            validation_context=validation_context,
+        )
+
+    def usage(self, raw) -> Dict[str, int]:
+        usage = getattr(raw, "usage", None)
+        if usage is None:
+            return super().usage(raw)
+        return {"input": usage.input_tokens, "output": usage.output_tokens}
@@ -0,0 +1,242 @@
+import os
+import ast
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Docstrings whose first paragraph is shorter than this are described by the LLM
+MIN_DOCSTRING_CHARS = int(os.getenv("PY_EXTRACTOR_MIN_DOCSTRING_CHARS", "20"))
+
+# Source sent to the LLM for each undocumented symbol is truncated to this size
+MAX_SYMBOL_SOURCE_CHARS = int(os.getenv("PY_EXTRACTOR_MAX_SYMBOL_SOURCE_CHARS", "3000"))
+
+# Bumped whenever the extraction changes, to invalidate the cached structures
+EXTRACTOR_VERSION = "1"
+
+MODULE_SYMBOL = "<module>"
+
+# "name (type): description" / "name: description" entries of Args / Attributes sections
+_DOC_ENTRY = re.compile(r"^\s*\*{0,2}(\w+)\*{0,2}\s*(?:\([^)]*\))?\s*:\s*(.+)$")
+_SECTION_HEADER = re.compile(r"^\s*(Args|Arguments|Parameters|Attributes|Returns|Raises|Yields|Examples?)\s*:?\s*$")
+
+
+@dataclass
+class SymbolGap:
+    """A symbol without a usable docstring, to be described by the LLM."""
+
+    symbol: str
+    kind: str
+    source: str
+
+
+def _summary(docstring: Optional[str]) -> str:
+    """First paragraph of a docstring, on one line."""
+    if not docstring:
+        return ""
+    paragraph = docstring.strip().split("\n\n")[0]
+    return " ".join(line.strip() for line in paragraph.splitlines())
+
+
+def _is_thin(docstring: Optional[str]) -> bool:
+    return len(_summary(docstring)) < MIN_DOCSTRING_CHARS
+
+
+def _documented_names(docstring: Optional[str]) -> Dict[str, str]:
+    """Descriptions of the names listed in the Args / Attributes sections of a docstring."""
+    entries = {}
+    in_section = False
+    for line in (docstring or "").splitlines():
+        header = _SECTION_HEADER.match(line)
+        if header:
+            in_section = header.group(1) in ("Args", "Arguments", "Parameters", "Attributes")
+            continue
+        if in_section:
+            entry = _DOC_ENTRY.match(line)
+            if entry:
+                entries.setdefault(entry.group(1), entry.group(2).strip())
+    return entries
+
+
+def _source(content: str, node: ast.AST) -> str:
+    segment = ast.get_source_segment(content, node) or ""
+    if len(segment) > MAX_SYMBOL_SOURCE_CHARS:
+        segment = segment[:MAX_SYMBOL_SOURCE_CHARS] + "\n# ... truncated"
+    return segment
+
+
+def _class_attributes(node: ast.ClassDef, content: str) -> List[Dict[str, str]]:
+    """
+    Attributes declared in the class body or assigned on self in its methods.
+
+    Descriptions come, in order, from the Attributes section of the class docstring,
+    a string literal right after the declaration, the Args section of __init__ for
+    attributes set from a parameter, and finally the annotation or assigned value.
+    """
+    documented = _documented_names(ast.get_docstring(node))
+    init_args = {}
+    for method in node.body:
+        if isinstance(method, (ast.FunctionDef, ast.AsyncFunctionDef)) and method.name == "__init__":
+            init_args = _documented_names(ast.get_docstring(method))
+    attributes: Dict[str, str] = {}
+
+    def add(name: str, fallback: str) -> None:
+        if name.startswith("__") or name in attributes:
+            return
+        attributes[name] = documented.get(name) or init_args.get(name) or fallback
+
+    body = node.body
+    for index, statement in enumerate(body):
+        targets = []
+        if isinstance(statement, ast.Assign):
+            targets = [target.id for target in statement.targets if isinstance(target, ast.Name)]
+        elif isinstance(statement, ast.AnnAssign) and isinstance(statement.target, ast.Name):
+            targets = [statement.target.id]
+        if not targets:
+            continue
+        next_statement = body[index + 1] if index + 1 < len(body) else None
+        attribute_doc = ""
+        if (
+            isinstance(next_statement, ast.Expr)
+            and isinstance(next_statement.value, ast.Constant)
+            and isinstance(next_statement.value.value, str)
+        ):
+            attribute_doc = _summary(next_statement.value.value)
+        for target in targets:
+            if isinstance(statement, ast.AnnAssign):
+                fallback = f"Class attribute of type `{ast.unparse(statement.annotation)}`"
+            else:
+                fallback = f"Class attribute, defaults to `{ast.unparse(statement.value)[:80]}`"
+            add(target, attribute_doc or fallback)
+
+    for method in body:
+        if not isinstance(method, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        parameters = {arg.arg for arg in method.args.args + method.args.kwonlyargs}
+        for statement in ast.walk(method):
+            if isinstance(statement, ast.Assign):
+                targets, value = statement.targets, statement.value
+            elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+                targets, value = [statement.target], statement.value
+            else:
+                continue
+            for target in targets:
+                if (
+                    isinstance(target, ast.Attribute)
+                    and isinstance(target.value, ast.Name)
+                    and target.value.id == "self"
+                ):
+                    if isinstance(value, ast.Name) and value.id in parameters:
+                        fallback = init_args.get(value.id) or f"Set from the `{value.id}` argument of `{method.name}`"
+                    else:
+                        fallback = f"Set in `{method.name}` to `{ast.unparse(value)[:80]}`"
+                    add(target.attr, fallback)
+
+    return [
+        {"attribute_name": name, "attribute_description": description}
+        for name, description in attributes.items()
+    ]
+
+
+def _describe_function(node, content: str, symbol: str, kind: str, gaps: List[SymbolGap]) -> Dict[str, str]:
+    docstring = ast.get_docstring(node)
+    description = _summary(docstring)
+    is_dunder = node.name.startswith("__") and node.name.endswith("__") and node.name not in ("__init__", "__call__")
+    if _is_thin(docstring):
+        if is_dunder:
+            description = description or f"Implements the `{node.name}` protocol."
+        else:
+            gaps.append(SymbolGap(symbol, kind, _source(content, node)))
+    return {"function_name": node.name, "function_description": description}
+
+
+def extract_code_structure(content: str) -> Tuple[Dict[str, Any], List[SymbolGap]]:
+    """
+    Build the CodeStructure of a Python file from its AST and docstrings.
+
+    Args:
+        content (str): Source of the file
+
+    Returns:
+        tuple: (structure following the CodeStructure schema, symbols whose
+                docstring is missing or thin and still need a description)
+
+    Raises:
+        SyntaxError: If the content is not valid Python
+    """
+    tree = ast.parse(content)
+    gaps: List[SymbolGap] = []
+
+    module_docstring = ast.get_docstring(tree)
+    if _is_thin(module_docstring):
+        # Describe the module from its outline rather than its whole source
+        outline = "\n".join(
+            f"{type(node).__name__.replace('Def', '').lower()} {node.name}"
+            for node in tree.body
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        )
+        imports = "\n".join(
+            ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+        )
+        gaps.append(SymbolGap(MODULE_SYMBOL, "module", (imports + "\n\n" + outline)[:MAX_SYMBOL_SOURCE_CHARS]))
+
+    functions = []
+    classes = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append(_describe_function(node, content, node.name, "function", gaps))
+        elif isinstance(node, ast.ClassDef):
+            class_docstring = ast.get_docstring(node)
+            if _is_thin(class_docstring):
+                gaps.append(SymbolGap(node.name, "class", _source(content, node)))
+            methods = [
+                _describe_function(child, content, f"{node.name}.{child.name}", "method", gaps)
+                for child in node.body
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+            ]
+            classes.append({
+                "class_name": node.name,
+                "class_description": _summary(class_docstring),
+                "attributes": _class_attributes(node, content),
+                "functions_in_class": methods,
+            })
+
+    structure = {
+        "global_code_description": _summary(module_docstring),
+        "functions_out_class": functions,
+        "classes": classes,
+    }
+    return structure, gaps
+
+
+def format_gaps_prompt(file_name: str, gaps: List[SymbolGap]) -> str:
+    """Render the undocumented symbols of a file as one prompt section per symbol."""
+    sections = [
+        f"## {gap.kind} `{gap.symbol}`\n```python\n{gap.source}\n```"
+        for gap in gaps
+    ]
+    return f"# File: {file_name}\n\n" + "\n\n".join(sections)
+
+
+def fill_gaps(structure: Dict[str, Any], descriptions: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Write the LLM descriptions of the undocumented symbols into the structure.
+
+    Args:
+        structure (dict): Structure returned by extract_code_structure
+        descriptions (dict): Description per symbol ("<module>", "func", "Class", "Class.method")
+    """
+    if descriptions.get(MODULE_SYMBOL):
+        structure["global_code_description"] = descriptions[MODULE_SYMBOL]
+    for function in structure["functions_out_class"]:
+        description = descriptions.get(function["function_name"])
+        if description:
+            function["function_description"] = description
+    for class_info in structure["classes"]:
+        class_name = class_info["class_name"]
+        if descriptions.get(class_name):
+            class_info["class_description"] = descriptions[class_name]
+        for method in class_info["functions_in_class"]:
+            description = descriptions.get(f"{class_name}.{method['function_name']}")
+            if description:
+                method["function_description"] = description
+    return structure
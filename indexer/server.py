@@ -1,10 +1,21 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
+import os
+import json
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from .service import ClassifierService
+from .jobs import JobManager
+from .summary_cache import get_summary_cache
+from .batching import get_batch_packer
+from .concurrency import get_concurrency_governor
+from .hedging import get_latency_tracker
 import traceback
-
-app = FastAPI(title="Indexer Service", description="File classification and summarization service")
+from src.core.rate_limiter import get_rate_limiter
+from src.core.cpu_pool import get_cpu_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,6 +24,17 @@ logger = logging.getLogger(__name__)
 # Initialize the classifier service
 classifier_service = ClassifierService()
 
+# Background indexing jobs, persisted across restarts
+job_manager = JobManager(classifier_service.run_pipeline)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_manager.start()
+    yield
+    await job_manager.stop()
+
+app = FastAPI(title="Indexer Service", description="File classification and summarization service", lifespan=lifespan)
+
 class ClassificationRequest(BaseModel):
     folder_path: str
     batch_size: int = 10  # Ultra-small batches for maximum parallelism
@@ -24,6 +46,17 @@ class ClassificationRequest(BaseModel):
 class ClassificationResponse(BaseModel):
     result: dict
 
+class DeltaRequest(ClassificationRequest):
+    changed_paths: List[str] = []  # Added or modified files, relative to folder_path
+    deleted_paths: List[str] = []  # Removed files, relative to folder_path
+    previous_index_version: Optional[int] = None
+
+# Seconds without any event after which /score_stream sends a heartbeat line
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("INDEXER_STREAM_HEARTBEAT_SECONDS", "15"))
+
+# Strong references to the running streaming pipelines, which outlive their response on a disconnect
+_pipeline_tasks: set = set()
+
 @app.post("/score", response_model=ClassificationResponse)
 async def classify_files(request: ClassificationRequest):
     """
@@ -50,6 +83,190 @@ async def classify_files(request: ClassificationRequest):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Classification failed: {str(e)}")
 
+@app.post("/score_delta", response_model=ClassificationResponse)
+async def classify_delta(request: DeltaRequest):
+    """
+    Index only the files changed since the previous index of a folder.
+
+    Answers {"result": {"upserts": {...}, "deletes": [...], "previous_index_version": n}},
+    upserts having the same shape as the result of /score and deletes holding
+    full paths. The caller applies the delta to the index it was computed against.
+    """
+    try:
+        logger.info(
+            f"Received delta request for folder: {request.folder_path}, "
+            f"{len(request.changed_paths)} changed and {len(request.deleted_paths)} deleted files"
+        )
+        result = await classifier_service.run_delta(
+            folder_path=request.folder_path,
+            changed_paths=request.changed_paths,
+            deleted_paths=request.deleted_paths,
+            previous_index_version=request.previous_index_version,
+            batch_size=request.batch_size,
+            max_workers=request.max_workers,
+            GEMINI_API_KEY=request.GEMINI_API_KEY,
+            ANTHROPIC_API_KEY=request.ANTHROPIC_API_KEY,
+            OPENAI_API_KEY=request.OPENAI_API_KEY
+        )
+        return ClassificationResponse(result=result)
+
+    except Exception as e:
+        logger.error(f"Error during delta classification: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Delta classification failed: {str(e)}")
+
+@app.post("/score_stream")
+async def classify_files_stream(request: ClassificationRequest):
+    """
+    Streaming variant of /score, answering with NDJSON lines as the indexing progresses:
+
+    - {"event": "classification", "file_classifications": [...]} per classified batch
+    - {"event": "summary", "file_paths": ..., "category": ..., "summary": {...}} per summarized file
+    - {"event": "progress", "stage": "classification"|"summarization", "done": n, "total": n}
+    - {"event": "partial", "tier": n, "tiers": n, "result": {...}} when the most important files are indexed
+    - {"event": "heartbeat"} when nothing happened for STREAM_HEARTBEAT_SECONDS
+    - {"event": "result", "result": {...}} with the same payload as /score, last line on success
+    - {"event": "error", "detail": "..."} last line on failure
+
+    The pipeline keeps running if the client disconnects, so the summaries it
+    produces still land in the summary cache for the next attempt.
+
+    The controller indexes through /jobs (cancellable, deduplicated, polled for
+    partial results); this endpoint is kept for external clients that want the
+    events live on one connection.
+    """
+    logger.info(f"Received streaming classification request for folder: {request.folder_path}")
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        try:
+            result = await classifier_service.run_pipeline(
+                folder_path=request.folder_path,
+                batch_size=request.batch_size,
+                max_workers=request.max_workers,
+                GEMINI_API_KEY=request.GEMINI_API_KEY,
+                ANTHROPIC_API_KEY=request.ANTHROPIC_API_KEY,
+                OPENAI_API_KEY=request.OPENAI_API_KEY,
+                progress=events.put_nowait,
+            )
+            events.put_nowait({"event": "result", "result": result})
+            logger.info("Streaming classification completed successfully")
+        except Exception as e:
+            logger.error(f"Error during streaming classification: {str(e)}")
+            logger.error(traceback.format_exc())
+            events.put_nowait({"event": "error", "detail": f"Classification failed: {str(e)}"})
+
+    pipeline_task = asyncio.create_task(run())
+    _pipeline_tasks.add(pipeline_task)
+    pipeline_task.add_done_callback(_pipeline_tasks.discard)
+
+    async def event_lines():
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                event = {"event": "heartbeat"}
+            yield json.dumps(event) + "\n"
+            if event["event"] in ("result", "error"):
+                break
+        await pipeline_task
+
+    return StreamingResponse(event_lines(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: ClassificationRequest):
+    """
+    Queue an indexing job and return immediately.
+
+    A folder that already has a queued or running job gets that job back
+    (deduplicated is true) instead of a second run.
+    """
+    job, created = job_manager.submit(
+        request.folder_path,
+        {
+            "batch_size": request.batch_size,
+            "max_workers": request.max_workers,
+            "GEMINI_API_KEY": request.GEMINI_API_KEY,
+            "ANTHROPIC_API_KEY": request.ANTHROPIC_API_KEY,
+            "OPENAI_API_KEY": request.OPENAI_API_KEY,
+        },
+    )
+    return {"job_id": job.job_id, "status": job.status, "deduplicated": not created}
+
+@app.get("/jobs")
+async def list_jobs():
+    """All known jobs, most recent first"""
+    return {"jobs": [job.to_dict() for job in job_manager.list()]}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status, timestamps, progress counters and error of a job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job.to_dict()
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result", response_model=ClassificationResponse)
+async def job_result(job_id: str, partial: bool = False):
+    """
+    Result of a succeeded job, same payload as /score.
+
+    With partial=true, a running job returns the index of the files indexed so
+    far (available once progress.partial is set), a succeeded job its full result.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    if partial and job.status == "running":
+        result = job_manager.result(job_id, partial=True)
+        if result is None:
+            raise HTTPException(status_code=409, detail=f"Job {job_id} has no partial result yet")
+        return ClassificationResponse(result=result)
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}")
+    result = job_manager.result(job_id)
+    if result is None:
+        raise HTTPException(status_code=410, detail=f"Result of job {job_id} is no longer available")
+    return ClassificationResponse(result=result)
+
+@app.get("/cache/stats")
+async def summary_cache_stats():
+    """Hit/miss counters of the content-addressed summary cache"""
+    return get_summary_cache().stats()
+
+@app.get("/batching/stats")
+async def batching_stats():
+    """Token budgets, validation failure rates and last layout of the classification batches"""
+    return get_batch_packer().stats()
+
+@app.get("/concurrency/stats")
+async def concurrency_stats():
+    """Adaptive concurrency window, latency and error rate of each model"""
+    return get_concurrency_governor().stats()
+
+@app.get("/hedging/stats")
+async def hedging_stats():
+    """Online latency percentiles per model, hedge delays and how often hedges won"""
+    return get_latency_tracker().stats()
+
+@app.get("/rate_limits/stats")
+async def rate_limits_stats():
+    """Configured RPM/TPM, remaining capacity and queued requests of each (provider, model, key) bucket"""
+    return get_rate_limiter().stats()
+
+@app.get("/cpu_pool/stats")
+async def cpu_pool_stats():
+    """Worker processes and tasks of the pool running hashing and parsing"""
+    return get_cpu_pool().stats()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
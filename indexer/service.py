@@ -7,30 +7,80 @@ sys.path.append(project_root)
 
 from src.schemas.description import (
     TemplateManager,
-    generate_code_structure_model_consize,
+    CodeStructure,
+    SymbolDescriptions,
+    PackedSummaries,
+    symbol_descriptions_context,
     DocumentCompression,
     YamlBrief,
 )
-from src.schemas.classif import create_file_classification
+from src.schemas.classif import FileClassifications, file_classification_context
 from .utils import list_all_files, SAFE
-import instructor
+from .preclassifier import split_files_by_rules
+from .discovery import DiscoveryConfig, filter_files
+from .summary_cache import get_summary_cache, hash_prompt
+from .batching import get_batch_packer, pack_small_files, MAX_OUTPUT_TOKENS, SUMMARY_PACK_MAX_FILE_CHARS
+from .chunking import CHUNK_THRESHOLD_CHARS, CHUNK_TARGET_CHARS, SKELETON_ONLY_THRESHOLD_CHARS, split_source, merge_code_structures
+from .python_extractor import EXTRACTOR_VERSION, format_gaps_prompt, fill_gaps
+from .symbols import format_skeleton
+from .priority import prioritize_files, split_tiers
+from .dedup import find_duplicates
+from .analysis import digest_source, analyze_source
+from src.core.rate_limiter import get_rate_limiter, estimate_request_tokens
+from src.core.cpu_pool import get_cpu_pool
+from src.core.index_store import stable_file_id
+from .hedging import get_latency_tracker
+from .concurrency import get_concurrency_governor, backoff_delay, retry_after_seconds
+from .providers import AsyncLLMProvider, GeminiProvider, OpenAIProvider, AnthropicProvider
 import os
 import dotenv
 import traceback
 import asyncio
+import json
+import time
 import google.generativeai as genai
-from openai import OpenAI
 import aiofiles
 import logging
 import traceback
 from src.monitor.langfuse import get_langfuse_context, trace, generate_trace_id
 from pathlib import Path
+from pydantic import ValidationError
+from typing import Any, Callable, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
 dotenv.load_dotenv()
 
 
+def report_progress(progress: Optional[Callable[[dict], None]], event: dict) -> None:
+    """Send an event to the progress callback of a streaming request, if any."""
+    if progress is None:
+        return
+    try:
+        progress(event)
+    except Exception as e:
+        logger.warning(f"Progress callback failed: {e}")
+
+
+async def _notify_when_done(task, on_done: Callable[[Any], None]):
+    """Await a task and hand its result to on_done as soon as it finishes."""
+    result = await task
+    on_done(result)
+    return result
+
+
+async def _pack_entry(pack_task: asyncio.Future, file_path: str):
+    """Result of one file of a packed summary request, shaped like a process_batch result."""
+    return (await pack_task)[file_path]
+
+
+def _file_size(file_path: str) -> int:
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
 class ClassifierConfig:
     def __init__(self):
         current_dir = Path(__file__).parent
@@ -45,6 +95,9 @@ class ClassifierConfig:
             "user_configuration": self.template_manager.render_template("prompts/prompt_configurations/user_prompt_configuration.jinja2"),
             "system_documentation": self.template_manager.render_template("prompts/prompt_documentations/system_prompt_documentation.jinja2"),
             "user_documentation": self.template_manager.render_template("prompts/prompt_documentations/user_prompt_documentation.jinja2"),
+            "system_symbols": self.template_manager.render_template("prompts/prompt_docstrings/system_prompt_symbols.jinja2"),
+            "user_symbols": self.template_manager.render_template("prompts/prompt_docstrings/user_prompt_symbols.jinja2"),
+            "user_packed": self.template_manager.render_template("prompts/user_prompt_packed.jinja2"),
         }
         # Dynamically gather all GEMINI_MODEL_* env variables so that
         # adding new models is as simple as declaring them in the environment.
@@ -69,23 +122,28 @@ class ClassifierConfig:
 
         logger.info(f"Total GPT models found: {len(self.gpt_models)} - {self.gpt_models}")
 
-        if not self.file_class_models and not self.gpt_models:
-            raise ValueError("No GEMINI_MODEL_* or GPT_MODEL_* environment variables defined – at least one model is required.")
+        # Gather Anthropic models
+        self.anthropic_models: list[str] = []
+        for i in range(20):
+            anthropic_model = os.getenv(f"ANTHROPIC_MODEL_{i}")
+            if anthropic_model:
+                self.anthropic_models.append(anthropic_model)
+                setattr(self, f"anthropic_model_{i}", anthropic_model)
+
+        if not self.file_class_models and not self.gpt_models and not self.anthropic_models:
+            raise ValueError("No GEMINI_MODEL_*, GPT_MODEL_* or ANTHROPIC_MODEL_* environment variables defined – at least one model is required.")
         
         # Shared client pool for reuse across methods - initialized lazily
         self._clients_cache = None
         self._model_names_cache = None
     
-    def _get_or_create_clients(self, GEMINI_API_KEY: str = "", OPENAI_API_KEY: str = ""):
-        """Get or create shared client pool for reuse across methods"""
-        logger.info(f"_get_or_create_clients called with GEMINI_API_KEY={'***' if GEMINI_API_KEY else 'empty'}, OPENAI_API_KEY={'***' if OPENAI_API_KEY else 'empty'}")
-        logger.info(f"Available models - Gemini: {self.file_class_models}, GPT: {self.gpt_models}")
-        cache_key = (bool(GEMINI_API_KEY), bool(OPENAI_API_KEY))
+    def _get_or_create_clients(self, GEMINI_API_KEY: str = "", OPENAI_API_KEY: str = "", ANTHROPIC_API_KEY: str = ""):
+        """Get or create the shared pool of async providers, reused across methods"""
+        logger.info(f"_get_or_create_clients called with GEMINI_API_KEY={'***' if GEMINI_API_KEY else 'empty'}, OPENAI_API_KEY={'***' if OPENAI_API_KEY else 'empty'}, ANTHROPIC_API_KEY={'***' if ANTHROPIC_API_KEY else 'empty'}")
+        logger.info(f"Available models - Gemini: {self.file_class_models}, GPT: {self.gpt_models}, Anthropic: {self.anthropic_models}")
+        cache_key = (bool(GEMINI_API_KEY), bool(OPENAI_API_KEY), bool(ANTHROPIC_API_KEY))
         if self._clients_cache is not None and getattr(self, "_cache_key", None) == cache_key:
             return self._clients_cache, self._model_names_cache
-            
-        # Configure safety settings
-        safe = SAFE
 
         clients = {}
         model_names = {}
@@ -99,23 +157,10 @@ class ClassifierConfig:
                 else:
                     genai.configure()
                 
-                # Create a base client for each model
+                # Create an async provider for each model
                 for model_name in self.file_class_models:
                     try:
-                        # Create the Gemini client directly without instructor
-                        gemini_client = genai.GenerativeModel(
-                            model_name=model_name,
-                            generation_config={
-                                "temperature": 0.0,
-                                "top_p": 1,
-                                "candidate_count": 1,
-                                "max_output_tokens": 8000,
-                            },
-                            safety_settings=safe
-                        )
-                        
-                        # Store the client and model name
-                        clients[idx] = gemini_client
+                        clients[idx] = GeminiProvider(model_name, GEMINI_API_KEY)
                         model_names[idx] = model_name
                         idx += 1
                         
@@ -130,35 +175,31 @@ class ClassifierConfig:
         # --- GPT / OpenAI models ---
         if OPENAI_API_KEY and self.gpt_models:
             logger.info(f"Creating OpenAI clients for models: {self.gpt_models}")
-            try:
-                openai_client = OpenAI(api_key=OPENAI_API_KEY)
-                for gpt_model in self.gpt_models:
-                    try:
-                        # Create a simple wrapper that matches the expected interface
-                        client_wrapper = type('OpenAIClientWrapper', (), {
-                            'generate_content': lambda self, *args, **kwargs: openai_client.chat.completions.create(
-                                model=gpt_model,
-                                messages=kwargs.get('contents', []),
-                                temperature=0.0,
-                                max_tokens=8000,
-                            )
-                        })
-                        
-                        clients[idx] = client_wrapper()
-                        model_names[idx] = gpt_model
-                        logger.info(f"Added OpenAI client for model {gpt_model} at index {idx}")
-                        idx += 1
-                    except Exception as e:
-                        logger.error(f"Failed to create OpenAI client for model {gpt_model}: {e}")
-                        
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
+            for gpt_model in self.gpt_models:
+                try:
+                    clients[idx] = OpenAIProvider(gpt_model, OPENAI_API_KEY)
+                    model_names[idx] = gpt_model
+                    logger.info(f"Added OpenAI client for model {gpt_model} at index {idx}")
+                    idx += 1
+                except Exception as e:
+                    logger.error(f"Failed to create OpenAI client for model {gpt_model}: {e}")
                 
         elif OPENAI_API_KEY:
             logger.warning(f"OPENAI_API_KEY provided but no GPT models found. Available GPT models: {self.gpt_models}")
         elif self.gpt_models:
             logger.info(f"GPT models available ({self.gpt_models}) but no OPENAI_API_KEY provided")
 
+        # --- Anthropic models ---
+        if ANTHROPIC_API_KEY and self.anthropic_models:
+            for anthropic_model in self.anthropic_models:
+                try:
+                    clients[idx] = AnthropicProvider(anthropic_model, ANTHROPIC_API_KEY)
+                    model_names[idx] = anthropic_model
+                    logger.info(f"Added Anthropic client for model {anthropic_model} at index {idx}")
+                    idx += 1
+                except Exception as e:
+                    logger.error(f"Failed to create Anthropic client for model {anthropic_model}: {e}")
+
         if not clients:
             raise RuntimeError("Unable to instantiate any LLM client. Check model names and credentials.")
             
@@ -180,66 +221,26 @@ class ClassifierNode(ClassifierConfig):
     async def _execute_api_call(self, client, messages, response_model, model_name, max_retries=3, initial_delay=1):
         """Execute API call with retry logic and exponential backoff"""
         retry_count = 0
-        delay = initial_delay
-        
-        # Extract the actual Gemini client from the instructor wrapper if needed
-        gemini_client = client.client if hasattr(client, 'client') else client
+        governor = get_concurrency_governor()
         
         while retry_count < max_retries:
             try:
-                # Convert messages to Gemini format
-                contents = []
-                if isinstance(messages, list):
-                    if messages and isinstance(messages[0], dict):
-                        # Handle list of message dictionaries
-                        for msg in messages:
-                            if 'content' in msg:
-                                role = 'user' if msg.get('role') in ['user', 'assistant'] else 'model'
-                                contents.append({
-                                    'role': role,
-                                    'parts': [{'text': str(msg['content'])}]
-                                })
-                            elif 'parts' in msg and 'role' in msg:
-                                # Already in Gemini format
-                                contents.append(msg)
-                    else:
-                        # Handle list of strings
-                        contents = [{'role': 'user', 'parts': [{'text': str(msg)}]} for msg in messages]
-                elif isinstance(messages, str):
-                    # Handle single string message
-                    contents = [{'role': 'user', 'parts': [{'text': messages}]}]
-                elif isinstance(messages, dict):
-                    # Handle single message dictionary
-                    if 'content' in messages:
-                        role = 'user' if messages.get('role') in ['user', 'assistant'] else 'model'
-                        contents = [{
-                            'role': role,
-                            'parts': [{'text': str(messages['content'])}]
-                        }]
-                    elif 'parts' in messages and 'role' in messages:
-                        # Already in Gemini format
-                        contents = [messages]
-                
-                # Make direct API call to Gemini
-                response = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: gemini_client.generate_content(
-                        contents=contents,
-                        generation_config={
-                            "temperature": 0.0,
-                            "top_p": 1,
-                            "candidate_count": 1,
-                            "max_output_tokens": 8000,
-                        }
-                    )
+                # Queue on the key's RPM/TPM limits, then hold a slot of the model's concurrency window
+                reservation = await get_rate_limiter().acquire_async(
+                    client.provider, model_name, client.api_key, estimate_request_tokens(messages, MAX_OUTPUT_TOKENS)
                 )
-                
-                # Process the response
-                if hasattr(response, 'text'):
-                    return response.text
-                elif hasattr(response, 'candidates') and response.candidates:
-                    return response.candidates[0].content.parts[0].text
-                return response
+                sent = False
+                try:
+                    async with governor.slot(model_name):
+                        sent = True
+                        # Native async call, the provider converts the messages to its own format
+                        text, raw = await client.generate_text(messages)
+                finally:
+                    if not sent:
+                        reservation.refund()
+                usage = client.usage(raw)
+                reservation.settle(usage["input"] + usage["output"])
+                return text
                 
             except Exception as e:
                 retry_count += 1
@@ -247,8 +248,8 @@ class ClassifierNode(ClassifierConfig):
                     self.logger.error(f"API call failed after {max_retries} retries: {str(e)}")
                     raise
                 
-                # Exponential backoff
-                sleep_time = delay * (2 ** (retry_count - 1))
+                # Jittered exponential backoff, never shorter than the server retry hint
+                sleep_time = backoff_delay(retry_count, initial_delay, retry_after_seconds(e))
                 self.logger.warning(
                     f"API call failed with error: {str(e)}, "
                     f"retry {retry_count}/{max_retries} after {sleep_time:.1f}s"
@@ -279,8 +280,9 @@ class ClassifierNode(ClassifierConfig):
             {"role": "user", "content": full_prompt}
         ]
         
-        # Create response model for validation
-        response_model = create_file_classification(file_batch, scores)
+        # Static response model, the batch is given to its validator as context
+        response_model = FileClassifications
+        validation_context = file_classification_context(file_batch, scores)
 
         if span:
             generation = span.generation(
@@ -291,9 +293,9 @@ class ClassifierNode(ClassifierConfig):
             )
 
         try:
-            # For Gemini models
-            if "gemini" in model_name.lower() or "gemma" in model_name.lower():
-                self.logger.info(f"Batch {batch_id}: Starting Gemini API call with retry logic")
+            # Every provider (Gemini, OpenAI, Anthropic) exposes the same async text generation
+            if client_gemini is not None:
+                self.logger.info(f"Batch {batch_id}: Starting {client_gemini.provider} API call with retry logic")
                 
                 # Make the API call
                 response = await self._execute_api_call(
@@ -329,17 +331,23 @@ class ClassifierNode(ClassifierConfig):
                         import json
                         response_data = json.loads(response_text)
                         self.logger.info(f"Batch {batch_id}: Successfully parsed JSON response")
+                        # Feed the validation outcome back to the batch packer
+                        try:
+                            response_model.model_validate(response_data, context=validation_context)
+                            get_batch_packer().record(model_name, success=True)
+                        except Exception as ve:
+                            get_batch_packer().record(model_name, success=False)
+                            self.logger.warning(f"Batch {batch_id}: Classification failed validation: {str(ve)[:500]}")
                         return response_data
                     except json.JSONDecodeError as je:
                         self.logger.warning(f"Batch {batch_id}: Failed to parse response as JSON: {str(je)}")
                 
+                get_batch_packer().record(model_name, success=False)
                 # If we get here, return the text response
                 return {"text": response_text}
                     
-            # For OpenAI models (kept for compatibility)
             else:
-                self.logger.info(f"Batch {batch_id}: OpenAI model detected, but direct API calls not fully implemented")
-                raise NotImplementedError("Direct OpenAI API calls need to be implemented")
+                raise ValueError(f"No client available for model {model_name}")
                 
         except Exception as e:
             self.logger.error(f"Batch {batch_id}: Error processing batch: {str(e)}\n{traceback.format_exc()}")
@@ -405,40 +413,80 @@ class ClassifierNode(ClassifierConfig):
     async def llmclassifier(
         self,
         folder_path: str,
-        batch_size: int = 25,  # Increased batch size for better efficiency
-        max_workers: int = 5,   # Reduced concurrency to avoid overwhelming the API
+        batch_size: int = 25,  # Kept for API compatibility, batches are packed by token budget
+        max_workers: int = 5,   # Kept for API compatibility, concurrency is adapted per model
         GEMINI_API_KEY: str = "",
         ANTHROPIC_API_KEY: str = "",
         OPENAI_API_KEY: str = "",
-        trace_id: str = ""
+        trace_id: str = "",
+        progress: Optional[Callable[[dict], None]] = None,
+        file_paths: Optional[List[str]] = None,
     ) -> str:
         span = get_langfuse_context().get("span")
 
         scores = [0]
 
         # Use shared client pool for better performance
-        clients, model_names = self._get_or_create_clients(GEMINI_API_KEY, OPENAI_API_KEY)
+        clients, model_names = self._get_or_create_clients(GEMINI_API_KEY, OPENAI_API_KEY, ANTHROPIC_API_KEY)
+
+        # Get file names, unless the caller already selected the files of this run
+        if file_paths is None:
+            files_structure = list_all_files(folder_path, include_md=True)
+            file_names = files_structure["all_files_no_path"]
+            files_paths = files_structure["all_files_with_path"]
+        else:
+            files_paths = list(file_paths)
+            file_names = [
+                {"file_name": os.path.basename(path), "file_id": file_id} for file_id, path in enumerate(files_paths)
+            ]
+
+        # Classify the files whose type is obvious locally, only ambiguous ones go to the LLM
+        local_classifications, file_names = split_files_by_rules(file_names, files_paths, folder_path)
+        self.logger.info(
+            f"Pre-classified {len(local_classifications)} files locally, "
+            f"{len(file_names)} ambiguous files sent to the LLM"
+        )
 
-        # Get file names
-        files_structure = list_all_files(folder_path, include_md=True)
+        # Pack files into batches sized by the token budget of each model
+        batches = get_batch_packer().pack(
+            file_names,
+            [model_names[i] for i in range(len(clients))],
+            self.prompts_config["system_classification"] + self.prompts_config["user_classification"],
+        )
 
-        file_names = files_structure["all_files_no_path"]
-        files_paths = files_structure["all_files_with_path"]
+        all_results = {"file_classifications": local_classifications}
 
-        # Split files into batches
-        batches = [
-            file_names[i : i + batch_size] for i in range(0, len(file_names), batch_size)
-        ]
+        total_files = len(local_classifications) + len(file_names)
+        classified_count = len(local_classifications)
+
+        def publish_classifications(classifications):
+            report_progress(progress, {
+                "event": "classification",
+                "file_classifications": [
+                    {**classification, "file_paths": files_paths[classification["file_id"]]}
+                    for classification in classifications
+                ],
+            })
+            report_progress(progress, {
+                "event": "progress", "stage": "classification", "done": classified_count, "total": total_files,
+            })
 
-        all_results = {"file_classifications": []}
+        def on_batch_done(result):
+            nonlocal classified_count
+            classifications = result.get("file_classifications", [])
+            classified_count += len(classifications)
+            publish_classifications(classifications)
+
+        if progress is not None:
+            publish_classifications(local_classifications)
 
         # Process batches in parallel using asyncio
         tasks = []
-        for index, batch in enumerate(batches):
+        for batch, client_index in batches:
             task = self.process_batch(
                 batch,
-                clients[index % len(clients)],
-                model_names[index % len(clients)],
+                clients[client_index],
+                model_names[client_index],
                 self.prompts_config["system_classification"],
                 self.prompts_config["user_classification"],
                 scores,
@@ -446,14 +494,10 @@ class ClassifierNode(ClassifierConfig):
             )
             tasks.append(task)
 
-        # Use asyncio.gather with semaphore to limit concurrency
-        semaphore = asyncio.Semaphore(max_workers)
-        
-        async def bounded_task(task):
-            async with semaphore:
-                return await task
-
-        bounded_tasks = [bounded_task(task) for task in tasks]
+        # API concurrency is bounded per model by the shared concurrency governor
+        bounded_tasks = tasks
+        if progress is not None:
+            bounded_tasks = [_notify_when_done(task, on_batch_done) for task in tasks]
         
         try:
             results = await asyncio.gather(*bounded_tasks)
@@ -475,6 +519,264 @@ class InformationCompressorNode(ClassifierConfig):
     def __init__(self):
         super().__init__()
     
+    async def _summarize_prompt(
+        self,
+        batch_prompt: str,
+        pydantic_model,
+        system_prompt: str,
+        clients_to_try: list,
+        span=None,
+        log_name=None,
+        validation_context=None,
+        timeout: float = 8.0,
+    ):
+        """Try each client in turn until one returns a valid structured summary of batch_prompt."""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": batch_prompt},
+        ]
+
+        # --- Langfuse Span Setup ---
+        generation = None
+        if span:
+            # Create the generation span *before* the retry loop
+            generation = span.generation(
+                name=f"{log_name}_attempt", # Initial name, might update later
+                model=clients_to_try[0][1], # Initial model
+                model_parameters={"temperature": 0, "top_p": 1, "max_new_tokens": 8000},
+                input={"system_prompt": system_prompt, "user_prompt": batch_prompt},
+            )
+
+        last_status_message = ""
+        latency_tracker = get_latency_tracker()
+
+        async def run_attempt(current_client, current_model_name, sent: asyncio.Event):
+            # Native async structured call, cancelled by wait_for on timeout.
+            # Waiting for rate limit capacity or a concurrency slot does not count against the timeout.
+            # sent is set once the request is actually sent, after that wait.
+            reservation = await get_rate_limiter().acquire_async(
+                current_client.provider,
+                current_model_name,
+                current_client.api_key,
+                estimate_request_tokens(messages, MAX_OUTPUT_TOKENS),
+            )
+            try:
+                async with get_concurrency_governor().slot(current_model_name):
+                    sent.set()
+                    started = time.monotonic()
+                    completion, raw = await asyncio.wait_for(
+                        current_client.create_structured(
+                            messages, pydantic_model, max_retries=1, validation_context=validation_context
+                        ),
+                        timeout=timeout,
+                    )
+            finally:
+                if not sent.is_set():
+                    # Cancelled while waiting for a slot (hedge loser), the request was never sent
+                    reservation.refund()
+            latency_tracker.record(current_model_name, time.monotonic() - started)
+            usage = current_client.usage(raw)
+            reservation.settle(usage["input"] + usage["output"])
+            return completion.model_dump(), usage
+
+        # Hedged attempts: when the latest attempt is slower than its model's usual
+        # latency percentile, a duplicate is sent to the next fallback client without
+        # cancelling the first one. A failure starts the next client right away.
+        # The hedge delay only runs once the latest attempt is sent: an attempt still
+        # queued on the rate limiter or the governor is never duplicated, that would
+        # only add load where capacity is already saturated.
+        pending = {}
+        next_attempt = 0
+        hedged = False
+        latest_sent = None
+
+        def launch():
+            nonlocal next_attempt, latest_sent
+            current_client, current_model_name = clients_to_try[next_attempt]
+            latest_sent = asyncio.Event()
+            task = asyncio.create_task(run_attempt(current_client, current_model_name, latest_sent))
+            pending[task] = (next_attempt, current_model_name)
+            next_attempt += 1
+            return current_model_name
+
+        latest_model_name = launch()
+        try:
+            while pending:
+                hedge_delay = latency_tracker.hedge_delay(latest_model_name) if next_attempt < len(clients_to_try) else None
+                if hedge_delay is not None and not latest_sent.is_set():
+                    # Wait for the latest attempt to be sent (or any attempt to finish) before timing it
+                    sent_waiter = asyncio.create_task(latest_sent.wait())
+                    done, _ = await asyncio.wait([*pending, sent_waiter], return_when=asyncio.FIRST_COMPLETED)
+                    sent_waiter.cancel()
+                    done.discard(sent_waiter)
+                    if not done:
+                        continue
+                else:
+                    done, _ = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    logger.info(f"{log_name}: {latest_model_name} slower than {hedge_delay:.1f}s, hedging on the next model")
+                    latest_model_name = launch()
+                    hedged = True
+                    continue
+
+                for task in done:
+                    attempt, current_model_name = pending.pop(task)
+                    try:
+                        result, usage = task.result()
+                    except asyncio.TimeoutError:
+                        last_status_message = f"Attempt {attempt + 1} timed out after {timeout:.0f}s (Model: {current_model_name})"
+                    except Exception as e:
+                        last_status_message = f"Attempt {attempt + 1} failed (Model: {current_model_name}): {str(e)}, {traceback.format_exc()}"
+                    else:
+                        # --- Success ---
+                        if hedged:
+                            latency_tracker.record_hedge(won=attempt > 0)
+                        if generation:
+                            # Update generation details for the successful attempt
+                            generation.model = current_model_name
+                            generation.end(
+                                output=result,
+                                usage=usage,
+                                level="DEFAULT", # Explicitly set level to DEFAULT for success
+                                status_message=f"Success on attempt {attempt + 1}"
+                            )
+                        return result, current_model_name
+
+                    # Update generation span for failed attempt if it exists
+                    if generation:
+                        generation.status_message=last_status_message # Keep updating status message on failures
+                        generation.model = current_model_name # Ensure model name reflects the failed attempt
+
+                if not pending and next_attempt < len(clients_to_try):
+                    latest_model_name = launch()
+        finally:
+            # Cancel the losers of a hedge
+            for task in pending:
+                task.cancel()
+
+        # --- All attempts failed ---
+        if generation:
+            generation.end(
+                output=None,
+                status_message=last_status_message,
+                level="ERROR",
+            )
+        return None, None
+
+    async def _summarize_in_chunks(
+        self,
+        file_path: str,
+        file_content: str,
+        system_prompt: str,
+        user_prompt: str,
+        clients_to_try: list,
+        span=None,
+        log_name=None,
+        validation_context=None,
+        skeleton: str = "",
+    ):
+        """
+        Summarize a large source file chunk by chunk, concurrently, and merge the CodeStructure results.
+
+        The skeleton (outline of the whole file) is sent with every chunk so that
+        each part is described knowing the structure it belongs to.
+
+        Returns:
+            tuple: (structure, model name) with model name None when some chunks
+                   failed and the structure only covers the others
+        """
+        chunks = split_source(file_path, file_content)
+        logger.info(f"Summarizing {file_path} in {len(chunks)} chunks ({len(file_content)} chars)")
+
+        async def summarize_chunk(chunk_index: int, chunk: str):
+            chunk_prompt = (
+                user_prompt
+                + "\n"
+                + (skeleton + "\n\n" if skeleton else "")
+                + f"# Part {chunk_index + 1}/{len(chunks)} of {os.path.basename(file_path)}\n"
+                + chunk
+            )
+            # Spread the chunks over the clients so they do not all hit the same model first
+            rotation = chunk_index % len(clients_to_try)
+            rotated_clients = clients_to_try[rotation:] + clients_to_try[:rotation]
+            return await self._summarize_prompt(
+                chunk_prompt,
+                CodeStructure,
+                system_prompt,
+                rotated_clients,
+                span,
+                log_name,
+                validation_context,
+            )
+
+        chunk_results = await asyncio.gather(
+            *(summarize_chunk(i, chunk) for i, chunk in enumerate(chunks))
+        )
+        parts = [result for result, _ in chunk_results if result]
+        if not parts:
+            return None, None
+        model_name = next(model for result, model in chunk_results if result)
+        if len(parts) < len(chunks):
+            logger.warning(f"{len(chunks) - len(parts)}/{len(chunks)} chunks of {file_path} could not be summarized")
+            # Keep the partial structure, but do not cache it so the missing chunks are retried next time
+            model_name = None
+        return merge_code_structures(parts), model_name
+
+    async def _summarize_python(
+        self,
+        file_path: str,
+        structure: dict,
+        gaps: list,
+        clients_to_try: list,
+        span=None,
+    ):
+        """
+        Complete the CodeStructure extracted from the AST and docstrings of a Python file,
+        asking the LLM only for the symbols whose docstring is missing or thin.
+
+        Returns:
+            tuple: (structure, model name) with model name "ast" when no LLM call was
+                   needed and None when the LLM failed and the gaps were left empty
+        """
+        if not gaps:
+            return structure, "ast"
+
+        # Usually one request per file, split only when the undocumented code is large
+        gap_groups = [[]]
+        group_chars = 0
+        for gap in gaps:
+            if gap_groups[-1] and group_chars + len(gap.source) > CHUNK_TARGET_CHARS:
+                gap_groups.append([])
+                group_chars = 0
+            gap_groups[-1].append(gap)
+            group_chars += len(gap.source)
+
+        async def describe(group):
+            prompt = self.prompts_config["user_symbols"] + "\n" + format_gaps_prompt(os.path.basename(file_path), group)
+            return await self._summarize_prompt(
+                prompt,
+                SymbolDescriptions,
+                self.prompts_config["system_symbols"],
+                clients_to_try,
+                span,
+                "docstring_symbols",
+                symbol_descriptions_context([gap.symbol for gap in group]),
+            )
+
+        group_results = await asyncio.gather(*(describe(group) for group in gap_groups))
+        descriptions = {}
+        for result, _ in group_results:
+            for item in (result or {}).get("descriptions", []):
+                descriptions[item["symbol_name"]] = item["description"]
+        logger.info(f"Described {len(descriptions)}/{len(gaps)} undocumented symbols of {file_path} with the LLM")
+
+        model_name = next((model for result, model in group_results if result), None)
+        if any(result is None for result, _ in group_results):
+            # Keep the structure, but do not cache it so the gaps are retried next time
+            model_name = None
+        return fill_gaps(structure, descriptions), model_name
+
     async def process_batch(
         self,
         file_batch: str,
@@ -486,10 +788,16 @@ class InformationCompressorNode(ClassifierConfig):
         span=None,
         index=None,
         log_name=None,
-        fallback_clients: list[instructor.Instructor] = None,
+        fallback_clients: list[AsyncLLMProvider] = None,
         fallback_model_names: list[str] = None,
+        symbol_tables: Optional[dict] = None,
     ) -> dict:
-        """Process a batch of files using Gemini API with timeout and retries."""
+        """
+        Process a batch of files using Gemini API with timeout and retries.
+
+        Source files get a symbol table built without the LLM, stored in symbol_tables
+        (by file path) when given, even if their summary comes from the cache.
+        """
         batch_prompt = ""
         try:
             # Use async file reading for non-blocking I/O
@@ -499,28 +807,41 @@ class InformationCompressorNode(ClassifierConfig):
         except Exception as e:
             return None, None
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": batch_prompt},
-        ]
+        # Python sources are summarized from their AST, the LLM only describes undocumented symbols
+        is_python = log_name == "docstring" and file_batch.endswith(".py")
 
+        # Hashing and parsing run in the CPU pool, not in the event loop thread
+        cpu_pool = get_cpu_pool()
+        content_hash, symbols = await cpu_pool.run(
+            digest_source, file_batch, file_content, log_name, size=len(file_content)
+        )
+        if symbols is not None and symbol_tables is not None:
+            symbol_tables[file_batch] = symbols
+
+        # --- Summary cache lookup: the same bytes may already have been summarized ---
+        summary_cache = get_summary_cache()
+        if is_python:
+            prompt_hash = hash_prompt(self.prompts_config["system_symbols"], self.prompts_config["user_symbols"] + EXTRACTOR_VERSION)
+        else:
+            prompt_hash = hash_prompt(system_prompt, user_prompt)
+        cache_model_names = ["ast", model_name] + list(fallback_model_names or [])
+        cached_summary = summary_cache.get(content_hash, log_name, prompt_hash, cache_model_names)
+        if cached_summary is not None:
+            return cached_summary, index
+
+        # Identifiers of the file, tokenized once and shared by every attempt and chunk.
+        # Names only mentioned in comments or strings are not symbols of the file.
+        extraction, validation_context = None, None
         if log_name == "docstring":
-            pydantic_model = generate_code_structure_model_consize(batch_prompt)
-        elif log_name == "documentation":
-            pydantic_model = DocumentCompression
-        else: # config
-            pydantic_model = YamlBrief
-
-        # --- Langfuse Span Setup ---
-        generation = None
-        if span:
-            # Create the generation span *before* the retry loop
-            generation = span.generation(
-                name=f"{log_name}_attempt", # Initial name, might update later
-                model=model_name, # Initial model
-                model_parameters={"temperature": 0, "top_p": 1, "max_new_tokens": 8000},
-                input={"system_prompt": system_prompt, "user_prompt": batch_prompt},
+            extraction, validation_context = await cpu_pool.run(
+                analyze_source, file_batch, file_content, is_python, symbols is not None, size=len(file_content)
             )
+            if is_python and extraction is None:
+                # Not parseable as Python, summarized and cached like any other source
+                prompt_hash = hash_prompt(system_prompt, user_prompt)
+                cached_summary = summary_cache.get(content_hash, log_name, prompt_hash, cache_model_names)
+                if cached_summary is not None:
+                    return cached_summary, index
 
         # --- Retry Logic ---
         max_attempts = 4 # 1 initial + 3 retries
@@ -528,100 +849,176 @@ class InformationCompressorNode(ClassifierConfig):
         # Ensure we don't try more clients than available or exceed max_attempts
         clients_to_try = clients_to_try[:max_attempts]
 
-        last_exception = None
-        last_status_message = ""
+        result = None
+        if extraction is not None:
+            result, result_model_name = await self._summarize_python(file_batch, *extraction, clients_to_try, span)
+        skeleton = format_skeleton(symbols, os.path.basename(file_batch)) if symbols else ""
 
-        for attempt, (current_client, current_model_name) in enumerate(clients_to_try):
-            try:
-                # Use asyncio.wait_for for timeout instead of ThreadPoolExecutor
-                async def api_call_task():
-                    if "gemini" in current_model_name.lower() or "gemma" in current_model_name.lower():
-                        # Gemini API
-                        return await asyncio.get_event_loop().run_in_executor(
-                            None,
-                            lambda: current_client.chat.create_with_completion(
-                                messages=messages,
-                                response_model=pydantic_model,
-                                generation_config={
-                                    "temperature": 0.0,
-                                    "top_p": 1,
-                                    "candidate_count": 1,
-                                    "max_output_tokens": 8000,
-                                },
-                                max_retries=1,
-                            )
-                        )
-                    else:
-                        # OpenAI API
-                        return await asyncio.get_event_loop().run_in_executor(
-                            None,
-                            lambda: current_client.chat.completions.create_with_completion(
-                                model=current_model_name,
-                                messages=messages,
-                                response_model=pydantic_model,
-                                temperature=0.0,
-                                top_p=1,
-                                max_tokens=8000,
-                                max_retries=1,
-                            )
-                        )
-
-                completion, raw = await asyncio.wait_for(api_call_task(), timeout=8.0)
-
-                # --- Success ---
-                result = completion.model_dump()
-                if generation:
-                    # Update generation details for the successful attempt
-                    generation.model = current_model_name
-                    generation.end(
-                        output=result,
-                        usage={
-                            "input": raw.usage_metadata.prompt_token_count,
-                            "output": raw.usage_metadata.candidates_token_count,
-                        },
-                        level="DEFAULT", # Explicitly set level to DEFAULT for success
-                        status_message=f"Success on attempt {attempt + 1}"
-                    )
-                return result, index
+        if result is None and skeleton and len(file_content) > SKELETON_ONLY_THRESHOLD_CHARS:
+            # Huge sources (bundles, generated code) would take dozens of chunk requests
+            result, result_model_name = await self._summarize_prompt(
+                user_prompt + "\n" + skeleton, CodeStructure, system_prompt, clients_to_try, span, log_name,
+                validation_context,
+            )
+        if result is None and log_name == "docstring" and len(file_content) > CHUNK_THRESHOLD_CHARS:
+            # Large source files time out as a single prompt, summarize them in pieces
+            result, result_model_name = await self._summarize_in_chunks(
+                file_batch, file_content, system_prompt, user_prompt, clients_to_try, span, log_name,
+                validation_context, skeleton,
+            )
+        elif result is None:
+            if log_name == "docstring":
+                pydantic_model = CodeStructure
+            elif log_name == "documentation":
+                pydantic_model = DocumentCompression
+            else: # config
+                pydantic_model = YamlBrief
+
+            result, result_model_name = await self._summarize_prompt(
+                batch_prompt, pydantic_model, system_prompt, clients_to_try, span, log_name,
+                validation_context,
+            )
 
-            except asyncio.TimeoutError:
-                last_status_message = f"Attempt {attempt + 1} timed out after 5s (Model: {current_model_name})"
-                last_exception = asyncio.TimeoutError(last_status_message) # Store exception type
+        if result is None:
+            return None, None
 
-            except Exception as e:
-                last_status_message = f"Attempt {attempt + 1} failed (Model: {current_model_name}): {str(e)}, {traceback.format_exc()}"
-                last_exception = e # Store the exception
+        if result_model_name is not None:
+            summary_cache.put(content_hash, log_name, prompt_hash, result_model_name, result)
+        return result, index
 
-            # Update generation span for failed attempt if it exists
-            if generation:
-                generation.status_message=last_status_message # Keep updating status message on failures
-                generation.model = current_model_name # Ensure model name reflects the failed attempt
+    async def process_pack(
+        self,
+        file_paths: List[str],
+        client_gemini,
+        model_name,
+        system_prompt: str,
+        user_prompt: str,
+        scores: list[int],
+        span=None,
+        log_name=None,
+        fallback_clients: list[AsyncLLMProvider] = None,
+        fallback_model_names: list[str] = None,
+        symbol_tables: Optional[dict] = None,
+    ) -> Dict[str, tuple]:
+        """
+        Summarize several small files of one category with a single request.
+
+        Files found in the summary cache are not sent. The others are sent together,
+        each under a "# File: <path>" header, and every entry of the keyed response
+        is validated on its own; only the missing or invalid entries are summarized
+        again, one request each, with process_batch.
+
+        Returns:
+            dict: (summary, file path) by file path, like the process_batch results
+        """
+        entry_model = {"docstring": CodeStructure, "documentation": DocumentCompression}.get(log_name, YamlBrief)
+        summary_cache = get_summary_cache()
+        prompt_hash = hash_prompt(system_prompt, user_prompt)
+        cache_model_names = [model_name] + list(fallback_model_names or [])
+
+        results = {}
+        pending = {}  # file path -> (content, content hash, validation context)
+        for file_path in file_paths:
+            try:
+                async with aiofiles.open(file_path, "r") as f:
+                    file_content = await f.read()
+            except Exception:
+                results[file_path] = (None, None)
+                continue
+            # Packed files are small, these run in the event loop thread
+            content_hash, symbols = digest_source(file_path, file_content, log_name)
+            if symbols is not None and symbol_tables is not None:
+                symbol_tables[file_path] = symbols
+            validation_context = None
+            if log_name == "docstring":
+                _, validation_context = analyze_source(file_path, file_content, False, symbols is not None)
+            cached_summary = summary_cache.get(content_hash, log_name, prompt_hash, cache_model_names)
+            if cached_summary is not None:
+                results[file_path] = (cached_summary, file_path)
+            else:
+                pending[file_path] = (file_content, content_hash, validation_context)
+
+        failed = list(pending)
+        if len(pending) > 1:
+            root = os.path.commonpath(list(pending))
+            keys = {os.path.relpath(file_path, root): file_path for file_path in pending}
+            packed_prompt = (
+                user_prompt
+                + "\n"
+                + self.prompts_config["user_packed"]
+                + "\nEach summary follows this JSON schema:\n"
+                + json.dumps(entry_model.model_json_schema())
+                + "\n\n"
+                + "\n\n".join(f"# File: {key}\n{pending[file_path][0]}" for key, file_path in keys.items())
+            )
+            clients_to_try = [(client_gemini, model_name)] + list(zip(fallback_clients or [], fallback_model_names or []))
+            packed, packed_model_name = await self._summarize_prompt(
+                packed_prompt,
+                PackedSummaries,
+                system_prompt,
+                clients_to_try[:4],
+                span,
+                f"{log_name}_packed",
+                timeout=8.0 * min(len(keys), 4),
+            )
 
-        # --- All attempts failed ---
-        if generation:
-            generation.end(
-                output=None,
-                status_message=last_status_message,
-                level="ERROR",
+            entries = {
+                os.path.normpath(entry["file_path"].strip()): entry["summary"]
+                for entry in (packed or {}).get("summaries", [])
+            }
+            failed = []
+            for key, file_path in keys.items():
+                file_content, content_hash, validation_context = pending[file_path]
+                try:
+                    summary = entry_model.model_validate(entries[key], context=validation_context).model_dump()
+                except (KeyError, ValidationError):
+                    failed.append(file_path)
+                    continue
+                summary_cache.put(content_hash, log_name, prompt_hash, packed_model_name, summary)
+                results[file_path] = (summary, file_path)
+            logger.info(
+                f"Packed {log_name} request: {len(keys) - len(failed)}/{len(keys)} files summarized"
+                + (f", {len(failed)} re-queued individually" if failed else "")
             )
-        return None, None
+
+        # Entries the packed request did not get right are summarized on their own
+        single_results = await asyncio.gather(*(
+            self.process_batch(
+                file_path,
+                client_gemini,
+                model_name,
+                system_prompt,
+                user_prompt,
+                scores,
+                span,
+                file_path,
+                log_name=log_name,
+                fallback_clients=fallback_clients,
+                fallback_model_names=fallback_model_names,
+                symbol_tables=symbol_tables,
+            )
+            for file_path in failed
+        ))
+        results.update(zip(failed, single_results))
+        return results
 
     @trace
     async def summerizer(
         self,
         classified_files: dict,
         batch_size: int = 10,  # Smaller batches for better parallelism
-        max_workers: int = 80,  # Number of parallel workers
+        max_workers: int = 80,  # Kept for API compatibility, concurrency is adapted per model
         GEMINI_API_KEY: str = "",
         ANTHROPIC_API_KEY: str = "",
         OPENAI_API_KEY: str = "",
-        trace_id: str = ""
+        trace_id: str = "",
+        progress: Optional[Callable[[dict], None]] = None,
     ) -> str:
         span = get_langfuse_context().get("span")
         scores = [0]
 
         # Use shared client pool for better performance
-        clients, model_names = self._get_or_create_clients(GEMINI_API_KEY, OPENAI_API_KEY)
+        clients, model_names = self._get_or_create_clients(GEMINI_API_KEY, OPENAI_API_KEY, ANTHROPIC_API_KEY)
 
         # Prepare file lists for each category
         files_structure_docstring = []
@@ -647,11 +1044,36 @@ class InformationCompressorNode(ClassifierConfig):
         # Combine all files to process
         all_files_to_process = files_structure_docstring + files_structure_documentation + files_structure_config
 
+        # Copies of a file (vendored code, generated clients, repeated configs) are
+        # summarized once, through their first occurrence, and get the same summary
+        duplicates = await asyncio.to_thread(find_duplicates, all_files_to_process)
+        all_files_to_process = [entry for entry in all_files_to_process if entry[0] not in duplicates]
+
         # Temporary storage for results
         results_docstring = {}
         results_documentation = {}
         results_config = {}
 
+        # Symbol tables of the source files, by file path, returned as the symbol index
+        symbol_tables = {}
+
+        # Small files are summarized several per request, by category. Python sources
+        # are left out, their AST usually describes them without any request.
+        packs_by_path = {}
+        for category in ("docstring", "documentation", "config"):
+            small_files = []
+            for file_path, file_category in all_files_to_process:
+                if file_category != category or file_path.endswith(".py"):
+                    continue
+                size = _file_size(file_path)
+                if size <= SUMMARY_PACK_MAX_FILE_CHARS:
+                    small_files.append((file_path, size))
+            for pack in pack_small_files(small_files):
+                if len(pack) > 1:
+                    for file_path in pack:
+                        packs_by_path[file_path] = pack
+        pack_tasks = {}
+
         # Create tasks for all files
         tasks = []
         file_to_category = {}
@@ -676,30 +1098,63 @@ class InformationCompressorNode(ClassifierConfig):
                 user_prompt = self.prompts_config["user_configuration"]
                 log_name = "config"
 
-            task = self.process_batch(
-                file_path,
-                client,
-                model_name,
-                system_prompt,
-                user_prompt,
-                scores,
-                span,
-                file_path, # Pass file_path as identifier instead of original index
-                log_name=log_name,
-                fallback_clients=fallback_clients,
-                fallback_model_names=fallback_model_names,
-            )
+            pack = packs_by_path.get(file_path)
+            if pack is not None:
+                # One request for the whole pack, started with its first file
+                if id(pack) not in pack_tasks:
+                    pack_tasks[id(pack)] = asyncio.ensure_future(self.process_pack(
+                        pack,
+                        client,
+                        model_name,
+                        system_prompt,
+                        user_prompt,
+                        scores,
+                        span,
+                        log_name=log_name,
+                        fallback_clients=fallback_clients,
+                        fallback_model_names=fallback_model_names,
+                        symbol_tables=symbol_tables,
+                    ))
+                task = _pack_entry(pack_tasks[id(pack)], file_path)
+            else:
+                task = self.process_batch(
+                    file_path,
+                    client,
+                    model_name,
+                    system_prompt,
+                    user_prompt,
+                    scores,
+                    span,
+                    file_path, # Pass file_path as identifier instead of original index
+                    log_name=log_name,
+                    fallback_clients=fallback_clients,
+                    fallback_model_names=fallback_model_names,
+                    symbol_tables=symbol_tables,
+                )
             tasks.append(task)
             file_to_category[i] = (file_path, category)
 
-        # Use asyncio.gather with semaphore to limit concurrency
-        semaphore = asyncio.Semaphore(max_workers)
-        
-        async def bounded_task(task):
-            async with semaphore:
-                return await task
+        # API concurrency is bounded per model by the shared concurrency governor
+        bounded_tasks = tasks
+        if progress is not None:
+            summarized_count = 0
+
+            def on_file_done(index):
+                def on_done(result):
+                    nonlocal summarized_count
+                    summarized_count += 1
+                    file_path, category = file_to_category[index]
+                    processed_result, _ = result
+                    if processed_result:
+                        report_progress(progress, {
+                            "event": "summary", "file_paths": file_path, "category": category, "summary": processed_result,
+                        })
+                    report_progress(progress, {
+                        "event": "progress", "stage": "summarization", "done": summarized_count, "total": len(tasks),
+                    })
+                return on_done
 
-        bounded_tasks = [bounded_task(task) for task in tasks]
+            bounded_tasks = [_notify_when_done(task, on_file_done(i)) for i, task in enumerate(tasks)]
         
         try:
             results = await asyncio.gather(*bounded_tasks, return_exceptions=True)
@@ -721,6 +1176,16 @@ class InformationCompressorNode(ClassifierConfig):
         except Exception as e:
             pass
 
+        for results_by_path in (results_docstring, results_documentation, results_config):
+            for file_path, representative in duplicates.items():
+                if representative in results_by_path:
+                    results_by_path[file_path] = results_by_path[representative]
+        for file_path, representative in duplicates.items():
+            if representative in symbol_tables:
+                symbol_tables[file_path] = symbol_tables[representative]
+
+        logger.info(f"Summary cache stats: {get_summary_cache().stats()}")
+
         # Structure the final output
         output_documentation = []
         output_documentation_md = []
@@ -734,7 +1199,7 @@ class InformationCompressorNode(ClassifierConfig):
             if original_index is not None:
                 file_data = classified_files["file_classifications"][original_index].copy()
                 file_data["documentation"] = result
-                file_data["file_id"] = len(output_documentation) # Assign new sequential ID
+                file_data["file_id"] = stable_file_id(file_path)
                 output_documentation.append(file_data)
                 processed_indices.add(original_index)
 
@@ -744,7 +1209,7 @@ class InformationCompressorNode(ClassifierConfig):
             if original_index is not None:
                 file_data = classified_files["file_classifications"][original_index].copy()
                 file_data["documentation"] = result # Add result under 'documentation' key
-                file_data["file_id"] = len(output_documentation_md)
+                file_data["file_id"] = stable_file_id(file_path)
                 output_documentation_md.append(file_data)
                 processed_indices.add(original_index)
 
@@ -754,7 +1219,7 @@ class InformationCompressorNode(ClassifierConfig):
             if original_index is not None:
                 file_data = classified_files["file_classifications"][original_index].copy()
                 file_data["documentation_config"] = result # Add result under 'documentation_config' key
-                file_data["file_id"] = len(output_config)
+                file_data["file_id"] = stable_file_id(file_path)
                 output_config.append(file_data)
                 processed_indices.add(original_index)
 
@@ -762,6 +1227,7 @@ class InformationCompressorNode(ClassifierConfig):
             "documentation": output_documentation,
             "documentation_md": output_documentation_md,
             "config": output_config,
+            "symbols": symbol_tables,
         }
 
 
@@ -772,29 +1238,127 @@ class ClassifierService:
         self.information_compressor_node = InformationCompressorNode()
         self.trace_id = generate_trace_id()
         
-    async def run_pipeline(self, folder_path: str, batch_size: int = 10, max_workers: int = 100, GEMINI_API_KEY: str = "", ANTHROPIC_API_KEY: str = "", OPENAI_API_KEY: str = ""):
+    async def run_pipeline(self, folder_path: str, batch_size: int = 10, max_workers: int = 100, GEMINI_API_KEY: str = "", ANTHROPIC_API_KEY: str = "", OPENAI_API_KEY: str = "", progress: Optional[Callable[[dict], None]] = None, file_paths: Optional[List[str]] = None):
+        """
+        Classify and summarize the files of a folder, most important files first.
+
+        Files are ordered by importance (see priority.score_files) and indexed in
+        tiers: once the first tier is summarized, a {"event": "partial", "tier",
+        "tiers", "result"} event carries a usable index of those files, then the
+        rest of the repository is indexed and merged into the final result.
+
+        Args:
+            progress (Callable): Optional callback receiving classification, summary,
+                partial and progress events as they are produced
+            file_paths (list): Full paths of the files to index, all the valid files of the folder when None
+        """
         trace_id = generate_trace_id()
-        # Classifier Node
-        classifier_result = await self.classifier_node.llmclassifier(
-            folder_path, 
-            batch_size, 
-            max_workers, 
-            GEMINI_API_KEY, 
-            ANTHROPIC_API_KEY, 
-            OPENAI_API_KEY, 
-            trace_id=trace_id 
+        result = {"documentation": [], "documentation_md": [], "config": [], "symbols": {}}
+        if file_paths is None:
+            files_paths = list_all_files(folder_path, include_md=True)["all_files_with_path"]
+        else:
+            files_paths = list(file_paths)
+        if not files_paths:
+            return result
+        tiers = split_tiers(await asyncio.to_thread(prioritize_files, folder_path, files_paths))
+        if len(tiers) > 1:
+            logger.info(f"Indexing {folder_path} in {len(tiers)} tiers, {len(tiers[0])} files first")
+
+        for tier_index, tier_paths in enumerate(tiers):
+            # Classifier Node
+            classifier_result = await self.classifier_node.llmclassifier(
+                folder_path,
+                batch_size,
+                max_workers,
+                GEMINI_API_KEY,
+                ANTHROPIC_API_KEY,
+                OPENAI_API_KEY,
+                trace_id=trace_id,
+                progress=progress,
+                file_paths=tier_paths,
+            )
+            # Information Compressor Node
+            information_compressor_result = await self.information_compressor_node.summerizer(
+                classifier_result,
+                batch_size,
+                max_workers,
+                GEMINI_API_KEY,
+                ANTHROPIC_API_KEY,
+                OPENAI_API_KEY,
+                trace_id=trace_id,  # Pass trace_id explicitly
+                progress=progress,
+            )
+            result = merge_pipeline_results(result, information_compressor_result)
+            if tier_index < len(tiers) - 1:
+                report_progress(progress, {
+                    "event": "partial", "tier": tier_index + 1, "tiers": len(tiers), "result": result,
+                })
+        return result
+
+    async def run_delta(
+        self,
+        folder_path: str,
+        changed_paths: List[str],
+        deleted_paths: List[str],
+        previous_index_version: Optional[int] = None,
+        batch_size: int = 10,
+        max_workers: int = 100,
+        GEMINI_API_KEY: str = "",
+        ANTHROPIC_API_KEY: str = "",
+        OPENAI_API_KEY: str = "",
+        progress: Optional[Callable[[dict], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Classify and summarize only the changed files of an already indexed folder.
+
+        Changed paths that are no longer indexable (now ignored, removed since the
+        diff was computed) are returned as deletes, so that their stale records are
+        dropped from the index.
+
+        Args:
+            folder_path (str): Root of the repository, holding its current version
+            changed_paths (list): Added or modified files, relative to folder_path
+            deleted_paths (list): Removed files, relative to folder_path
+            previous_index_version (int): Version of the index the paths were diffed against,
+                returned as is so that the store can reject a delta computed on a stale index
+
+        Returns:
+            dict: {"upserts": pipeline result of the changed files, "deletes": full paths
+            of the files to remove, "previous_index_version": previous_index_version}
+        """
+        config = DiscoveryConfig.for_listing(include_md=True)
+        files_paths = await asyncio.to_thread(filter_files, folder_path, changed_paths, config)
+        indexed = set(files_paths)
+        deletes = [os.path.join(folder_path, path) for path in deleted_paths]
+        deletes += [
+            path for path in (os.path.join(folder_path, path) for path in changed_paths) if path not in indexed
+        ]
+        logger.info(
+            f"Delta indexing {folder_path}: {len(files_paths)} files to index, {len(deletes)} to delete"
         )
-        # Information Compressor Node
-        information_compressor_result = await self.information_compressor_node.summerizer(
-            classifier_result, 
-            batch_size, 
-            max_workers, 
-            GEMINI_API_KEY, 
-            ANTHROPIC_API_KEY, 
-            OPENAI_API_KEY, 
-            trace_id=trace_id  # Pass trace_id explicitly
+        upserts = await self.run_pipeline(
+            folder_path,
+            batch_size,
+            max_workers,
+            GEMINI_API_KEY,
+            ANTHROPIC_API_KEY,
+            OPENAI_API_KEY,
+            progress=progress,
+            file_paths=files_paths,
         )
-        return information_compressor_result
+        return {"upserts": upserts, "deletes": deletes, "previous_index_version": previous_index_version}
+
+
+def merge_pipeline_results(base: Dict[str, Any], addition: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Append the records of one pipeline result to another.
+
+    File ids are derived from the paths (see stable_file_id), records keep theirs.
+    """
+    merged = {"symbols": {**base.get("symbols", {}), **addition.get("symbols", {})}}
+    for key in ("documentation", "documentation_md", "config"):
+        merged[key] = base.get(key, []) + addition.get(key, [])
+    return merged
 
 
 
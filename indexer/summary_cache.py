@@ -0,0 +1,117 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Location of the persistent store, shared by every repository indexed by this process
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "summary_cache/summaries.db")
+
+
+def hash_content(content: str) -> str:
+    """Hash of the file content, the part of the key that makes the cache shared across repositories."""
+    return hashlib.sha256(content.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def hash_prompt(system_prompt: str, user_prompt: str) -> str:
+    """Hash of the prompt templates, so that editing a prompt invalidates the summaries it produced."""
+    return hashlib.sha256(f"{system_prompt}\x00{user_prompt}".encode("utf-8")).hexdigest()[:16]
+
+
+class SummaryCache:
+    """
+    Persistent per-file summary store keyed by (content hash, category, prompt hash, model name).
+
+    The summarizer checks it before calling any client, so re-indexing a repository
+    or indexing a fork only pays the LLM calls for files whose bytes changed.
+    """
+
+    def __init__(self, db_path: str = SUMMARY_CACHE_PATH):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS summaries (
+                    content_hash TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (content_hash, category, prompt_hash, model_name)
+                )
+                """
+            )
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def get(
+        self, content_hash: str, category: str, prompt_hash: str, model_names: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a summary produced by any of the given models, in order of preference.
+
+        Returns:
+            Optional[dict]: The stored summary, None on a miss
+        """
+        with self._lock:
+            for model_name in model_names:
+                row = self._connection.execute(
+                    "SELECT summary FROM summaries WHERE content_hash = ? AND category = ? "
+                    "AND prompt_hash = ? AND model_name = ?",
+                    (content_hash, category, prompt_hash, model_name),
+                ).fetchone()
+                if row is not None:
+                    self.hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+        return None
+
+    def put(
+        self, content_hash: str, category: str, prompt_hash: str, model_name: str, summary: Dict[str, Any]
+    ) -> None:
+        """Store the summary produced by model_name for this content."""
+        try:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO summaries (content_hash, category, prompt_hash, model_name, summary) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (content_hash, category, prompt_hash, model_name, json.dumps(summary)),
+                )
+                self.writes += 1
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store summary in cache: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters since the process started."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Module-level singleton shared by all indexing jobs of the process
+_summary_cache: Optional[SummaryCache] = None
+_summary_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> SummaryCache:
+    """Initialize and return the process-wide summary cache."""
+    global _summary_cache
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = SummaryCache()
+    return _summary_cache
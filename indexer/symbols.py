@@ -0,0 +1,468 @@
+import os
+import ast
+import re
+from typing import Any, Dict, List, Optional
+
+# File extensions of the languages with a symbol extractor
+LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".mts": "typescript",
+    ".go": "go",
+    ".java": "java",
+    ".rs": "rust",
+}
+
+# Skeletons longer than this are truncated, they are meant to be a compact outline
+MAX_SKELETON_CHARS = int(os.getenv("SYMBOLS_MAX_SKELETON_CHARS", "6000"))
+
+# Words that look like a method declaration to the member patterns but are statements
+_STATEMENT_KEYWORDS = frozenset({
+    "if", "for", "while", "switch", "catch", "return", "function", "new", "else", "do",
+    "try", "throw", "await", "yield", "typeof", "delete", "super", "this", "synchronized",
+})
+
+_IDENTIFIER = r"[A-Za-z_$][\w$]*"
+
+# --- JavaScript / TypeScript ---
+_JS_IMPORT = re.compile(r"""^\s*(?:import|export)\b[^'"`]*?\bfrom\s*['"]([^'"]+)['"]|^\s*import\s*['"]([^'"]+)['"]""")
+_JS_REQUIRE = re.compile(r"""\brequire\(\s*['"]([^'"]+)['"]\s*\)""")
+_JS_CLASS = re.compile(
+    rf"^\s*(export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?(class|interface|enum)\s+({_IDENTIFIER})"
+)
+_JS_TYPE = re.compile(rf"^\s*(export\s+)?(?:declare\s+)?type\s+({_IDENTIFIER})\s*(?:<[^=]*>)?\s*=")
+_JS_FUNCTION = re.compile(
+    rf"^\s*(export\s+)?(?:default\s+)?(?:declare\s+)?(?:async\s+)?function\s*\*?\s*({_IDENTIFIER})"
+)
+_JS_ARROW = re.compile(
+    rf"^\s*(export\s+)?(?:const|let|var)\s+({_IDENTIFIER})\s*(?::[^=]+)?=\s*(?:async\s+)?"
+    rf"(?:function\b|(?:<[^>]*>)?\([^)]*\)\s*(?::[^=]+)?=>|{_IDENTIFIER}\s*=>)"
+)
+_JS_MEMBER = re.compile(
+    r"^\s*(?:(?:public|private|protected|static|async|readonly|abstract|override|declare|get|set)\s+)*"
+    rf"\*?\s*(#?{_IDENTIFIER})\s*\??\s*(?:<[^>]*>)?\s*\("
+)
+_JS_EXPORT_LIST = re.compile(r"^\s*export\s*\{([^}]*)\}")
+_JS_EXPORT_DEFAULT = re.compile(rf"^\s*export\s+default\s+({_IDENTIFIER})\s*;?\s*$")
+_JS_MODULE_EXPORTS = re.compile(rf"^\s*(?:module\.)?exports\.({_IDENTIFIER})\s*=|^\s*module\.exports\s*=\s*({_IDENTIFIER})")
+
+# --- Go ---
+_GO_IMPORT = re.compile(r'^\s*import\s+(?:[\w.]+\s+)?"([^"]+)"')
+_GO_IMPORT_BLOCK_LINE = re.compile(r'^\s*(?:[\w.]+\s+)?"([^"]+)"')
+_GO_FUNC = re.compile(
+    r"^func\s+(?:\(\s*\w*\s*\*?\s*(\w+)(?:\[[^\]]*\])?\s*\)\s*)?([A-Za-z_]\w*)"
+)
+_GO_TYPE = re.compile(r"^(?:type\s+|\s+)([A-Za-z_]\w*)(?:\[[^\]]*\])?\s+(struct|interface|[\w.*\[\]]+)")
+
+# --- Java ---
+_JAVA_IMPORT = re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;")
+_JAVA_MODIFIERS = r"(?:(?:public|private|protected|static|final|abstract|sealed|non-sealed|strictfp|default|synchronized|native|transient)\s+)*"
+_JAVA_CLASS = re.compile(rf"^\s*(?:@\w+(?:\([^)]*\))?\s+)*({_JAVA_MODIFIERS})(class|interface|enum|record|@interface)\s+(\w+)")
+_JAVA_METHOD = re.compile(
+    rf"^\s*(?:@\w+(?:\([^)]*\))?\s+)*{_JAVA_MODIFIERS}(?:<[^>]+>\s+)?(?:[\w$.]+(?:<[^;{{}}()]*>)?(?:\[\])*\s+)?(\w+)\s*\("
+)
+
+# --- Rust ---
+_RUST_VISIBILITY = r"(pub(?:\([^)]*\))?\s+)?"
+_RUST_USE = re.compile(rf"^\s*{_RUST_VISIBILITY}use\s+([^;]+);")
+_RUST_MOD = re.compile(rf"^\s*{_RUST_VISIBILITY}mod\s+(\w+)\s*;")
+_RUST_EXTERN_CRATE = re.compile(r"^\s*extern\s+crate\s+(\w+)")
+_RUST_TYPE = re.compile(rf"^\s*{_RUST_VISIBILITY}(struct|enum|trait|union|type)\s+(\w+)")
+_RUST_IMPL = re.compile(r"^\s*(?:unsafe\s+)?impl(?:<[^{]*?>)?\s+(?:!?([\w:]+)(?:<[^{]*?>)?\s+for\s+)?(?:dyn\s+)?&?(?:'\w+\s+)?(?:mut\s+)?([\w:]+)")
+_RUST_FN = re.compile(rf"^\s*{_RUST_VISIBILITY}(?:(?:default|const|async|unsafe|extern(?:\s+\"[^\"]*\")?)\s+)*fn\s+(\w+)")
+_RUST_MACRO = re.compile(r"^\s*(?:#\[macro_export\]\s*)?macro_rules!\s*(\w+)")
+
+
+# Comments and string literals of each language, blanked before the line patterns run
+_C_COMMENTS = r"//[^\n]*|/\*.*?\*/"
+_QUOTED = r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\''
+_MASKED_TOKENS = {
+    "javascript": re.compile(rf"{_C_COMMENTS}|{_QUOTED}|`(?:\\.|[^`\\])*`", re.DOTALL),
+    "typescript": re.compile(rf"{_C_COMMENTS}|{_QUOTED}|`(?:\\.|[^`\\])*`", re.DOTALL),
+    "go": re.compile(rf"{_C_COMMENTS}|{_QUOTED}|`[^`]*`", re.DOTALL),
+    "java": re.compile(rf'{_C_COMMENTS}|""".*?"""|{_QUOTED}', re.DOTALL),
+    # Rust strings may span lines; a quote not closed one character later is a lifetime
+    "rust": re.compile(
+        r'//[^\n]*|/\*.*?\*/|\br(#*)".*?"\1|"(?:\\.|[^"\\])*"|\'(?:\\u\{[0-9a-fA-F]+\}|\\.|[^\\\'\n])\'',
+        re.DOTALL,
+    ),
+}
+_NOT_NEWLINE = re.compile(r"[^\n]")
+
+
+def detect_language(file_path: str) -> Optional[str]:
+    """Language of a file from its extension, None if it has no symbol extractor."""
+    return LANGUAGES.get(os.path.splitext(file_path)[1].lower())
+
+
+def mask_comments_and_strings(content: str, language: str) -> str:
+    """
+    Blank out comments and string literals, keeping their length and newlines so
+    that line numbers and columns still match the original source.
+
+    Declarations in comments or strings are then invisible to the line patterns,
+    and braces inside them do not disturb the nesting depth.
+    """
+    pattern = _MASKED_TOKENS.get(language)
+    if pattern is None:
+        return content
+    return pattern.sub(lambda match: _NOT_NEWLINE.sub(" ", match.group(0)), content)
+
+
+class _SymbolTable:
+    """Accumulates the symbols of one file while its lines are scanned."""
+
+    def __init__(self, language: str):
+        self.language = language
+        self.imports: List[str] = []
+        self.exports: List[str] = []
+        self.functions: List[Dict[str, Any]] = []
+        self.classes: Dict[str, Dict[str, Any]] = {}
+
+    def add_import(self, module: str) -> None:
+        module = " ".join(module.split())
+        if module and module not in self.imports:
+            self.imports.append(module)
+
+    def add_export(self, name: str) -> None:
+        if name and name not in self.exports:
+            self.exports.append(name)
+
+    def add_class(self, name: str, kind: str, line: int) -> Dict[str, Any]:
+        entry = self.classes.get(name)
+        if entry is None:
+            entry = self.classes[name] = {"name": name, "kind": kind, "line": line, "members": []}
+        elif entry["kind"] == "impl":
+            # Methods seen before the type declaration (Go receivers, Rust impl blocks)
+            entry["kind"], entry["line"] = kind, line
+        return entry
+
+    def add_member(self, class_name: str, name: str, kind: str, line: int) -> None:
+        entry = self.add_class(class_name, "impl", line)
+        if not any(member["name"] == name for member in entry["members"]):
+            entry["members"].append({"name": name, "kind": kind, "line": line})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "language": self.language,
+            "imports": self.imports,
+            "exports": self.exports,
+            "classes": list(self.classes.values()),
+            "functions": self.functions,
+        }
+
+
+def _scan_braces(raw_lines: List[str], masked_lines: List[str], match_line) -> None:
+    """
+    Walk the lines tracking the brace depth and the open containers (classes, impl blocks),
+    calling match_line(line_number, raw, masked, depth, container) on each line.
+
+    match_line returns the name of a container opened by the line, if any.
+    """
+    depth = 0
+    containers: List[tuple] = []  # (class name, depth of its body)
+    pending_container = None
+    for index, (raw, masked) in enumerate(zip(raw_lines, masked_lines)):
+        while containers and depth < containers[-1][1]:
+            containers.pop()
+        container = containers[-1][0] if containers and containers[-1][1] == depth else None
+        opened = match_line(index + 1, raw, masked, depth, container)
+        if opened is not None:
+            pending_container = (opened, depth + 1)
+        for char in masked:
+            if char == "{":
+                depth += 1
+                if pending_container is not None and depth == pending_container[1]:
+                    containers.append(pending_container)
+                    pending_container = None
+            elif char == "}":
+                depth = max(0, depth - 1)
+                while containers and depth < containers[-1][1]:
+                    containers.pop()
+            elif char == ";" and pending_container is not None and depth < pending_container[1]:
+                # Forward declaration without a body
+                pending_container = None
+
+
+def _extract_javascript(table: _SymbolTable, raw_lines: List[str], masked_lines: List[str]) -> None:
+    def match_line(line_number, raw, masked, depth, container):
+        if depth == 0:
+            if masked.lstrip().startswith(("import", "export")):
+                imported = _JS_IMPORT.match(raw)
+                if imported:
+                    table.add_import(imported.group(1) or imported.group(2))
+            for required in _JS_REQUIRE.finditer(raw):
+                if masked[required.start() : required.start() + 7] == "require":
+                    table.add_import(required.group(1))
+
+            declared = _JS_CLASS.match(masked)
+            if declared:
+                table.add_class(declared.group(3), declared.group(2), line_number)
+                if declared.group(1):
+                    table.add_export(declared.group(3))
+                return declared.group(3)
+            declared = _JS_TYPE.match(masked)
+            if declared:
+                table.add_class(declared.group(2), "type", line_number)
+                if declared.group(1):
+                    table.add_export(declared.group(2))
+                return None
+            declared = _JS_FUNCTION.match(masked) or _JS_ARROW.match(masked)
+            if declared:
+                table.functions.append({"name": declared.group(2), "line": line_number})
+                if declared.group(1):
+                    table.add_export(declared.group(2))
+                return None
+
+            export_list = _JS_EXPORT_LIST.match(masked)
+            if export_list:
+                for item in export_list.group(1).split(","):
+                    table.add_export(item.split(" as ")[-1].strip())
+            exported = _JS_EXPORT_DEFAULT.match(masked) or _JS_MODULE_EXPORTS.match(masked)
+            if exported:
+                table.add_export(next(group for group in exported.groups() if group))
+        elif container is not None:
+            member = _JS_MEMBER.match(masked)
+            if member and member.group(1) not in _STATEMENT_KEYWORDS:
+                name = member.group(1)
+                table.add_member(container, name, "constructor" if name == "constructor" else "method", line_number)
+        return None
+
+    _scan_braces(raw_lines, masked_lines, match_line)
+
+
+def _extract_go(table: _SymbolTable, raw_lines: List[str], masked_lines: List[str]) -> None:
+    block = None  # "import" or "type" inside an import ( ... ) / type ( ... ) group
+
+    def match_line(line_number, raw, masked, depth, container):
+        nonlocal block
+        stripped = masked.strip()
+        if block is not None:
+            if stripped.startswith(")"):
+                block = None
+            elif block == "import":
+                imported = _GO_IMPORT_BLOCK_LINE.match(raw)
+                if imported:
+                    table.add_import(imported.group(1))
+            elif depth == 0:
+                declared = _GO_TYPE.match(masked)
+                if declared:
+                    add_type(declared, line_number)
+            return None
+        if depth != 0:
+            return None
+
+        if re.match(r"^(import|type)\s*\(", stripped):
+            block = stripped.split("(")[0].strip()
+            return None
+        imported = _GO_IMPORT.match(raw) if stripped.startswith("import") else None
+        if imported:
+            table.add_import(imported.group(1))
+            return None
+        if masked.startswith("type"):
+            declared = _GO_TYPE.match(masked)
+            if declared:
+                add_type(declared, line_number)
+            return None
+        declared = _GO_FUNC.match(masked)
+        if declared:
+            receiver, name = declared.groups()
+            if receiver:
+                table.add_member(receiver, name, "method", line_number)
+            else:
+                table.functions.append({"name": name, "line": line_number})
+            if name[0].isupper():
+                table.add_export(f"{receiver}.{name}" if receiver else name)
+        return None
+
+    def add_type(declared, line_number):
+        name, kind = declared.groups()
+        table.add_class(name, kind if kind in ("struct", "interface") else "type", line_number)
+        if name[0].isupper():
+            table.add_export(name)
+
+    _scan_braces(raw_lines, masked_lines, match_line)
+
+
+def _extract_java(table: _SymbolTable, raw_lines: List[str], masked_lines: List[str]) -> None:
+    def match_line(line_number, raw, masked, depth, container):
+        if depth == 0:
+            imported = _JAVA_IMPORT.match(masked)
+            if imported:
+                table.add_import(imported.group(1))
+                return None
+        if depth == 0 or container is not None:
+            declared = _JAVA_CLASS.match(masked)
+            if declared:
+                modifiers, kind, name = declared.groups()
+                kind = kind.lstrip("@")
+                if container is not None:
+                    # Nested types are listed in their outer class and under their qualified name
+                    table.add_member(container, name, kind, line_number)
+                    name = f"{container}.{name}"
+                table.add_class(name, kind, line_number)
+                if "public" in (modifiers or "").split() and container is None:
+                    table.add_export(name)
+                return name
+        if container is not None:
+            member = _JAVA_METHOD.match(masked)
+            # Field initializers ("Foo x = bar();") are not declarations
+            if member and member.group(1) not in _STATEMENT_KEYWORDS and "=" not in masked.split("(")[0]:
+                name = member.group(1)
+                table.add_member(container, name, "constructor" if name == container else "method", line_number)
+        return None
+
+    _scan_braces(raw_lines, masked_lines, match_line)
+
+
+def _extract_rust(table: _SymbolTable, raw_lines: List[str], masked_lines: List[str]) -> None:
+    def is_public(visibility: Optional[str]) -> bool:
+        return (visibility or "").strip() == "pub"
+
+    def match_line(line_number, raw, masked, depth, container):
+        if depth == 0:
+            used = _RUST_USE.match(masked) or _RUST_MOD.match(masked)
+            if used:
+                table.add_import(used.group(2))
+                return None
+            crate = _RUST_EXTERN_CRATE.match(masked)
+            if crate:
+                table.add_import(crate.group(1))
+                return None
+            declared = _RUST_TYPE.match(masked)
+            if declared:
+                visibility, kind, name = declared.groups()
+                table.add_class(name, kind, line_number)
+                if is_public(visibility):
+                    table.add_export(name)
+                return name if kind == "trait" else None
+            implemented = _RUST_IMPL.match(masked)
+            if implemented:
+                name = implemented.group(2).split("::")[-1]
+                table.add_class(name, "impl", line_number)
+                return name
+            macro = _RUST_MACRO.match(masked)
+            if macro:
+                table.functions.append({"name": macro.group(1) + "!", "line": line_number})
+                return None
+            declared = _RUST_FN.match(masked)
+            if declared:
+                table.functions.append({"name": declared.group(2), "line": line_number})
+                if is_public(declared.group(1)):
+                    table.add_export(declared.group(2))
+        elif container is not None:
+            declared = _RUST_FN.match(masked)
+            if declared:
+                table.add_member(container, declared.group(2), "method", line_number)
+        return None
+
+    _scan_braces(raw_lines, masked_lines, match_line)
+
+
+def _extract_python(table: _SymbolTable, content: str) -> None:
+    tree = ast.parse(content)
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                table.add_import(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            table.add_import("." * node.level + (node.module or ""))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            table.functions.append({"name": node.name, "line": node.lineno})
+        elif isinstance(node, ast.ClassDef):
+            table.add_class(node.name, "class", node.lineno)
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    table.add_member(node.name, child.name, "method", child.lineno)
+        elif isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "__all__" for target in node.targets
+        ):
+            if isinstance(node.value, (ast.List, ast.Tuple)):
+                for element in node.value.elts:
+                    if isinstance(element, ast.Constant) and isinstance(element.value, str):
+                        table.add_export(element.value)
+    if not table.exports:
+        # Without __all__, every public top-level name is importable
+        for name in [function["name"] for function in table.functions] + list(table.classes):
+            if not name.startswith("_"):
+                table.add_export(name)
+
+
+def extract_symbols(file_path: str, content: str) -> Optional[Dict[str, Any]]:
+    """
+    Build the symbol table of a source file without any LLM call.
+
+    Python is read from its AST; JavaScript/TypeScript, Go, Java and Rust are
+    scanned line by line with regular expressions once comments and strings are
+    masked, tracking braces to attach methods to their class, impl block or
+    receiver type. Declarations spanning several lines or generated by macros
+    may be missed: the table is an outline, not a parser.
+
+    Args:
+        file_path (str): Path of the file, its extension selects the language
+        content (str): Source of the file
+
+    Returns:
+        Optional[dict]: {"language", "imports", "exports", "classes": [{"name", "kind",
+                        "line", "members": [{"name", "kind", "line"}]}], "functions":
+                        [{"name", "line"}]}, None if the language is not supported
+                        or the file cannot be parsed
+    """
+    language = detect_language(file_path)
+    if language is None:
+        return None
+    table = _SymbolTable(language)
+    if language == "python":
+        try:
+            _extract_python(table, content)
+        except (SyntaxError, ValueError):
+            return None
+        return table.to_dict()
+
+    raw_lines = content.splitlines()
+    masked_lines = mask_comments_and_strings(content, language).splitlines()
+    extractor = {
+        "javascript": _extract_javascript,
+        "typescript": _extract_javascript,
+        "go": _extract_go,
+        "java": _extract_java,
+        "rust": _extract_rust,
+    }[language]
+    extractor(table, raw_lines, masked_lines)
+    return table.to_dict()
+
+
+def declared_names(symbols: Dict[str, Any]) -> frozenset:
+    """Names of the functions, classes and members declared in a symbol table."""
+    names = {function["name"] for function in symbols["functions"]}
+    for class_info in symbols["classes"]:
+        names.add(class_info["name"])
+        names.update(member["name"] for member in class_info["members"])
+    return frozenset(names)
+
+
+def format_skeleton(symbols: Dict[str, Any], file_name: str = "") -> str:
+    """
+    Render a symbol table as a compact outline, used to give every chunk of a large
+    file the structure of the whole file and, for huge files, in place of the source.
+    """
+    lines = [f"# Outline of {file_name} ({symbols['language']})" if file_name else f"# Outline ({symbols['language']})"]
+    if symbols["imports"]:
+        lines.append("imports: " + ", ".join(symbols["imports"]))
+    if symbols["exports"]:
+        lines.append("exports: " + ", ".join(symbols["exports"]))
+    for class_info in symbols["classes"]:
+        lines.append(f"{class_info['kind']} {class_info['name']}  (line {class_info['line']})")
+        for member in class_info["members"]:
+            lines.append(f"    {member['kind']} {member['name']}  (line {member['line']})")
+    for function in symbols["functions"]:
+        lines.append(f"function {function['name']}  (line {function['line']})")
+    skeleton = "\n".join(lines)
+    if len(skeleton) > MAX_SKELETON_CHARS:
+        skeleton = skeleton[:MAX_SKELETON_CHARS] + "\n# ... truncated"
+    return skeleton
@@ -210,12 +210,15 @@ def should_process_file(filepath):
     return True
 
 
-def list_all_files(folder_path: str, include_md: bool) -> Dict[str, List[str]]:
+def list_all_files(folder_path: str, include_md: bool, config=None) -> Dict[str, List[str]]:
     """
     Lists all valid files in the given folder and its subdirectories.
 
     Args:
         folder_path (str): Path to the folder to be analyzed.
+        include_md (bool): Also list markdown and yaml files.
+        config (DiscoveryConfig, optional): Per-call discovery configuration,
+            built from ignore_list and include_md when not provided.
 
     Returns:
         dict: A dictionary containing two lists:
@@ -226,6 +229,8 @@ def list_all_files(folder_path: str, include_md: bool) -> Dict[str, List[str]]:
     Raises:
         FileNotFoundError: If the folder_path doesn't exist
     """
+    from .discovery import DiscoveryConfig, iter_files
+
     if not os.path.exists(folder_path):
         raise FileNotFoundError(f"The path {folder_path} does not exist")
 
@@ -233,25 +238,16 @@ def list_all_files(folder_path: str, include_md: bool) -> Dict[str, List[str]]:
     all_files_with_path = []
     all_files_no_path = []
 
-    # Remove .md from ignore list if include_md is True
-    if include_md:
-        if ".md" in ignore_list:
-            ignore_list.remove(".md")
-        if ".yaml" in ignore_list:
-            ignore_list.remove(".yaml")
-        if ".yml" in ignore_list:
-            ignore_list.remove(".yml")
+    # The ignore configuration is built per call, the global ignore_list is never mutated
+    if config is None:
+        config = DiscoveryConfig.for_listing(include_md)
 
     try:
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                full_path = os.path.join(root, file)
-
-                if should_process_file(full_path) and "env_arxflix" not in full_path:
-                    all_files_with_path.append(full_path)
-                    all_files_no_path.append(
-                        {"file_name": file, "file_id": len(all_files_with_path) - 1}
-                    )
+        for full_path in iter_files(folder_path, config):
+            all_files_with_path.append(full_path)
+            all_files_no_path.append(
+                {"file_name": os.path.basename(full_path), "file_id": len(all_files_with_path) - 1}
+            )
 
         return {
             "all_files_with_path": all_files_with_path,
@@ -4,6 +4,7 @@ from typing import Dict, Any, List
 import logging
 from .service import Librairie_Service
 import traceback
+from src.core.rate_limiter import get_rate_limiter
 
 app = FastAPI(title="Libraire Service", description="Documentation retrieval and response generation service")
 
@@ -21,6 +22,8 @@ class LibraireRequest(BaseModel):
     user_problem: str
     documentation_md: Dict[str, Any]
     config: Dict[str, Any]
+    # Symbol tables of the source files by path, from the index store
+    symbols: Dict[str, Any] = {}
     model_name: str = ""
     GEMINI_API_KEY: str = ""
     ANTHROPIC_API_KEY: str = ""
@@ -29,7 +32,7 @@ class LibraireRequest(BaseModel):
 class MultiRepoRequest(BaseModel):
     user_problem: str
     target_repositories: List[str]
-    repository_data: Dict[str, Dict[str, Any]]  # repo_name -> {cache_id, documentation, documentation_md, config}
+    repository_data: Dict[str, Dict[str, Any]]  # repo_name -> {cache_id, documentation, documentation_md, config, symbols}
     model_name: str = ""
     GEMINI_API_KEY: str = ""
     ANTHROPIC_API_KEY: str = ""
@@ -57,7 +60,8 @@ async def process_libraire_request(request: LibraireRequest):
             model_name=request.model_name,
             GEMINI_API_KEY=request.GEMINI_API_KEY,
             ANTHROPIC_API_KEY=request.ANTHROPIC_API_KEY,
-            OPENAI_API_KEY=request.OPENAI_API_KEY
+            OPENAI_API_KEY=request.OPENAI_API_KEY,
+            symbols=request.symbols,
         )
         
         logger.info("Libraire processing completed successfully")
@@ -98,7 +102,8 @@ async def process_multi_repo_request(request: MultiRepoRequest):
                 "cache_id": repo_data["cache_id"],
                 "documentation": repo_data["documentation"],
                 "documentation_md": repo_data["documentation_md"],
-                "config": repo_data["config"]
+                "config": repo_data["config"],
+                "symbols": repo_data.get("symbols", {}),
             }
         
         # Use the new multi-repository pipeline that makes only one call to Final Response Generator
@@ -124,6 +129,11 @@ async def process_multi_repo_request(request: MultiRepoRequest):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Multi-repo processing failed: {str(e)}")
 
+@app.get("/rate_limits/stats")
+async def rate_limits_stats():
+    """Configured RPM/TPM, remaining capacity and queued requests of each (provider, model, key) bucket"""
+    return get_rate_limiter().stats()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -4,10 +4,12 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 sys.path.append(project_root)
 
-from src.schemas.doc_retriver import GoalRewriteModel,get_necesary_files
+from src.schemas.doc_retriver import GoalRewriteModel, ChosenFiles, necesary_files_context
 from .utils import SAFE,get_gemini_pro_25_response,get_claude_response
+from .symbol_lookup import files_defining_symbols
 from src.monitor.langfuse import get_langfuse_context,trace,generate_trace_id
 from src.schemas.description import TemplateManager
+from src.core.rate_limiter import get_rate_limiter, estimate_request_tokens
 import instructor
 import os
 import dotenv
@@ -65,6 +67,7 @@ class Querry_Rewritter_Node(ClassifierConfig):
         symstem_prompt: str,
         user_prompt: str,
         span=None,
+        api_key: str = "",
     ) -> dict:
         """Process a batch of files using Gemini API"""
 
@@ -82,6 +85,9 @@ class Querry_Rewritter_Node(ClassifierConfig):
             )
 
         try:
+            reservation = get_rate_limiter().acquire(
+                "gemini", self.querry_rewriting_model, api_key, estimate_request_tokens(messages, 8000)
+            )
             completion, raw = client_gemini.chat.create_with_completion(
                 messages=messages,
                 response_model=GoalRewriteModel,
@@ -94,6 +100,7 @@ class Querry_Rewritter_Node(ClassifierConfig):
                 max_retries=10,
             )
             result = completion.model_dump()
+            reservation.settle(raw.usage_metadata.prompt_token_count + raw.usage_metadata.candidates_token_count)
             # if span:
             #     span.score(name="number_try", value=raw.n_attempts)
         except Exception as e:
@@ -145,7 +152,7 @@ class Querry_Rewritter_Node(ClassifierConfig):
             mode=instructor.Mode.GEMINI_JSON,
         )
 
-        rewrite = self.process_batch(client_gemini, symstem_prompt, user_prompt, span)
+        rewrite = self.process_batch(client_gemini, symstem_prompt, user_prompt, span, GEMINI_API_KEY)
 
         return rewrite
 
@@ -182,9 +189,6 @@ class Documentation_Context_Retriver_Node(ClassifierConfig):
             if config_doc and config_doc[0] != {}:
                 documentation = documentation + config_doc
 
-        for index, doc in enumerate(documentation):
-            doc["file_id"] = index
-
         user_prompt = user_prompt.replace("FILES_HERE", str(documentation))
 
         if len(documentation) == 0:
@@ -230,9 +234,16 @@ class Documentation_Context_Retriver_Node(ClassifierConfig):
             )
 
         try:
+            reservation = get_rate_limiter().acquire(
+                "gemini",
+                self.documentation_context_retriver_model,
+                GEMINI_API_KEY,
+                estimate_request_tokens(messages, 8000),
+            )
             completion, raw = client_gemini.chat.create_with_completion(
                 messages=messages,
-                response_model=get_necesary_files({"documentation": documentation}),
+                response_model=ChosenFiles,
+                validation_context=necesary_files_context({"documentation": documentation}),
                 generation_config={
                     "temperature": 0.0,
                     "top_p": 1,
@@ -242,6 +253,7 @@ class Documentation_Context_Retriver_Node(ClassifierConfig):
                 max_retries=10,
             )
             result = completion.model_dump()
+            reservation.settle(raw.usage_metadata.prompt_token_count + raw.usage_metadata.candidates_token_count)
 
         except Exception as e:
             if span:
@@ -276,6 +288,7 @@ class Context_Caching_Retriver_Node(ClassifierConfig):
     documentation=None,
     cache_id=None,
     trace_id: str = "df8187ba-a07e-4ea9-9117-5a7662eaa063",
+    api_key: str = "",
 ) -> dict:
         """Process a batch of files using Gemini API"""
 
@@ -300,9 +313,14 @@ class Context_Caching_Retriver_Node(ClassifierConfig):
             )
 
         try:
+            # The cached repository content is billed as input tokens, settled from the usage below
+            reservation = get_rate_limiter().acquire(
+                "gemini", self.context_caching_retriver_model, api_key, estimate_request_tokens(messages, 8000)
+            )
             completion, raw = client_gemini.chat.create_with_completion(
                 messages=messages,
-                response_model=get_necesary_files(documentation),
+                response_model=ChosenFiles,
+                validation_context=necesary_files_context(documentation),
                 generation_config={
                     "temperature": 0.0,
                     "top_p": 1,
@@ -312,6 +330,7 @@ class Context_Caching_Retriver_Node(ClassifierConfig):
                 max_retries=5,
             )
             result = completion.model_dump()
+            reservation.settle(raw.usage_metadata.prompt_token_count + raw.usage_metadata.candidates_token_count)
             # if span:
             #     span.score(name="number_try", value=raw.n_attempts)
         except Exception as e:
@@ -388,7 +407,7 @@ class Context_Caching_Retriver_Node(ClassifierConfig):
         )
 
         list_of_files = self.process_batch(
-            client_gemini, symstem_prompt, user_prompt, span, documentation, cache_id
+            client_gemini, symstem_prompt, user_prompt, span, documentation, cache_id, api_key=GEMINI_API_KEY
         )
 
         return list_of_files
@@ -430,14 +449,18 @@ class Final_Response_Generator_Node(ClassifierConfig):
 
         # Configure Anthropic client with API key from request if provided
         repository_set = set()
+        # Records by their stable file_id, the ids chosen by the retrievers
+        documentation_md_by_id = {str(doc.get("file_id")): doc for doc in documentation_md.get("documentation_md", []) if isinstance(doc, dict)}
+        config_by_id = {str(doc.get("file_id")): doc for doc in config.get("config", []) if isinstance(doc, dict)}
+        documentation_by_id = {str(doc.get("file_id")): doc for doc in documentation.get("documentation", []) if isinstance(doc, dict)}
         # Get file names from the documentation : files_list_md_config
         for file in files_list_md_config:
-            file_id = int(file["file_id"])
+            file_id = str(file["file_id"])
             file_name = file["file_name"]
             source_repository = file.get("source_repository", repository_name)
             repository_set.add(source_repository)
             if ".md" in file_name:
-                path = documentation_md["documentation_md"][file_id]["file_paths"]
+                path = documentation_md_by_id[file_id]["file_paths"]
                 try:
                     with open(path, "r") as f:
                         user_prompt += f"\n<repository_name:{source_repository}, file_name:{file_name}>\n" + f.read() + f"\n</repository_name:{source_repository}, file_name:{file_name}>"
@@ -448,7 +471,7 @@ class Final_Response_Generator_Node(ClassifierConfig):
                     pass
             else:
                 try:
-                    path = config["config"][file_id]["file_paths"]
+                    path = config_by_id[file_id]["file_paths"]
                     with open(path, "r") as f:
                         user_prompt += f"\n<repository_name:{source_repository}, file_name:{file_name}>\n" + f.read() + f"\n</repository_name:{source_repository}, file_name:{file_name}>"
                 except:
@@ -458,11 +481,11 @@ class Final_Response_Generator_Node(ClassifierConfig):
                     pass
         # Get file names from the documentation : files_list
         for file in files_list:
-            file_id = int(file["file_id"])
+            file_id = str(file["file_id"])
             file_name = file["file_name"]
             source_repository = file.get("source_repository", repository_name)
             repository_set.add(source_repository)
-            path = documentation["documentation"][file_id]["file_paths"]
+            path = documentation_by_id[file_id]["file_paths"]
             try:
                 with open(path, "r") as f:
                     user_prompt += f"\n<repository_name:{source_repository}, file_name:{file_name}>\n" + f.read() + f"\n</repository_name:{source_repository}, file_name:{file_name}>"
@@ -514,6 +537,13 @@ class Final_Response_Generator_Node(ClassifierConfig):
                     raise ValueError(f"OpenAI API key is required for model '{effective_model_name}'. Please configure your OpenAI API key in the settings.")
                 
                 openai_client = OpenAI(api_key=openai_api_key)
+                max_tokens = 60000 if effective_model_name.lower().startswith("o") else 8000
+                reservation = get_rate_limiter().acquire(
+                    "openai",
+                    effective_model_name,
+                    openai_api_key,
+                    estimate_request_tokens(symstem_prompt + user_prompt, max_tokens),
+                )
                 
                 # Handle different OpenAI model types
                 if effective_model_name.lower().startswith("o"):
@@ -554,6 +584,7 @@ class Final_Response_Generator_Node(ClassifierConfig):
                         self.prompt_token_count = prompt_tokens
                         self.candidates_token_count = completion_tokens
                 
+                reservation.settle(response.usage.prompt_tokens + response.usage.completion_tokens)
                 Answer = MockAnswer(
                     response.choices[0].message.content,
                     MockUsage(response.usage.prompt_tokens, response.usage.completion_tokens)
@@ -595,6 +626,12 @@ class Final_Response_Generator_Node(ClassifierConfig):
                     timeout=Timeout(60.0 * 30, connect=5.0)  # 30 minutes timeout
                 )
                 
+                reservation = get_rate_limiter().acquire(
+                    "anthropic",
+                    effective_model_name,
+                    anthropic_api_key,
+                    estimate_request_tokens(symstem_prompt + user_prompt, 60000),
+                )
                 response = anthropic_client.messages.create(
                     model=effective_model_name,
                     max_tokens=60000,
@@ -613,6 +650,7 @@ class Final_Response_Generator_Node(ClassifierConfig):
                         self.prompt_token_count = prompt_tokens
                         self.candidates_token_count = completion_tokens
                 
+                reservation.settle(response.usage.input_tokens + response.usage.output_tokens)
                 Answer = MockAnswer(
                     response.content[0].text,
                     MockUsage(response.usage.input_tokens, response.usage.output_tokens)
@@ -633,7 +671,16 @@ class Final_Response_Generator_Node(ClassifierConfig):
                     generation_config={"temperature": 0, "top_p": 1, "max_output_tokens": 60000},
                 )
                 
+                reservation = get_rate_limiter().acquire(
+                    "gemini",
+                    effective_model_name,
+                    GEMINI_API_KEY,
+                    estimate_request_tokens(symstem_prompt + user_prompt, 60000),
+                )
                 Answer = final_answer_generator.generate_content(symstem_prompt + "\n" + user_prompt)
+                reservation.settle(
+                    Answer.usage_metadata.prompt_token_count + Answer.usage_metadata.candidates_token_count
+                )
 
             else:
                 raise ValueError(f"Unsupported model '{effective_model_name}'. Please use models starting with 'gemini-', 'gpt-', 'o', or 'claude-'.")
@@ -663,10 +710,13 @@ class Librairie_Service(ClassifierConfig):
         self.final_response_generator = Final_Response_Generator_Node()
     
     def run_pipeline_up_to_context_retrieval(self, repository_name: str, cache_id: str, documentation: dict,
-            user_problem: str, documentation_md: dict, config_input: dict, GEMINI_API_KEY: str):
+            user_problem: str, documentation_md: dict, config_input: dict, GEMINI_API_KEY: str, symbols: dict = None):
         """
         Run the pipeline up to context retrieval (steps 1-8) but don't call Final Response Generator.
         Returns all the context needed for final response generation.
+
+        With the symbol tables of the repository (symbols), the files defining the
+        classes and functions named in user_problem are added to the retrieved ones.
         """
         
         trace_id = generate_trace_id()
@@ -731,6 +781,13 @@ class Librairie_Service(ClassifierConfig):
                 files_list = documentation_from_context_caching_retriver_output
             elif isinstance(documentation_from_context_caching_retriver_output, dict) and "files_list" in documentation_from_context_caching_retriver_output:
                 files_list = documentation_from_context_caching_retriver_output["files_list"]
+
+        # Files defining the symbols named in the question, looked up in the symbol tables
+        chosen_ids = {str(file.get("file_id")) for file in files_list}
+        for file in files_defining_symbols(symbols, documentation, user_problem):
+            if file["file_id"] not in chosen_ids:
+                logger.info(f"Adding {file['file_name']} to the context, it defines a symbol of the question")
+                files_list.append(file)
         
         # Get files_list from md_documentation_output safely
         files_list_md_config = []
@@ -755,7 +812,7 @@ class Librairie_Service(ClassifierConfig):
         Step 9-10 (Final Response Generator) is called once with all collected context.
         
         Args:
-            repositories_data: Dict with repo_name -> {cache_id, documentation, documentation_md, config}
+            repositories_data: Dict with repo_name -> {cache_id, documentation, documentation_md, config, symbols}
             user_problem: Original user query
             GEMINI_API_KEY: API key for Gemini
         """
@@ -780,7 +837,8 @@ class Librairie_Service(ClassifierConfig):
                     user_problem=user_problem,
                     documentation_md=repo_data["documentation_md"],
                     config_input=repo_data["config"],
-                    GEMINI_API_KEY=GEMINI_API_KEY
+                    GEMINI_API_KEY=GEMINI_API_KEY,
+                    symbols=repo_data.get("symbols"),
                 )
                 
                 all_repo_contexts.append(repo_context)
@@ -862,7 +920,7 @@ class Librairie_Service(ClassifierConfig):
         return final_response_generator_output
 
     def run_pipeline(self, repository_name: str, cache_id: str, documentation: dict,
-            user_problem: str, documentation_md: dict, config_input: dict, GEMINI_API_KEY: str, ANTHROPIC_API_KEY: str, OPENAI_API_KEY: str, model_name: str = ""):
+            user_problem: str, documentation_md: dict, config_input: dict, GEMINI_API_KEY: str, ANTHROPIC_API_KEY: str, OPENAI_API_KEY: str, model_name: str = "", symbols: dict = None):
         """
         Original single-repository pipeline - now uses the new context retrieval method
         """
@@ -883,7 +941,8 @@ class Librairie_Service(ClassifierConfig):
             user_problem=user_problem,
             documentation_md=documentation_md,
             config_input=config_input,
-            GEMINI_API_KEY=GEMINI_API_KEY
+            GEMINI_API_KEY=GEMINI_API_KEY,
+            symbols=symbols,
         )
 
         # 9. prompts for final answer
@@ -0,0 +1,67 @@
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+# Files added to the retrieved ones because they define a symbol named in the question
+SYMBOL_LOOKUP_MAX_FILES = int(os.getenv("SYMBOL_LOOKUP_MAX_FILES", "5"))
+
+# Names defined in more files than this are too ambiguous to point at one of them
+SYMBOL_LOOKUP_MAX_DEFINITIONS = int(os.getenv("SYMBOL_LOOKUP_MAX_DEFINITIONS", "3"))
+
+# Identifiers of a question, short words are left out: they are mostly plain English
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]{3,}")
+
+
+def definitions_by_name(symbols: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Paths of the files defining each class and top-level function, from the stored symbol tables.
+
+    Members are left out, their names (run, get, close...) are shared by too many classes.
+    """
+    definitions: Dict[str, List[str]] = {}
+    for file_path, table in symbols.items():
+        names = [item.get("name") for item in table.get("classes", []) + table.get("functions", [])]
+        for name in dict.fromkeys(name for name in names if name):
+            definitions.setdefault(name, []).append(file_path)
+    return definitions
+
+
+def files_defining_symbols(
+    symbols: Optional[Dict[str, Dict[str, Any]]],
+    documentation: Dict[str, Any],
+    text: str,
+    max_files: int = SYMBOL_LOOKUP_MAX_FILES,
+) -> List[Dict[str, str]]:
+    """
+    Files of the documentation defining the identifiers written in a question, without any LLM call.
+
+    Names are matched exactly, case included, against the classes and functions
+    of the symbol tables; a name defined in more than SYMBOL_LOOKUP_MAX_DEFINITIONS
+    files is ignored.
+
+    Args:
+        symbols (dict): Symbol tables by file path, as exported by the index store
+        documentation (dict): {"documentation": [...]}, the records the files are picked from
+        text (str): Question of the user
+        max_files (int): Maximum number of files returned
+
+    Returns:
+        list: [{"file_name", "file_id"}] in the order the names appear in text, like
+        the files_list chosen by the retrievers
+    """
+    if not symbols:
+        return []
+    definitions = definitions_by_name(symbols)
+    records = {
+        doc.get("file_paths"): doc for doc in documentation.get("documentation", []) if isinstance(doc, dict)
+    }
+    files = {}
+    for name in dict.fromkeys(_IDENTIFIER.findall(text)):
+        paths = definitions.get(name, [])
+        if len(paths) > SYMBOL_LOOKUP_MAX_DEFINITIONS:
+            continue
+        for path in paths:
+            record = records.get(path)
+            if record is not None and len(files) < max_files:
+                files.setdefault(path, {"file_name": record.get("file_name"), "file_id": str(record.get("file_id"))})
+    return list(files.values())
@@ -0,0 +1,126 @@
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Worker processes running the CPU-bound stages (hashing, parsing), 0 runs them in the calling thread
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(max(1, min(8, (os.cpu_count() or 2) - 1)))))
+
+# Items per task submitted to the pool by map_in_cpu_pool, shorter lists are processed in the calling thread
+CPU_POOL_CHUNK_SIZE = int(os.getenv("CPU_POOL_CHUNK_SIZE", "32"))
+
+# Inputs smaller than this are processed in the calling thread, pickling them would cost more than the work
+CPU_POOL_MIN_CHARS = int(os.getenv("CPU_POOL_MIN_CHARS", "20000"))
+
+
+def _apply_chunk(func: Callable, chunk: List[Any]) -> List[Any]:
+    return [func(item) for item in chunk]
+
+
+class CpuPool:
+    """
+    Process pool for the CPU-bound stages of indexing.
+
+    Workers are spawned (not forked, the parent holds threads, locks and SQLite
+    connections) on first use and import the modules of the functions they run.
+    Functions must be module-level and their arguments and results picklable,
+    kept compact: paths and contents in, hashes and small structures out.
+    A pool that breaks (e.g. a worker killed by the OOM killer) is replaced on
+    the next call and the failed call runs in the calling thread.
+    """
+
+    def __init__(self, workers: int = CPU_POOL_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.inline = 0
+        self.broken = 0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Started CPU pool with {self.workers} worker processes")
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            self.broken += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.warning("CPU pool broke, it will be restarted on the next task")
+
+    async def run(self, func: Callable, *args, size: Optional[int] = None) -> Any:
+        """
+        Run func(*args) in a worker process without blocking the event loop.
+
+        Args:
+            func (Callable): Module-level function
+            size (int): Size of the input in characters, inputs under CPU_POOL_MIN_CHARS
+                are processed in the calling thread
+
+        Returns:
+            Any: The result of func, exceptions raised by func are re-raised
+        """
+        executor = self._get_executor()
+        if executor is None or (size is not None and size < CPU_POOL_MIN_CHARS):
+            self.inline += 1
+            return func(*args)
+        self.tasks += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            self._reset(executor)
+            return func(*args)
+
+    def map(self, func: Callable, items: Iterable[Any], chunk_size: int = CPU_POOL_CHUNK_SIZE) -> List[Any]:
+        """
+        Blocking map of func over items, submitted to the workers chunk_size items at a time.
+
+        Meant for threads (request handlers, asyncio.to_thread), never the event loop thread.
+
+        Returns:
+            list: Results in the order of items
+        """
+        items = list(items)
+        executor = self._get_executor()
+        if executor is None or len(items) < chunk_size:
+            self.inline += 1
+            return [func(item) for item in items]
+        chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+        self.tasks += len(chunks)
+        try:
+            futures = [executor.submit(_apply_chunk, func, chunk) for chunk in chunks]
+            return [result for future in futures for result in future.result()]
+        except BrokenProcessPool:
+            self._reset(executor)
+            return [func(item) for item in items]
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "tasks": self.tasks, "inline": self.inline, "broken": self.broken}
+
+
+# Module-level singleton shared by every job of the process
+_cpu_pool: Optional[CpuPool] = None
+_cpu_pool_lock = threading.Lock()
+
+
+def get_cpu_pool() -> CpuPool:
+    """Initialize and return the process-wide CPU pool."""
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = CpuPool()
+    return _cpu_pool
@@ -0,0 +1,132 @@
+import os
+import re
+import hashlib
+import logging
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Bare mirrors of the cloned remotes, one per remote URL, holding the objects of their working trees
+GIT_MIRROR_DIR = os.getenv("GIT_MIRROR_DIR", "repository_mirrors")
+
+# Commits of history fetched into a mirror, 0 fetches the whole history
+GIT_CLONE_DEPTH = int(os.getenv("GIT_CLONE_DEPTH", "1"))
+
+# Partial clone filter of the mirrors, the filtered objects are fetched when a working tree checks them out
+GIT_CLONE_FILTER = os.getenv("GIT_CLONE_FILTER", "blob:none")
+
+# Only check out the files the indexer can index (see sparse_checkout_patterns)
+GIT_SPARSE_CHECKOUT = os.getenv("GIT_SPARSE_CHECKOUT", "true").lower() == "true"
+
+# One lock per mirror, a mirror is cloned or fetched by one thread at a time
+_mirror_locks: Dict[str, threading.Lock] = {}
+_mirror_locks_lock = threading.Lock()
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(["git", *args], check=True, capture_output=True, text=True).stdout
+
+
+def _fetch_options() -> List[str]:
+    options = []
+    if GIT_CLONE_DEPTH > 0:
+        options.append(f"--depth={GIT_CLONE_DEPTH}")
+    if GIT_CLONE_FILTER:
+        options.append(f"--filter={GIT_CLONE_FILTER}")
+    return options
+
+
+def _mirror_lock(mirror: Path) -> threading.Lock:
+    with _mirror_locks_lock:
+        return _mirror_locks.setdefault(str(mirror), threading.Lock())
+
+
+def mirror_path(remote_url: str) -> Path:
+    """Location of the bare mirror of a remote: its name, made safe, and a hash of its URL."""
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", remote_url.rstrip("/").split("/")[-1].removesuffix(".git"))
+    digest = hashlib.sha1(remote_url.encode("utf-8")).hexdigest()[:12]
+    return Path(GIT_MIRROR_DIR).resolve() / f"{name}-{digest}.git"
+
+
+def _escape_pattern(text: str) -> str:
+    escaped = re.sub(r"([*?\[\]\\])", r"\\\1", text)
+    return "\\" + escaped if escaped.startswith(("!", "#")) else escaped
+
+
+def sparse_checkout_patterns() -> List[str]:
+    """
+    Non-cone sparse-checkout patterns leaving out what the indexer never reads.
+
+    Derived from the ignore list of the indexer discovery: ignored names are
+    excluded at any depth, ignored suffixes (extensions, .egg-info...) as globs.
+    The .gitignore and .gitattributes files stay, the indexer applies their rules.
+    """
+    from indexer.discovery import RULE_FILES, DiscoveryConfig, NameMatcher
+
+    matcher = NameMatcher(DiscoveryConfig.for_listing(include_md=True).ignore_patterns)
+    patterns = ["/*"]
+    patterns += [f"!{_escape_pattern(name)}" for name in sorted(matcher.names)]
+    patterns += [f"!*{_escape_pattern(suffix)}" for suffix in matcher.suffixes]
+    patterns += list(RULE_FILES)
+    return patterns
+
+
+def ensure_mirror(remote_url: str) -> Path:
+    """
+    Create the bare mirror of a remote, or fetch the new commits of its default branch into it.
+
+    The mirror only follows the default branch, down to GIT_CLONE_DEPTH commits and
+    without the objects excluded by GIT_CLONE_FILTER. A refresh only transfers the
+    objects the mirror does not have yet.
+
+    Args:
+        remote_url (str): URL of the remote, file:// URLs included
+
+    Returns:
+        Path: Location of the mirror
+
+    Raises:
+        subprocess.CalledProcessError: If git fails
+    """
+    mirror = mirror_path(remote_url)
+    with _mirror_lock(mirror):
+        if not (mirror / "HEAD").exists():
+            mirror.parent.mkdir(parents=True, exist_ok=True)
+            _git("clone", "--quiet", "--bare", "--single-branch", *_fetch_options(), remote_url, str(mirror))
+            logger.info(f"Created mirror of {remote_url} at {mirror}")
+        else:
+            # The default branch of the mirror is not checked out anywhere, worktrees are detached
+            head_ref = _git("-C", str(mirror), "symbolic-ref", "HEAD").strip()
+            _git("-C", str(mirror), "fetch", "--quiet", *_fetch_options(), "origin", f"+HEAD:{head_ref}")
+            logger.info(f"Fetched new commits of {remote_url} into {mirror}")
+    return mirror
+
+
+def add_worktree(mirror: Path, target: Path, commit: str = "HEAD", sparse: bool = GIT_SPARSE_CHECKOUT) -> None:
+    """
+    Check out a commit of a mirror in a new working tree sharing the objects of the mirror.
+
+    The working tree is detached: git commands run in it (fetch, diff, reset) work
+    as in a clone, and the objects they fetch land in the mirror. With sparse, the
+    files left out by sparse_checkout_patterns are never checked out nor fetched.
+
+    Args:
+        mirror (Path): Mirror created by ensure_mirror
+        target (Path): Directory of the working tree, must not exist
+        commit (str): Commit to check out, the default branch of the mirror by default
+    """
+    with _mirror_lock(mirror):
+        # Forget the working trees that were deleted (e.g. temporary ones) before adding one
+        _git("-C", str(mirror), "worktree", "prune")
+        _git("-C", str(mirror), "worktree", "add", "--quiet", "--detach", "--no-checkout", str(target), commit)
+    if sparse:
+        _git("-C", str(target), "sparse-checkout", "set", "--no-cone", *sparse_checkout_patterns())
+    _git("-C", str(target), "reset", "--quiet", "--hard", "HEAD")
+
+
+def clone_from_mirror(remote_url: str, target: Path) -> None:
+    """Refresh the mirror of a remote and check out its default branch in target."""
+    add_worktree(ensure_mirror(remote_url), target)
@@ -0,0 +1,450 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.core.manifest import ManifestEntry
+
+logger = logging.getLogger(__name__)
+
+# Location of the index of every repository
+INDEX_STORE_PATH = os.getenv("INDEX_STORE_PATH", "index_store/index.db")
+
+# Directory holding the docstrings_json/, ducomentations_json/ and configs_json/ files of older versions
+INDEX_LEGACY_JSON_DIR = os.getenv("INDEX_LEGACY_JSON_DIR", ".")
+
+# Categories of an indexer result, and the legacy JSON directory of each ("ducomentations" typo included)
+CATEGORIES = ("documentation", "documentation_md", "config")
+LEGACY_JSON_DIRECTORIES = {
+    "documentation": "docstrings_json",
+    "documentation_md": "ducomentations_json",
+    "config": "configs_json",
+}
+
+
+def hash_file(file_path: str) -> Optional[str]:
+    """SHA-256 of a file on disk, None if it cannot be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def stable_file_id(file_path: str) -> str:
+    """
+    Identifier of an indexed file, derived from its path.
+
+    Unlike a position in the index, it does not change when other files are
+    added, removed or re-indexed, so it can key per-file caches and retrievals.
+    """
+    return hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:12]
+
+
+def _entries(result: Dict[str, Any], category: str) -> List[Dict[str, Any]]:
+    entries = result.get(category)
+    # Placeholder results carry a dict instead of the list of files
+    return [entry for entry in entries if isinstance(entry, dict)] if isinstance(entries, list) else []
+
+
+class IndexStore:
+    """
+    Index of every repository, one row per (repository, category, file).
+
+    Each row keeps the file path, its stable file_id (see stable_file_id), the hash of its content, the whole
+    entry produced by the indexer (as JSON) and the version of the repository
+    index that wrote it. The symbol tables of the source files (see
+    indexer/symbols.py) are kept alongside, one row per file. Every write is a
+    single transaction, so readers see either the previous or the next index,
+    and incremental updates only touch the changed rows.
+    """
+
+    def __init__(self, db_path: str = INDEX_STORE_PATH):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS repositories (
+                    repo_name TEXT PRIMARY KEY,
+                    index_version INTEGER NOT NULL,
+                    commit_sha TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                """
+            )
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(repositories)")]
+            if "commit_sha" not in columns:
+                self._connection.execute("ALTER TABLE repositories ADD COLUMN commit_sha TEXT")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    repo_name TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    file_id TEXT,
+                    content_hash TEXT,
+                    entry TEXT NOT NULL,
+                    index_version INTEGER NOT NULL,
+                    PRIMARY KEY (repo_name, category, file_path)
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS files_by_id ON files (repo_name, category, file_id)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS files_by_path ON files (repo_name, file_path)"
+            )
+            self._migrate_positional_ids()
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS symbol_tables (
+                    repo_name TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    symbol_table TEXT NOT NULL,
+                    index_version INTEGER NOT NULL,
+                    PRIMARY KEY (repo_name, file_path)
+                )
+                """
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS manifests (
+                    repo_name TEXT NOT NULL,
+                    relative_path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    PRIMARY KEY (repo_name, relative_path)
+                )
+                """
+            )
+
+    def _migrate_positional_ids(self) -> None:
+        # Rows written before file ids were derived from paths carry their position in the index
+        rows = self._connection.execute(
+            "SELECT rowid, file_path, entry FROM files WHERE typeof(file_id) != 'text'"
+        ).fetchall()
+        updates = []
+        for rowid, file_path, entry in rows:
+            file_id = stable_file_id(file_path)
+            updates.append((file_id, json.dumps({**json.loads(entry), "file_id": file_id}), rowid))
+        self._connection.executemany("UPDATE files SET file_id = ?, entry = ? WHERE rowid = ?", updates)
+        if updates:
+            logger.info(f"Replaced the positional file ids of {len(updates)} indexed files")
+
+    def _next_version(self, repo_name: str) -> int:
+        row = self._connection.execute(
+            "SELECT index_version FROM repositories WHERE repo_name = ?", (repo_name,)
+        ).fetchone()
+        version = (row[0] if row else 0) + 1
+        self._connection.execute(
+            "INSERT INTO repositories (repo_name, index_version) VALUES (?, ?) "
+            "ON CONFLICT(repo_name) DO UPDATE SET index_version = excluded.index_version, "
+            "updated_at = CURRENT_TIMESTAMP",
+            (repo_name, version),
+        )
+        return version
+
+    @staticmethod
+    def _prepare_rows(result: Dict[str, Any]) -> Tuple[List[Tuple], List[Tuple]]:
+        """
+        Rows of the files and symbol tables of an indexer result, without their repository and version.
+
+        Entries without a content hash are hashed from disk here, outside of the
+        store lock, so that file reads never hold up other readers and writers.
+        """
+        file_rows = []
+        for category in CATEGORIES:
+            for entry in _entries(result, category):
+                file_path = entry.get("file_paths")
+                if not file_path:
+                    continue
+                content_hash = entry.get("content_hash") or hash_file(file_path)
+                # Entries of older indexers and legacy JSON files carry positional ids
+                entry = {**entry, "file_id": stable_file_id(file_path)}
+                file_rows.append((category, file_path, entry["file_id"], content_hash, json.dumps(entry)))
+        symbol_tables = result.get("symbols")
+        symbol_rows = [
+            (file_path, json.dumps(table))
+            for file_path, table in (symbol_tables.items() if isinstance(symbol_tables, dict) else [])
+            if isinstance(table, dict)
+        ]
+        return file_rows, symbol_rows
+
+    def _upsert(self, repo_name: str, rows: Tuple[List[Tuple], List[Tuple]], version: int) -> int:
+        file_rows, symbol_rows = rows
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO files "
+            "(repo_name, category, file_path, file_id, content_hash, entry, index_version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(repo_name, *row, version) for row in file_rows],
+        )
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO symbol_tables (repo_name, file_path, symbol_table, index_version) "
+            "VALUES (?, ?, ?, ?)",
+            [(repo_name, *row, version) for row in symbol_rows],
+        )
+        return len(file_rows)
+
+    def _set_commit_sha(self, repo_name: str, commit_sha: Optional[str]) -> None:
+        self._connection.execute(
+            "UPDATE repositories SET commit_sha = ? WHERE repo_name = ?", (commit_sha, repo_name)
+        )
+
+    def replace_repository(self, repo_name: str, result: Dict[str, Any], commit_sha: Optional[str] = None) -> int:
+        """
+        Replace the whole index of a repository with an indexer result.
+
+        Args:
+            repo_name (str): Name of the repository
+            result (dict): Indexer result ({"documentation", "documentation_md", "config", "symbols"})
+            commit_sha (str): Commit the index was built from, None for folders that are not git clones
+
+        Returns:
+            int: The new index version
+        """
+        rows = self._prepare_rows(result)
+        with self._lock, self._connection:
+            version = self._next_version(repo_name)
+            self._set_commit_sha(repo_name, commit_sha)
+            self._connection.execute("DELETE FROM files WHERE repo_name = ?", (repo_name,))
+            self._connection.execute("DELETE FROM symbol_tables WHERE repo_name = ?", (repo_name,))
+            count = self._upsert(repo_name, rows, version)
+        logger.info(f"Stored index version {version} of {repo_name}: {count} files")
+        return version
+
+    def update_repository(
+        self,
+        repo_name: str,
+        upserts: Optional[Dict[str, Any]] = None,
+        deleted_paths: Iterable[str] = (),
+        commit_sha: Optional[str] = None,
+        expected_version: Optional[int] = None,
+    ) -> int:
+        """
+        Apply an incremental update in one transaction.
+
+        The rows of an upserted path are replaced in every category, a file whose
+        category changed does not keep its previous record.
+
+        Args:
+            repo_name (str): Name of the repository
+            upserts (dict): Indexer result shaped entries of the added or changed files
+            deleted_paths (Iterable[str]): Paths of the removed files, in every category
+            commit_sha (str): Commit the updated index corresponds to, the recorded one is kept when None
+            expected_version (int): Index version the update was computed against, checked when given
+
+        Returns:
+            int: The new index version
+
+        Raises:
+            Exception: If the index version is not expected_version, nothing is applied
+        """
+        upserts = upserts or {}
+        deleted_paths = list(deleted_paths)
+        replaced_paths = {
+            entry["file_paths"] for category in CATEGORIES for entry in _entries(upserts, category) if entry.get("file_paths")
+        }
+        replaced_paths.update(upserts.get("symbols") or {})
+        rows = self._prepare_rows(upserts)
+        with self._lock, self._connection:
+            if expected_version is not None:
+                row = self._connection.execute(
+                    "SELECT index_version FROM repositories WHERE repo_name = ?", (repo_name,)
+                ).fetchone()
+                current_version = row[0] if row else None
+                if current_version != expected_version:
+                    raise Exception(
+                        f"Index of {repo_name} is at version {current_version}, "
+                        f"the update was computed against version {expected_version}"
+                    )
+            version = self._next_version(repo_name)
+            if commit_sha is not None:
+                self._set_commit_sha(repo_name, commit_sha)
+            removed = [(repo_name, file_path) for file_path in [*deleted_paths, *replaced_paths]]
+            self._connection.executemany("DELETE FROM files WHERE repo_name = ? AND file_path = ?", removed)
+            self._connection.executemany("DELETE FROM symbol_tables WHERE repo_name = ? AND file_path = ?", removed)
+            count = self._upsert(repo_name, rows, version)
+        logger.info(
+            f"Updated index of {repo_name} to version {version}: {count} files upserted, {len(deleted_paths)} deleted"
+        )
+        return version
+
+    def apply_delta(self, repo_name: str, delta: Dict[str, Any], commit_sha: Optional[str] = None) -> int:
+        """
+        Apply a delta computed by the indexer (/score_delta) in one transaction.
+
+        Args:
+            repo_name (str): Name of the repository
+            delta (dict): {"upserts", "deletes", "previous_index_version"}
+            commit_sha (str): Commit the updated index corresponds to, the recorded one is kept when None
+
+        Returns:
+            int: The new index version
+
+        Raises:
+            Exception: If the index changed since the version the delta was computed against
+        """
+        return self.update_repository(
+            repo_name,
+            delta.get("upserts"),
+            delta.get("deletes", []),
+            commit_sha=commit_sha,
+            expected_version=delta.get("previous_index_version"),
+        )
+
+    def has_repository(self, repo_name: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM repositories WHERE repo_name = ?", (repo_name,)
+            ).fetchone()
+        return row is not None
+
+    def index_version(self, repo_name: str) -> Optional[int]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT index_version FROM repositories WHERE repo_name = ?", (repo_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def commit_sha(self, repo_name: str) -> Optional[str]:
+        """Commit the index of a repository was built from, None if unknown."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT commit_sha FROM repositories WHERE repo_name = ?", (repo_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_by_path(self, repo_name: str, file_path: str, category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Entry of a file, None if the file is not indexed (in category, when given)."""
+        query = "SELECT entry FROM files WHERE repo_name = ? AND file_path = ?"
+        params = [repo_name, file_path]
+        if category is not None:
+            query += " AND category = ?"
+            params.append(category)
+        with self._lock:
+            row = self._connection.execute(query, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_by_id(self, repo_name: str, category: str, file_id: str) -> Optional[Dict[str, Any]]:
+        """Entry with this stable file_id in a category, None if there is none."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT entry FROM files WHERE repo_name = ? AND category = ? AND file_id = ?",
+                (repo_name, category, file_id),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def symbol_tables(self, repo_name: str) -> Dict[str, Dict[str, Any]]:
+        """Symbol table of every indexed source file of a repository, by path."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT file_path, symbol_table FROM symbol_tables WHERE repo_name = ? ORDER BY file_path",
+                (repo_name,),
+            ).fetchall()
+        return {file_path: json.loads(table) for file_path, table in rows}
+
+    def content_hashes(self, repo_name: str) -> Dict[str, str]:
+        """Content hash of every indexed file of a repository, by path."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT file_path, content_hash FROM files WHERE repo_name = ?", (repo_name,)
+            ).fetchall()
+        return {file_path: content_hash for file_path, content_hash in rows}
+
+    def export_json(self, repo_name: str) -> Optional[Dict[str, Dict[str, List[Dict[str, Any]]]]]:
+        """
+        Index of a repository in the shape of the legacy JSON files.
+
+        A repository indexed by an older version is imported from its JSON files first.
+
+        Returns:
+            Optional[dict]: {"documentation": {"documentation": [...]}, "documentation_md":
+            {"documentation_md": [...]}, "config": {"config": [...]}, "symbols": {path:
+            symbol table}}, entries ordered by path; None if the repository is not indexed
+        """
+        if not self.has_repository(repo_name) and not self.import_legacy_json(repo_name):
+            return None
+        exported = {category: {category: []} for category in CATEGORIES}
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT category, entry FROM files WHERE repo_name = ? ORDER BY category, file_path",
+                (repo_name,),
+            ).fetchall()
+        for category, entry in rows:
+            exported[category][category].append(json.loads(entry))
+        exported["symbols"] = self.symbol_tables(repo_name)
+        return exported
+
+    def load_manifest(self, repo_name: str) -> Dict[str, ManifestEntry]:
+        """Last saved manifest of the working tree of a repository, empty if none was saved."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT relative_path, size, mtime_ns, inode, content_hash FROM manifests WHERE repo_name = ?",
+                (repo_name,),
+            ).fetchall()
+        return {relative_path: ManifestEntry(*entry) for relative_path, *entry in rows}
+
+    def save_manifest(self, repo_name: str, manifest: Dict[str, ManifestEntry]) -> None:
+        """Replace the manifest of a repository in one transaction."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM manifests WHERE repo_name = ?", (repo_name,))
+            self._connection.executemany(
+                "INSERT INTO manifests (repo_name, relative_path, size, mtime_ns, inode, content_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (repo_name, relative_path, entry.size, entry.mtime_ns, entry.inode, entry.content_hash)
+                    for relative_path, entry in manifest.items()
+                ],
+            )
+
+    def import_legacy_json(self, repo_name: str, base_dir: str = INDEX_LEGACY_JSON_DIR) -> bool:
+        """
+        Import the index of a repository from the JSON files written by older versions.
+
+        Returns:
+            bool: Whether the legacy files existed and were imported
+        """
+        documentation_path = Path(base_dir) / LEGACY_JSON_DIRECTORIES["documentation"] / f"{repo_name}.json"
+        if not documentation_path.exists():
+            return False
+        result = {}
+        for category, directory in LEGACY_JSON_DIRECTORIES.items():
+            path = Path(base_dir) / directory / f"{repo_name}.json"
+            try:
+                with open(path, "r") as f:
+                    result[category] = json.load(f).get(category, [])
+            except (OSError, ValueError, AttributeError) as e:
+                if category == "documentation":
+                    logger.warning(f"Failed to import legacy index of {repo_name}: {e}")
+                    return False
+        self.replace_repository(repo_name, result)
+        logger.info(f"Imported legacy JSON index of {repo_name}")
+        return True
+
+
+# Module-level singleton shared by every request of the process
+_index_store: Optional[IndexStore] = None
+_index_store_lock = threading.Lock()
+
+
+def get_index_store() -> IndexStore:
+    """Initialize and return the process-wide index store."""
+    global _index_store
+    with _index_store_lock:
+        if _index_store is None:
+            _index_store = IndexStore()
+    return _index_store
@@ -13,11 +13,19 @@ from urllib.parse import urlparse
 import time
 import hashlib
 import shutil
+import sqlite3
 import tempfile
 import zipfile
 import traceback
 import json
-from typing import List, Tuple, Dict
+from typing import Callable, List, Tuple, Dict
+import threading
+from dataclasses import replace
+
+from src.core.index_store import get_index_store
+from src.core.git_mirror import clone_from_mirror
+from src.core.manifest import ManifestEntry, diff_manifests, rebase_manifest, scan_tree
+from src.core.zip_ingest import ingest_zip, zip_root
 
 import dotenv
 import os
@@ -35,6 +43,18 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Default configuration with environment variable
 genai.configure(api_key=GEMINI_API_KEY)
 
+# Base URL of the indexer service
+INDEXER_URL = os.getenv("INDEXER_URL", "http://localhost:8002")
+
+# Timeouts of each HTTP call to the indexer, and of a whole indexing job
+INDEXER_READ_TIMEOUT = float(os.getenv("INDEXER_READ_TIMEOUT", "120"))
+INDEXER_CONNECT_TIMEOUT = 10.0
+INDEXER_JOB_TIMEOUT = float(os.getenv("INDEXER_JOB_TIMEOUT", str(3 * 3600)))
+INDEXER_POLL_INTERVAL = float(os.getenv("INDEXER_POLL_INTERVAL", "2"))
+
+# Publish the partial index of the most important files before indexing finishes
+INDEXER_PROGRESSIVE = os.getenv("INDEXER_PROGRESSIVE", "true").lower() == "true"
+
 # Function to configure API with a specific key
 def configure_gemini_api(api_key=None):
     """Configure Gemini API with a specific key or use the environment variable"""
@@ -48,9 +68,14 @@ def clone_github_repo(folder_path: str, repo_url: str) -> Optional[str]:
     """
     Clone a GitHub repository into a specified folder or return path if already cloned.
 
+    The clone is a working tree of the local mirror of the remote (see
+    src/core/git_mirror.py): only the new objects are fetched into the mirror,
+    and only the files the indexer reads are checked out.
+
     Args:
         folder_path (str): The path where the repository should be cloned
-        repo_url (str): The GitHub repository URL (e.g., 'https://github.com/username/repo')
+        repo_url (str): The GitHub repository URL (e.g., 'https://github.com/username/repo'),
+            or a file:// URL of a local repository
 
     Returns:
         Optional[str]: The path to the cloned repository if successful, None if failed
@@ -71,10 +96,14 @@ def clone_github_repo(folder_path: str, repo_url: str) -> Optional[str]:
     # Extract repository name from the URL path
     # Handle both 'github.com/owner/repo' and 'github.com/owner/repo.git'
     path_parts = parsed_url.path.strip("/").split("/")
-    if len(path_parts) != 2:
+    if parsed_url.scheme == "file":
+        git_url = repo_url.rstrip("/")
+    elif len(path_parts) != 2:
         raise ValueError("Invalid GitHub repository URL format")
+    else:
+        git_url = f"https://github.com/{path_parts[0]}/{path_parts[1]}.git"
 
-    repo_name = path_parts[1].replace(".git", "")
+    repo_name = path_parts[-1].replace(".git", "")
 
     # Create the target directory if it doesn't exist
     folder_path = Path(folder_path).resolve()
@@ -92,16 +121,8 @@ def clone_github_repo(folder_path: str, repo_url: str) -> Optional[str]:
         # Check if git is installed
         subprocess.run(["git", "--version"], check=True, capture_output=True)
 
-        # Construct the git URL
-        git_url = f"https://github.com/{path_parts[0]}/{path_parts[1]}.git"
-
-        # Clone the repository
-        subprocess.run(
-            ["git", "clone", git_url, str(repo_path)],
-            check=True,
-            capture_output=True,
-            text=True,
-        )
+        # Check out the repository from its mirror, created or refreshed first
+        clone_from_mirror(git_url, repo_path)
 
         # Verify the repository was cloned successfully
         if not (repo_path / ".git").exists():
@@ -119,6 +140,226 @@ def clone_github_repo(folder_path: str, repo_url: str) -> Optional[str]:
         return None
 
 
+def _git(repo_path, *args: str) -> str:
+    """Run a git command in repo_path and return its output, raising CalledProcessError on failure."""
+    return subprocess.run(
+        ["git", "-C", str(repo_path), *args], check=True, capture_output=True, text=True
+    ).stdout
+
+
+def git_head(repo_path) -> Optional[str]:
+    """Commit SHA checked out in repo_path, None if it is not a git clone."""
+    try:
+        return _git(repo_path, "rev-parse", "HEAD").strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def fetch_remote_head(repo_path) -> str:
+    """
+    Fetch the new objects of the remote default branch into an existing clone.
+
+    Only the objects missing from the clone are transferred, the working tree is
+    left untouched.
+
+    Returns:
+        str: Commit SHA of the remote default branch
+    """
+    _git(repo_path, "fetch", "--quiet", "origin", "HEAD")
+    return _git(repo_path, "rev-parse", "FETCH_HEAD").strip()
+
+
+def git_changed_files(repo_path, old_sha: str, new_sha: str) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Files changed between two commits, from git diff --name-status with rename detection.
+
+    A renamed file counts as the deletion of its old path and the addition of its
+    new one (its summary comes from the summary cache when its content did not change).
+
+    Returns:
+        Tuple of (changed, added, deleted) paths relative to the repository root
+    """
+    fields = _git(repo_path, "diff", "--name-status", "-M", "-z", old_sha, new_sha).split("\0")
+    changed, added, deleted = [], [], []
+    index = 0
+    while index < len(fields) and fields[index]:
+        status = fields[index][0]
+        if status in ("R", "C"):
+            old_path, new_path = fields[index + 1], fields[index + 2]
+            index += 3
+            if status == "R":
+                deleted.append(old_path)
+            added.append(new_path)
+            continue
+        path = fields[index + 1]
+        index += 2
+        if status == "A":
+            added.append(path)
+        elif status == "D":
+            deleted.append(path)
+        else:
+            changed.append(path)
+    return changed, added, deleted
+
+
+def run_indexer_job(payload: dict, on_partial: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Index a folder through the job queue of the indexer service.
+
+    The job is submitted, polled until it finishes, then its result is fetched.
+    A folder already being indexed joins the running job instead of starting
+    another one. Transient connection errors while polling (e.g. an indexer
+    restart, after which the job is resumed) are retried.
+
+    Args:
+        payload (dict): Same body as the /score endpoint
+        on_partial (Callable): Called with the partial index of the most important
+            files as soon as the indexer publishes it, while the job keeps running
+
+    Returns:
+        dict: The indexer result ({"documentation", "documentation_md", "config"})
+
+    Raises:
+        requests.exceptions.RequestException: If the service is unreachable
+        Exception: If the job fails, is cancelled or exceeds INDEXER_JOB_TIMEOUT
+    """
+    timeout = (INDEXER_CONNECT_TIMEOUT, INDEXER_READ_TIMEOUT)
+    response = requests.post(f"{INDEXER_URL}/jobs", json=payload, timeout=timeout)
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    logger.info(f"Indexing job {job_id} submitted for {payload.get('folder_path')}")
+
+    deadline = time.monotonic() + INDEXER_JOB_TIMEOUT
+    connection_errors = 0
+    last_progress = None
+    partial_tier = None
+    while True:
+        if time.monotonic() > deadline:
+            raise Exception(f"Indexing job {job_id} did not finish within {INDEXER_JOB_TIMEOUT:.0f}s")
+        time.sleep(INDEXER_POLL_INTERVAL)
+        try:
+            response = requests.get(f"{INDEXER_URL}/jobs/{job_id}", timeout=timeout)
+            response.raise_for_status()
+        except requests.exceptions.ConnectionError:
+            connection_errors += 1
+            if connection_errors > 10:
+                raise
+            continue
+        connection_errors = 0
+
+        job = response.json()
+        if job["progress"] != last_progress:
+            last_progress = job["progress"]
+            logger.info(f"Indexing job {job_id} {job['status']}: {last_progress}")
+        if job["status"] == "succeeded":
+            break
+        if job["status"] in ("failed", "cancelled"):
+            raise Exception(f"Indexing job {job_id} {job['status']}: {job.get('error')}")
+
+        partial = job["progress"].get("partial")
+        if on_partial is not None and partial and partial["tier"] != partial_tier and job["status"] == "running":
+            try:
+                response = requests.get(
+                    f"{INDEXER_URL}/jobs/{job_id}/result", params={"partial": "true"}, timeout=timeout
+                )
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Partial result of indexing job {job_id} not available yet: {e}")
+                continue
+            partial_tier = partial["tier"]
+            logger.info(f"Indexing job {job_id} published tier {partial['tier']}/{partial['tiers']}")
+            on_partial(response.json()["result"])
+
+    response = requests.get(f"{INDEXER_URL}/jobs/{job_id}/result", timeout=timeout)
+    response.raise_for_status()
+    return response.json()["result"]
+
+
+def run_indexer_delta(payload: dict) -> dict:
+    """
+    Index the changed files of an indexed folder with the /score_delta endpoint.
+
+    Args:
+        payload (dict): Body of /score, plus changed_paths, deleted_paths (relative
+            to folder_path) and previous_index_version
+
+    Returns:
+        dict: The delta ({"upserts", "deletes", "previous_index_version"})
+
+    Raises:
+        requests.exceptions.RequestException: If the service is unreachable or fails
+    """
+    # The response only comes once the changed files are summarized, bounded like a whole job
+    timeout = (INDEXER_CONNECT_TIMEOUT, INDEXER_JOB_TIMEOUT)
+    response = requests.post(f"{INDEXER_URL}/score_delta", json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["result"]
+
+
+def index_progressively(
+    payload: dict,
+    publish: Callable[[dict, bool], str],
+    on_refresh: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Index a folder and publish its index, returning as soon as a usable one exists.
+
+    With on_refresh, the partial index of the most important files is published
+    and its cache name returned while the indexing goes on in a background thread;
+    the full index is published when the job finishes and its cache name passed
+    to on_refresh. Without it (or with INDEXER_PROGRESSIVE off), waits for the
+    full index.
+
+    Args:
+        payload (dict): Same body as the /score endpoint
+        publish (Callable): Saves an indexer result and creates its context cache,
+            returns the cache name. Its second argument is False for a partial
+            index, True for the full one
+        on_refresh (Callable): Receives the cache name of the full index
+
+    Returns:
+        str: Cache name of the first index published
+    """
+    if on_refresh is None or not INDEXER_PROGRESSIVE:
+        return publish(run_indexer_job(payload), True)
+
+    first_published = threading.Event()
+    outcome = {}
+
+    def on_partial(result: dict) -> None:
+        if first_published.is_set():
+            return
+        try:
+            outcome["cache_name"] = publish(result, False)
+        except Exception as e:
+            # The full index is published at the end anyway
+            logger.error(f"Failed to publish partial index of {payload.get('folder_path')}: {e}")
+            return
+        first_published.set()
+
+    def run() -> None:
+        try:
+            result = run_indexer_job(payload, on_partial)
+            if first_published.is_set():
+                on_refresh(publish(result, True))
+                logger.info(f"Refreshed the index of {payload.get('folder_path')} with all files")
+            else:
+                outcome["cache_name"] = publish(result, True)
+        except Exception as e:
+            if first_published.is_set():
+                logger.error(f"Background indexing of {payload.get('folder_path')} failed, keeping the partial index: {e}")
+            else:
+                outcome["error"] = e
+        finally:
+            first_published.set()
+
+    threading.Thread(target=run, name="indexer-refresh", daemon=True).start()
+    first_published.wait()
+    if "cache_name" not in outcome:
+        raise outcome.get("error") or Exception(f"Indexing of {payload.get('folder_path')} produced no index")
+    return outcome["cache_name"]
+
+
 def create_cache(display_name: str, documentation: str, system_prompt: str, gemini_api_key=None):
     # Configure Gemini API with the provided key or use the default
     configure_gemini_api(gemini_api_key)
@@ -249,17 +490,23 @@ def delete_cache(display_name: str):
 import os
 
 
-def process_repo_link(link: str, gemini_api_key=None, openai_api_key=None):
+def process_repo_link(
+    link: str,
+    gemini_api_key=None,
+    openai_api_key=None,
+    on_refresh: Optional[Callable[[str], None]] = None,
+):
+    """
+    Clone a repository, index it and create its context cache.
+
+    Args:
+        on_refresh (Callable): When given, the cache name is returned as soon as the
+            most important files are indexed, and on_refresh receives the cache
+            name of the full index once the background indexing finishes
+    """
     display_name = link.split("/")[-1]
-    documentation_path = f"docstrings_json/{display_name}.json"
-    documentation_md_path = f"ducomentations_json/{display_name}.json"
-    config_path = f"configs_json/{display_name}.json"
-    
-    # Ensure parent directories exist
-    Path(documentation_path).parent.mkdir(parents=True, exist_ok=True)
-    Path(documentation_md_path).parent.mkdir(parents=True, exist_ok=True)
-    Path(config_path).parent.mkdir(parents=True, exist_ok=True)
-    
+    index_store = get_index_store()
+
     repo_path = clone_github_repo("repository_folder", link)
 
     system_prompt = """
@@ -272,26 +519,14 @@ Your task is to answer any question related to the documentation of the python r
         "repository_name", display_name
     )
 
-    # Check if documentation file already exists
-    if os.path.exists(documentation_path):
-        # Load existing documentation
-        with open(documentation_path, "r") as f:
-            documentation_json = json.load(f)
-
-        # Load existing config and documentation_md if they exist
-        config = None # Initialize config
-        if os.path.exists(config_path):
-            with open(config_path, "r") as f:
-                config = json.load(f) # Load config as JSON
-        documentation_md = None # Initialize documentation_md
-        if os.path.exists(documentation_md_path):
-            with open(documentation_md_path, "r") as f:
-                documentation_md = json.load(f) # Load documentation_md as JSON
+    # Check if the repository is already indexed. An index without a recorded commit
+    # is partial or a placeholder (the full indexing never finished), it is rebuilt
+    existing_index = index_store.export_json(display_name) if index_store.commit_sha(display_name) else None
+    if existing_index is not None:
+        documentation_json = existing_index["documentation"]
     else:
         
         # If file doesn't exist, proceed with repo cloning and documentation generation
-        url_file_classification = "http://localhost:8002/score"
-
         # Get the documentation json from the fastapi documentation generation server
         logger.info(f"Calling classifier service for {repo_path}")
         api_key_preview = gemini_api_key[:5] if gemini_api_key and len(gemini_api_key) >= 5 else gemini_api_key
@@ -299,52 +534,33 @@ Your task is to answer any question related to the documentation of the python r
         
         payload = {
             "folder_path": str(repo_path), 
-            "batch_size": 50,
             "max_workers": 10,
             "GEMINI_API_KEY": gemini_api_key,
             "ANTHROPIC_API_KEY": "",
             "OPENAI_API_KEY": openai_api_key or ""
         }
+        # Recorded with the index, later refreshes only look at the commits after it
+        commit_sha = git_head(repo_path) if repo_path else None
         
+        def publish(response: dict, final: bool = True) -> str:
+            documentation_json = {"documentation": response["documentation"]}
+            # Only a full index is an index of the commit, a partial one must not look up to date
+            index_store.replace_repository(display_name, response, commit_sha=commit_sha if final else None)
+
+            return create_cache(display_name, str(documentation_json), system_prompt, gemini_api_key)
+
         try:
-            response = requests.post(url_file_classification, json=payload) # Use repo_path directly
-            if response.status_code != 200:
-                logger.error(f"Classifier service returned status code {response.status_code}")
-                # Create a minimal documentation structure to bypass the classifier service
-                response = {
-                    "documentation": {"repo_name": display_name, "files": {}},
-                    "documentation_md": {"repo_name": display_name, "files": {}},
-                    "config": {"repo_name": display_name}
-                }
-            else:
-                response_data = response.json()
-                response = response_data["result"]
+            return index_progressively(payload, publish, on_refresh)
         except Exception as e:
             logger.error(f"Error calling classifier service: {str(e)}")
+            # Not an index of the commit, the next refresh must index the repository again
+            commit_sha = None
             # Create a minimal documentation structure to bypass the classifier service
-            response = {
+            return publish({
                 "documentation": {"repo_name": display_name, "files": {}},
                 "documentation_md": {"repo_name": display_name, "files": {}},
                 "config": {"repo_name": display_name}
-            }
-
-        documentation_json = {"documentation": response["documentation"]}
-        documentation_md_json = {"documentation_md": response["documentation_md"]}
-        config_json = {"config": response["config"]}
-
-        logger.info(f"Loaded existing documentation_json")
-        logger.info(f"Loaded existing config")
-        logger.info(f"Loaded existing documentation_md")
-
-        # Save the documentation_json to a file
-        with open(documentation_path, "w") as f1:
-            json.dump(documentation_json, f1, indent=4)
-        # Save the config_json to a file
-        with open(documentation_md_path, "w") as f2:
-            json.dump(documentation_md_json, f2, indent=4)
-        # Save the config_json to a file
-        with open(config_path, "w") as f3:
-            json.dump(config_json, f3, indent=4)
+            })
 
     documentation_str = str(documentation_json)
     cache_name = create_cache(display_name, documentation_str, system_prompt, gemini_api_key)
@@ -352,12 +568,18 @@ Your task is to answer any question related to the documentation of the python r
     return cache_name
 
 
-def process_local_folder(repo_path_str: str, gemini_api_key=None, openai_api_key=None):
+def process_local_folder(
+    repo_path_str: str,
+    gemini_api_key=None,
+    openai_api_key=None,
+    manifest: Optional[Dict[str, ManifestEntry]] = None,
+):
     """
     Process a local repository folder that has already been copied to the shared volume.
 
     Args:
         repo_path_str (str): The path to the repository folder within the shared volume.
+        manifest (dict): Manifest of the folder when its writer already hashed it, scanned otherwise.
 
     Returns:
         str: The name of the created or updated context cache.
@@ -370,15 +592,7 @@ def process_local_folder(repo_path_str: str, gemini_api_key=None, openai_api_key
         raise ValueError(f"Provided path is not a directory: {repo_path_str}")
 
     display_name = repo_path.name
-    documentation_path = Path(f"docstrings_json/{display_name}.json")
-    documentation_md_path = Path(f"ducomentations_json/{display_name}.json")
-    config_path = Path(f"configs_json/{display_name}.json")
-
-    # Ensure parent directories exist
-    documentation_path.parent.mkdir(parents=True, exist_ok=True)
-    documentation_md_path.parent.mkdir(parents=True, exist_ok=True)
-    config_path.parent.mkdir(parents=True, exist_ok=True)
-
+    index_store = get_index_store()
 
     system_prompt = """
 # Context
@@ -388,19 +602,16 @@ Your task is to answer any question related to the documentation of the python r
 
 """.replace("repository_name", display_name)
 
-    # Check if documentation file already exists
-    if documentation_path.exists():
+    # Check if the repository is already indexed
+    existing_index = index_store.export_json(display_name)
+    if existing_index is not None:
         logger.info(f"Documentation already exists for {display_name}, loading...")
-        # Load existing documentation
-        with open(documentation_path, "r") as f:
-            documentation_json = json.load(f)
+        documentation_json = existing_index["documentation"]
         logger.info(f"Loaded existing documentation_json")
 
     else:
         logger.info(f"Documentation not found for {display_name}, generating...")
         # If file doesn't exist, proceed with documentation generation
-        url_file_classification = "http://localhost:8002/score"
-
         # Get the documentation json from the fastapi documentation generation server
         logger.info(f"Calling classifier service for local folder: {repo_path}")
         api_key_preview = gemini_api_key[:5] if gemini_api_key and len(gemini_api_key) >= 5 else gemini_api_key
@@ -408,7 +619,6 @@ Your task is to answer any question related to the documentation of the python r
         
         payload = {
             "folder_path": str(repo_path), 
-            "batch_size": 50,
             "max_workers": 10,
             "GEMINI_API_KEY": gemini_api_key,
             "ANTHROPIC_API_KEY": "",
@@ -416,8 +626,7 @@ Your task is to answer any question related to the documentation of the python r
         }
         
         try:
-            response = requests.post(url_file_classification, json=payload)
-            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+            response = run_indexer_job(payload)
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to connect to classifier service: {e}")
             raise Exception(f"Failed to connect to classifier service: {e}")
@@ -425,31 +634,19 @@ Your task is to answer any question related to the documentation of the python r
             logger.error(f"Error during classifier request: {e}")
             raise Exception(f"Error during classifier request: {e}")
 
-        if response.status_code != 200:
-             logger.error(f"Classifier service returned status {response.status_code}: {response.text}")
-             raise Exception(f"Classifier service failed with status {response.status_code}.")
-
-        response_data = response.json()
-        logger.info(f"Received response from classifier: {response_data}")
-        response = response_data["result"]
+        logger.info(f"Received response from classifier for {display_name}")
 
         documentation_json = {"documentation": response.get("documentation", {})}
-        documentation_md_json = {"documentation_md": response.get("documentation_md", "")}
-        config_json = {"config": response.get("config", {})}
-
 
         # Save the generated data
         try:
-            with open(documentation_path, "w") as f1:
-                json.dump(documentation_json, f1, indent=4)
-            with open(documentation_md_path, "w") as f2:
-                json.dump(documentation_md_json, f2, indent=4)
-            with open(config_path, "w") as f3:
-                json.dump(config_json, f3, indent=4)
+            index_store.replace_repository(display_name, response)
+            # Next uploads of this folder only hash the files whose stat changed
+            index_store.save_manifest(display_name, manifest if manifest is not None else scan_tree(repo_path))
             logger.info(f"Successfully saved generated documentation for {display_name}")
-        except IOError as e:
-            logger.error(f"Failed to write documentation files: {e}")
-            raise Exception(f"Failed to write documentation files: {e}")
+        except sqlite3.Error as e:
+            logger.error(f"Failed to store documentation: {e}")
+            raise Exception(f"Failed to store documentation: {e}")
 
 
     documentation_str = str(documentation_json) # Use the structure containing 'documentation' key
@@ -461,93 +658,6 @@ Your task is to answer any question related to the documentation of the python r
 
 
 
-def get_file_hash(file_path: Path) -> str:
-    """Calculate MD5 hash of file content for quick comparison."""
-    if not file_path.is_file():
-        return ""
-    
-    hash_md5 = hashlib.md5()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-    except Exception as e:
-        logger.error(f"Error hashing file {file_path}: {e}")
-        return ""
-
-def compare_directories(source_dir: Path, target_dir: Path) -> Tuple[List[Path], List[Path], List[Path]]:
-    """
-    Compare two directories and return lists of changed, added, and deleted files.
-    
-    Args:
-        source_dir: Path to the new directory
-        target_dir: Path to the existing directory
-        
-    Returns:
-        Tuple of (changed_files, added_files, deleted_files)
-    """
-    if not source_dir.exists() or not target_dir.exists():
-        raise ValueError(f"Both directories must exist: {source_dir}, {target_dir}")
-    
-    # Get all files recursively from both directories, excluding .git
-    source_files = {p.relative_to(source_dir): get_file_hash(p) 
-                    for p in source_dir.rglob('*') 
-                    if p.is_file() and '.git' not in p.parts}
-    target_files = {p.relative_to(target_dir): get_file_hash(p) 
-                    for p in target_dir.rglob('*') 
-                    if p.is_file() and '.git' not in p.parts}
-    
-    # Find changes
-    changed_files = [source_dir / p for p, hash_val in source_files.items() 
-                    if p in target_files and hash_val != target_files[p]]
-    
-    # Find additions (files in source not in target)
-    added_files = [source_dir / p for p in source_files.keys() if p not in target_files]
-    
-    # Find deletions (files in target not in source)
-    deleted_files = [target_dir / p for p in target_files.keys() if p not in source_files]
-    
-    return changed_files, added_files, deleted_files
-
-def prepare_temp_folder_for_changes(
-    changed_files: List[Path], 
-    added_files: List[Path],
-    source_dir: Path,
-    temp_dir: Path
-) -> Dict[str, str]:
-    """
-    Create a temporary folder with only changed and added files, preserving original paths.
-    
-    Args:
-        changed_files: List of changed file paths
-        added_files: List of added file paths
-        source_dir: Source directory (new version)
-        temp_dir: Temporary directory to create files in
-        
-    Returns:
-        Mapping of temporary file paths to original paths
-    """
-    # Create mapping of paths
-    path_mapping = {}
-    
-    # Process all changed and added files
-    all_files = changed_files + added_files
-    for file_path in all_files:
-        rel_path = file_path.relative_to(source_dir)
-        temp_file_path = temp_dir / rel_path
-        
-        # Create parent directories if they don't exist
-        temp_file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Copy the file
-        shutil.copy2(file_path, temp_file_path)
-        
-        # Add to mapping (storing both original and temporary paths)
-        path_mapping[str(temp_file_path)] = str(file_path)
-    
-    return path_mapping
-
 def process_changed_repository(repo_name: str, new_repo_path: Path, existing_repo_path: Path, gemini_api_key: str, anthropic_api_key: str = None, openai_api_key: str = None) -> str:
     """
     Process a repository that has changes compared to an existing one.
@@ -564,8 +674,16 @@ def process_changed_repository(repo_name: str, new_repo_path: Path, existing_rep
     logger.info(f"Detecting changes between existing repo and new repo: {repo_name}")
     
     try:
-        # Compare directories to find changes
-        changed_files, added_files, deleted_files = compare_directories(new_repo_path, existing_repo_path)
+        # Compare directories to find changes. The existing tree is described by the
+        # manifest saved when it was written, only the files whose stat changed are hashed.
+        index_store = get_index_store()
+        existing_manifest = scan_tree(existing_repo_path, index_store.load_manifest(repo_name))
+        index_store.save_manifest(repo_name, existing_manifest)
+        new_manifest = scan_tree(new_repo_path)
+        changed, added, deleted = diff_manifests(existing_manifest, new_manifest)
+        changed_files = [new_repo_path / p for p in changed]
+        added_files = [new_repo_path / p for p in added]
+        deleted_files = [existing_repo_path / p for p in deleted]
         
         # Log what we found
         logger.info(f"Found {len(changed_files)} changed files, {len(added_files)} added files, and {len(deleted_files)} deleted files")
@@ -573,9 +691,10 @@ def process_changed_repository(repo_name: str, new_repo_path: Path, existing_rep
         if not changed_files and not added_files and not deleted_files:
             logger.info(f"No changes detected for {repo_name}, using existing cached data")
             # If no changes, load existing documentation and return existing cache
-            documentation_path = Path(f"docstrings_json/{repo_name}.json")
-            with open(documentation_path, "r") as f:
-                documentation_json = json.load(f)
+            existing_index = get_index_store().export_json(repo_name)
+            if existing_index is None:
+                raise Exception(f"No index found for {repo_name}")
+            documentation_json = existing_index["documentation"]
                 
             # Create system prompt and cache with existing data
             system_prompt = """
@@ -592,165 +711,160 @@ Your task is to answer any question related to the documentation of the python r
             
             return cache_name
         
-        # If we have changes, process only those files
-        # Create temporary directory within repository_folder instead of system default temp location
-        target_base_path = Path("/app/repository_folder")
-        temp_dir = target_base_path / f"temp_{repo_name}_changes"
-        
-        # Ensure the directory doesn't exist (clean state)
-        if temp_dir.exists():
-            shutil.rmtree(temp_dir)
-        
-        # Create the directory
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        
-        try:
-            # Create a temporary folder with only changed/added files
-            # Replace the old repository with the new one first
-            logger.info(f"Replacing content at {existing_repo_path} with content from {new_repo_path}")
-            if existing_repo_path.exists(): # Ensure it exists before removing
-                shutil.rmtree(existing_repo_path)
-            shutil.copytree(new_repo_path, existing_repo_path)
-            logger.info(f"Updated repository content at {existing_repo_path}")
-
-            # Replace the old repository with the new one first
-            logger.info(f"Replacing content at {existing_repo_path} with content from {new_repo_path}")
-            if existing_repo_path.exists(): # Ensure it exists before removing
-                shutil.rmtree(existing_repo_path)
-            shutil.copytree(new_repo_path, existing_repo_path)
-            logger.info(f"Updated repository content at {existing_repo_path}")
-
-            path_mapping = prepare_temp_folder_for_changes(
-                changed_files, added_files, new_repo_path, temp_dir
-            )
-            
-            logger.info(f"Created temporary folder with {len(path_mapping)} files for classification at {temp_dir}")
-            
-            # Call classifier on the updated repository in the shared volume
-            url_file_classification = "http://localhost:8002/score"
-            logger.info(f"Calling classifier service for updated repo at {existing_repo_path}")
-            response = requests.post(
-                url_file_classification, json={
-                    "folder_path": str(existing_repo_path), 
-                    "batch_size": 50,
-                    "max_workers": 10,
-                    "GEMINI_API_KEY": gemini_api_key,
-                    "ANTHROPIC_API_KEY": "",
-                    "OPENAI_API_KEY": openai_api_key
-                } # Use the path in the shared volume
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Classifier service failed with status {response.status_code}.")
-                
-            response_result = response.json()
-            response_data = response_result["result"]
-            
-            # Load existing JSON files using absolute paths
-            documentation_path = Path(f"/app/docstrings_json/{repo_name}.json")
-            documentation_md_path = Path(f"/app/ducomentations_json/{repo_name}.json")
-            config_path = Path(f"/app/configs_json/{repo_name}.json")
-            
-            # Ensure parent directories exist
-            documentation_path.parent.mkdir(parents=True, exist_ok=True)
-            documentation_md_path.parent.mkdir(parents=True, exist_ok=True)
-            config_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(documentation_path, "r") as f1:
-                documentation_json = json.load(f1)
-            with open(documentation_md_path, "r") as f2:
-                documentation_md_json = json.load(f2)
-            with open(config_path, "r") as f3:
-                config_json = json.load(f3)
-                
-            # Update JSONs with new data
-            # 1. Remove entries for deleted files
-            deleted_rel_paths = [str(f.relative_to(existing_repo_path)) for f in deleted_files]
-            
-            # Handle docstrings_json (documentation)
-            if "documentation" in documentation_json:
-                updated_docs = []
-                for item in documentation_json["documentation"]:
-                    if "file_paths" in item and not any(item["file_paths"].endswith(deleted_path) for deleted_path in deleted_rel_paths):
-                        updated_docs.append(item)
-                documentation_json["documentation"] = updated_docs
-            
-            # Handle documentation_md
-            if "documentation_md" in documentation_md_json:
-                updated_md_docs = []
-                for item in documentation_md_json["documentation_md"]:
-                    if "file_paths" in item and not any(item["file_paths"].endswith(deleted_path) for deleted_path in deleted_rel_paths):
-                        updated_md_docs.append(item)
-                documentation_md_json["documentation_md"] = updated_md_docs
-            
-            # Handle configs
-            if "config" in config_json:
-                updated_configs = []
-                for item in config_json["config"]:
-                    if "file_paths" in item and not any(item["file_paths"].endswith(deleted_path) for deleted_path in deleted_rel_paths):
-                        updated_configs.append(item)
-                config_json["config"] = updated_configs
-            
-            # 2. Add new entries for changed/added files
-            # Map temporary paths back to original paths for proper integration
-            if "documentation" in response_data:
-                for item in response_data["documentation"]:
-                    if "file_paths" in item and item["file_paths"] in path_mapping:
-                        # Replace temp path with original path
-                        item["file_paths"] = path_mapping[item["file_paths"]]
-                        # Add to existing documentation
-                        documentation_json["documentation"].append(item)
-            
-            if "documentation_md" in response_data:
-                for item in response_data["documentation_md"]:
-                    if "file_paths" in item and item["file_paths"] in path_mapping:
-                        item["file_paths"] = path_mapping[item["file_paths"]]
-                        documentation_md_json["documentation_md"].append(item)
-                        
-            if "config" in response_data:
-                for item in response_data["config"]:
-                    if "file_paths" in item and item["file_paths"] in path_mapping:
-                        item["file_paths"] = path_mapping[item["file_paths"]]
-                        config_json["config"].append(item)
-            
-            # Save updated JSONs using absolute paths
-            with open(documentation_path, "w") as f1:
-                json.dump(documentation_json, f1, indent=4)
-            with open(documentation_md_path, "w") as f2:
-                json.dump(documentation_md_json, f2, indent=4)
-            with open(config_path, "w") as f3:
-                json.dump(config_json, f3, indent=4)
-            
-            # Create system prompt and cache
-            system_prompt = """
+        # Bring the existing tree to the new version by applying the diff, unchanged files are not copied
+        logger.info(f"Applying changes from {new_repo_path} to {existing_repo_path}")
+        for deleted_file in deleted_files:
+            deleted_file.unlink(missing_ok=True)
+        for relative_path in changed + added:
+            target_file = existing_repo_path / relative_path
+            target_file.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(new_repo_path / relative_path, target_file)
+        logger.info(f"Updated repository content at {existing_repo_path}")
+        # The updated tree has the content hashed in new_manifest, only its stat tuples differ
+        index_store.save_manifest(repo_name, rebase_manifest(existing_repo_path, new_manifest))
+
+        return update_repository_index(
+            repo_name,
+            existing_repo_path,
+            changed + added,
+            deleted,
+            gemini_api_key,
+            openai_api_key,
+        )
+    
+    except Exception as e:
+        logger.error(f"Error processing changed repository {repo_name}: {str(e)}", exc_info=True)
+        # Do not fall back to full processing here, raise the error
+        raise e
+
+def update_repository_index(
+    repo_name: str,
+    repo_path: Path,
+    changed_rel_paths: List[str],
+    deleted_rel_paths: List[str],
+    gemini_api_key: str,
+    openai_api_key: str = None,
+    commit_sha: Optional[str] = None,
+) -> str:
+    """
+    Index the changed files of a repository, update its stored index and create its cache.
+
+    Only the changed files are classified and summarized by the indexer, the
+    returned delta is applied to the index version it was computed against.
+
+    Args:
+        repo_name: Name of the repository
+        repo_path: Path of the updated repository in the shared volume
+        changed_rel_paths: Changed and added files, relative to repo_path
+        deleted_rel_paths: Removed files, relative to repo_path
+        commit_sha: Commit the updated index corresponds to
+
+    Returns:
+        cache_name: The name of the cache for the updated repository
+    """
+    index_store = get_index_store()
+    logger.info(f"Calling classifier service for {len(changed_rel_paths)} changed files of {repo_path}")
+    delta = run_indexer_delta(
+        {
+            "folder_path": str(repo_path), # Use the path in the shared volume
+            "max_workers": 10,
+            "GEMINI_API_KEY": gemini_api_key,
+            "ANTHROPIC_API_KEY": "",
+            "OPENAI_API_KEY": openai_api_key or "",
+            "changed_paths": list(changed_rel_paths),
+            "deleted_paths": list(deleted_rel_paths),
+            "previous_index_version": index_store.index_version(repo_name),
+        }
+    )
+    index_store.apply_delta(repo_name, delta, commit_sha=commit_sha)
+    documentation_json = index_store.export_json(repo_name)["documentation"]
+
+    # Create system prompt and cache
+    system_prompt = """
 # Context
 You are an expert Software developer with a deep understanding of the software development lifecycle, including requirements gathering, design, implementation, testing, and deployment.
 Your task is to answer any question related to the documentation of the python repository repository_name that you have in your context.
 
 
 """.replace("repository_name", repo_name)
-            
-            documentation_str = str(documentation_json)
-            from src.core.init_repo import create_cache
-            cache_name = create_cache(repo_name, documentation_str, system_prompt, gemini_api_key)
-            
-            return cache_name
-        finally:
-            # Clean up the temporary directory
-            if temp_dir.exists():
-                try:
-                    shutil.rmtree(temp_dir)
-                    logger.info(f"Cleaned up temporary directory: {temp_dir}")
-                except Exception as cleanup_error:
-                    logger.warning(f"Failed to clean up temporary directory {temp_dir}: {cleanup_error}")
-    
-    except Exception as e:
-        logger.error(f"Error processing changed repository {repo_name}: {str(e)}", exc_info=True)
-        # Do not fall back to full processing here, raise the error
-        raise e
 
-def init_repo(repo_link, gemini_api_key=None, openai_api_key=None):
-    """Initialize repository and get parameters"""
+    documentation_str = str(documentation_json)
+    return create_cache(repo_name, documentation_str, system_prompt, gemini_api_key)
+
+
+def cache_stored_index(repo_name: str, gemini_api_key: str) -> str:
+    """
+    Create the context cache of a repository from its stored index, for refreshes that changed nothing.
+
+    Returns:
+        cache_name: The name of the cache of the repository
+    """
+    existing_index = get_index_store().export_json(repo_name)
+    if existing_index is None:
+        raise Exception(f"No index found for {repo_name}")
+    system_prompt = """
+# Context
+You are an expert Software developer with a deep understanding of the software development lifecycle, including requirements gathering, design, implementation, testing, and deployment.
+Your task is to answer any question related to the documentation of the python repository repository_name that you have in your context.
+
+
+""".replace("repository_name", repo_name)
+    return create_cache(repo_name, str(existing_index["documentation"]), system_prompt, gemini_api_key)
+
+
+def process_git_repository_update(
+    repo_name: str,
+    repo_path: Path,
+    gemini_api_key: str,
+    openai_api_key: str = None,
+) -> str:
+    """
+    Refresh the index of an existing clone from the commits pushed since it was indexed.
+
+    Fetches the new objects of the remote default branch into the clone, lists the
+    changes with git diff against the indexed commit, moves the working tree to
+    the new commit and indexes the changed files only. Nothing is cloned or hashed.
+
+    Args:
+        repo_name: Name of the repository
+        repo_path: Path of the existing clone
+        
+    Returns:
+        cache_name: The name of the cache for the updated repository
+    """
+    index_store = get_index_store()
+    old_sha = index_store.commit_sha(repo_name)
+    new_sha = fetch_remote_head(repo_path)
+
+    if new_sha == old_sha:
+        logger.info(f"No new commit for {repo_name} since {old_sha[:12]}, using existing cached data")
+        return cache_stored_index(repo_name, gemini_api_key)
+
+    changed_files, added_files, deleted_files = git_changed_files(repo_path, old_sha, new_sha)
+    logger.info(
+        f"{repo_name} moved {old_sha[:12]}..{new_sha[:12]}: {len(changed_files)} changed files, "
+        f"{len(added_files)} added files, and {len(deleted_files)} deleted files"
+    )
+    _git(repo_path, "reset", "--quiet", "--hard", new_sha)
+
+    return update_repository_index(
+        repo_name,
+        repo_path,
+        changed_files + added_files,
+        deleted_files,
+        gemini_api_key,
+        openai_api_key,
+        commit_sha=new_sha,
+    )
+
+
+def init_repo(repo_link, gemini_api_key=None, openai_api_key=None, on_refresh: Optional[Callable[[str], None]] = None):
+    """
+    Initialize repository and get parameters.
+
+    With on_refresh, a new repository is returned as soon as its most important
+    files are indexed; on_refresh receives the cache name of the full index.
+    """
     try:
         # Check if it's a local path (simple check, might need refinement)
         if Path(repo_link).is_dir():
@@ -771,12 +885,26 @@ def init_repo(repo_link, gemini_api_key=None, openai_api_key=None):
         target_base_path = Path("/app/repository_folder")
         target_repo_path = target_base_path / repo_name
         
-        if target_repo_path.exists():
+        is_clone = target_repo_path.exists() and (target_repo_path / ".git").exists()
+        if is_clone and get_index_store().commit_sha(repo_name):
+            # Indexed clone: the changes come from git, without cloning again
+            logger.info(f"Repository already exists: {repo_name}. Fetching new commits...")
+            cache_name = process_git_repository_update(
+                repo_name,
+                target_repo_path,
+                gemini_api_key,
+                openai_api_key=openai_api_key,
+            )
+        elif is_clone:
+            # Clone whose full indexing never finished (failed or interrupted), its partial index is replaced
+            logger.info(f"Repository already exists: {repo_name} but its index is incomplete. Indexing it again...")
+            cache_name = process_repo_link(repo_link, gemini_api_key, openai_api_key, on_refresh)
+        elif target_repo_path.exists():
             logger.info(f"Repository already exists: {repo_name}. Checking for changes...")
             
             # Create a temporary directory for the new repository
             with tempfile.TemporaryDirectory() as temp_clone_dir:
-                # Clone the repository to a temporary location
+                # Check out the repository in a temporary location, from its mirror: only new objects are fetched
                 from src.core.init_repo import clone_github_repo
                 temp_repo_path = clone_github_repo(temp_clone_dir, repo_link)
                 
@@ -793,7 +921,7 @@ def init_repo(repo_link, gemini_api_key=None, openai_api_key=None):
                 )
         else:
             # Repository doesn't exist, process normally
-            cache_name = process_repo_link(repo_link, gemini_api_key, openai_api_key)
+            cache_name = process_repo_link(repo_link, gemini_api_key, openai_api_key, on_refresh)
             
         logger.info(f"process_repo_link returned cache_name: {cache_name}")
         repo_params = {"repo_name": repo_name, "cache_id": cache_name}
@@ -810,167 +938,121 @@ def init_repo(repo_link, gemini_api_key=None, openai_api_key=None):
         }, f"Error initializing repository via URL: {str(e)}"
 
 
-def handle_zip_upload(uploaded_zip_file, gemini_api_key=None, openai_api_key=None):
-    """Handle zip file upload, extract, copy, and process it."""
+def handle_zip_upload(uploaded_zip_file, gemini_api_key=None, openai_api_key=None, filename: Optional[str] = None):
+    """
+    Handle a zip upload: stream its members into the repository folder and process it.
+
+    The archive is read once (see src/core/zip_ingest.py): ignored paths are
+    skipped, the other members are hashed and written straight into
+    /app/repository_folder. For a repository that was uploaded before, only the
+    changed files are written and indexed.
+
+    Args:
+        uploaded_zip_file: Path of the uploaded archive, or a seekable binary file object
+        filename (str): Name of the uploaded archive, the repository name when the
+            archive has no single top-level folder
+
+    Yields:
+        tuple: (repo_params, status message), the last one carries the outcome
+    """
     api_key_preview = gemini_api_key[:5] if gemini_api_key and len(gemini_api_key) >= 5 else gemini_api_key
     logger.info(f"Handling zip upload with GEMINI_API_KEY: {api_key_preview}... (length: {len(gemini_api_key) if gemini_api_key else 0})")
     repo_params_error = {"repo_name": "", "cache_id": ""}
-    if not uploaded_zip_file or not isinstance(uploaded_zip_file, str):
-        # Check if it's None or not a list
+    if not uploaded_zip_file or not (isinstance(uploaded_zip_file, str) or hasattr(uploaded_zip_file, "read")):
         logger.warning(f"Invalid input to handle_zip_upload: {uploaded_zip_file}")
-        return repo_params_error, "No folder uploaded or invalid data received."
+        yield repo_params_error, "No folder uploaded or invalid data received."
+        return
 
     initial_message = "Starting folder processing..."
     # Yield initial message immediately
     yield repo_params_error, initial_message
 
-    # Get the original filename from the temporary file path
-    temp_zip_filepath = Path(uploaded_zip_file)
-    original_filename = "uploaded_repo.zip" # Default
-    try:
-        original_filename = temp_zip_filepath.name
-        logger.info(f"Original filename from temp file path: {original_filename}")
-    except Exception as e:
-        logger.warning(f"Could not parse original filename from temp path '{temp_zip_filepath}': {e}")
+    if filename is None:
+        filename = Path(uploaded_zip_file).name if isinstance(uploaded_zip_file, str) else "uploaded_repo.zip"
+    target_base_path = Path("/app/repository_folder")
+    index_store = get_index_store()
 
     try:
-        # Create a temporary directory to extract the zip file
-        with tempfile.TemporaryDirectory() as extraction_dir:
-            extraction_base = Path(extraction_dir)
-            logger.info(f"Created extraction directory: {extraction_base}")
-
-            repo_name = None
-            temp_source_dir = None
-
-            try:
-                logger.info("Attempting to extract zip file...")
-                # Open the zip file using the provided filepath
-                with zipfile.ZipFile(temp_zip_filepath, 'r') as zip_ref:
-                    # Check for potential path traversal issues (basic check)
-                    for member in zip_ref.namelist():
-                        if member.startswith('/') or '..' in member:
-                            raise ValueError(f"Zip file contains unsafe path: {member}")
-                    zip_ref.extractall(extraction_base)
-                logger.info(f"Successfully extracted zip to {extraction_base}")
-
-                # Determine the root directory within the extracted contents
-                extracted_items = list(extraction_base.iterdir())
-                if len(extracted_items) == 1 and extracted_items[0].is_dir():
-                    # Common case: zip contains a single root folder
-                    temp_source_dir = extracted_items[0]
-                    repo_name = temp_source_dir.name
-                    logger.info(f"Identified single root directory: {repo_name}")
-                elif len(extracted_items) > 1:
-                    # Case: zip extracts multiple files/folders at the root
-                    # We might need to treat the extraction_base itself as the source
-                    # and perhaps derive a name from the original zip filename?
-                    # Use the original zip filename (stem) as repo_name
-                    repo_name = Path(original_filename).stem
-                    temp_source_dir = extraction_base
-                    logger.warning(f"Zip file extracted multiple items at root. Using extraction dir as source and name '{repo_name}'.")
-                else:
-                    raise ValueError("Zip file is empty or contains unexpected structure after extraction.")
-
-            except zipfile.BadZipFile:
-                logger.error("Invalid zip file uploaded.")
-                yield repo_params_error, "Error: Invalid or corrupted zip file."
-                return
-            except Exception as extract_e:
-                logger.error(f"Error during zip extraction: {extract_e}\n{traceback.format_exc()}")
-                yield repo_params_error, f"Error during zip extraction: {extract_e}"
-                return
-
-            # --- The rest of the logic uses the extracted temp_source_dir ---
-
-            if not repo_name or not temp_source_dir or not temp_source_dir.is_dir():
-                logger.error("Failed to determine valid source directory or repo name after extraction.")
-                yield repo_params_error, "Error: Could not process extracted zip contents."
-                return
-
-            target_base_path = Path("/app/repository_folder")
+        with zipfile.ZipFile(uploaded_zip_file, "r") as archive:
+            repo_name, root = zip_root(archive, Path(filename).stem)
             target_repo_path = target_base_path / repo_name
+            indexed = index_store.has_repository(repo_name) or index_store.import_legacy_json(repo_name)
+            logger.info(f"Handling upload for folder: {repo_name}, target path: {target_repo_path}")
 
-            logger.info(f"Handling upload for folder: {repo_name}")
-            logger.info(f"Temporary source directory: {temp_source_dir}")
-            logger.info(f"Target path: {target_repo_path}")
-
-            # Create target base directory if it doesn't exist
-            target_base_path.mkdir(parents=True, exist_ok=True)
-
-            # Check if the repository already exists
             if target_repo_path.exists():
-                logger.info(f"Repository already exists: {repo_name}. Checking for changes...")
                 yield repo_params_error, f"Repository '{repo_name}' already exists. Checking for changes..."
-                
-                # Process the repository with change detection
-                cache_name = process_changed_repository(
+                # Only the files whose stat changed since the last upload are hashed
+                previous = scan_tree(target_repo_path, index_store.load_manifest(repo_name))
+            else:
+                yield repo_params_error, f"Copying folder '{repo_name}'..."
+                previous = {}
+            target_base_path.mkdir(parents=True, exist_ok=True)
+            ingested = ingest_zip(archive, root, target_repo_path, previous)
+    except zipfile.BadZipFile:
+        logger.error("Invalid zip file uploaded.")
+        yield repo_params_error, "Error: Invalid or corrupted zip file."
+        return
+    except Exception as extract_e:
+        logger.error(f"Error during zip extraction: {extract_e}\n{traceback.format_exc()}")
+        yield repo_params_error, f"Error during zip extraction: {extract_e}"
+        return
+
+    changed_paths = ingested.changed + ingested.added
+    try:
+        if indexed:
+            if ingested.deleted:
+                # The files are already gone from the folder and the manifest: drop their records
+                # before indexing, a failed indexing must not leave them in the index for good
+                index_store.update_repository(
+                    repo_name,
+                    deleted_paths=[os.path.join(str(target_repo_path), path) for path in ingested.deleted],
+                )
+            if not changed_paths:
+                if not ingested.deleted:
+                    logger.info(f"No changes detected for {repo_name}, using existing cached data")
+                cache_name = cache_stored_index(repo_name, gemini_api_key)
+            else:
+                yield repo_params_error, f"Processing {len(changed_paths)} changed files of '{repo_name}'..."
+                cache_name = update_repository_index(
                     repo_name,
-                    temp_source_dir,
                     target_repo_path,
+                    changed_paths,
+                    [],
                     gemini_api_key,
-                    openai_api_key=openai_api_key,
+                    openai_api_key,
                 )
-                
-                repo_params = {"repo_name": repo_name, "cache_id": cache_name}
-                logger.info(f"Generated repo_params for changed repository: {repo_params}")
-                final_message = f"Successfully processed and updated repository: {repo_name}\nSelect Custom Documentalist model."
-                yield repo_params, final_message
-                return
-            
-            # For a new repository, follow the normal process
-            # --- Logging before copy ---
-            try:
-                source_contents = list(temp_source_dir.rglob('*')) # Recursively list contents
-                logger.info(f"Contents of source dir '{temp_source_dir}' before copy: {len(source_contents)} items")
-                # Log first few items for glimpse
-                for item in source_contents[:5]:
-                    logger.debug(f"  - {item}")
-                if len(source_contents) > 5:
-                    logger.debug(f"  - ... and {len(source_contents) - 5} more")
-            except Exception as log_e:
-                logger.warning(f"Could not log source directory contents: {log_e}")
-
-            # Remove existing target directory if it exists to ensure fresh copy
-            if target_repo_path.exists():
-                logger.warning(f"Removing existing folder at target: {target_repo_path}")
-                shutil.rmtree(target_repo_path)
-
-            # Update status before copy
-            yield repo_params_error, f"Copying folder '{repo_name}'..."
-
-            # Copy the uploaded folder contents to the target path
-            # shutil.copytree is suitable for copying directories
-            shutil.copytree(temp_source_dir, target_repo_path)
-            logger.info(f"Successfully copied folder to {target_repo_path}")
-
-            # --- Logging after copy ---
-            try:
-                target_contents = list(target_repo_path.rglob('*')) # Recursively list contents
-                logger.info(f"Contents of target dir '{target_repo_path}' after copy: {len(target_contents)} items")
-                # Log first few items for glimpse
-                for item in target_contents[:5]:
-                    logger.debug(f"  - {item}")
-                if len(target_contents) > 5:
-                    logger.debug(f"  - ... and {len(target_contents) - 5} more")
-            except Exception as log_e:
-                logger.warning(f"Could not log target directory contents: {log_e}")
-
+            index_store.save_manifest(repo_name, ingested.manifest)
+            final_message = f"Successfully processed and updated repository: {repo_name}\nSelect Custom Documentalist model."
+        else:
             # Update status before processing
             yield repo_params_error, f"Processing folder '{repo_name}'... (this may take a while)"
-
-            # Now process the copied folder
             logger.info(f"Processing local folder: {target_repo_path}")
-            cache_name = process_local_folder(str(target_repo_path), gemini_api_key, openai_api_key)
-            logger.info(f"process_local_folder returned cache_name: {cache_name}")
-
-            repo_params = {"repo_name": repo_name, "cache_id": cache_name}
-            logger.info(f"Generated repo_params for local folder: {repo_params}")
+            cache_name = process_local_folder(str(target_repo_path), gemini_api_key, openai_api_key, ingested.manifest)
             final_message = f"Successfully processed local folder: {repo_name}\nSelect Custom Documentalist model."
-            yield repo_params, final_message
+
+        repo_params = {"repo_name": repo_name, "cache_id": cache_name}
+        logger.info(f"Generated repo_params for uploaded folder: {repo_params}")
+        yield repo_params, final_message
 
     except Exception as outer_e:
+        # The written files are not indexed: blank their hashes so that the next upload indexes them again
+        index_store.save_manifest(repo_name, {
+            relative_path: replace(entry, content_hash="") if relative_path in changed_paths else entry
+            for relative_path, entry in ingested.manifest.items()
+        })
         error_message = f"Error processing uploaded folder: {str(outer_e)}"
         logger.error(f"{error_message}\n{traceback.format_exc()}", exc_info=True)
         yield repo_params_error, error_message
 
 
+def process_zip_upload(uploaded_zip_file, gemini_api_key=None, openai_api_key=None, filename: Optional[str] = None) -> Tuple[dict, str]:
+    """
+    Run handle_zip_upload to completion.
+
+    Returns:
+        tuple: The last (repo_params, message) it yielded
+    """
+    outcome = ({"repo_name": "", "cache_id": ""}, "No folder uploaded or invalid data received.")
+    for outcome in handle_zip_upload(uploaded_zip_file, gemini_api_key, openai_api_key, filename):
+        logger.info(f"Zip upload: {outcome[1]}")
+    return outcome
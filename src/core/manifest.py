@@ -0,0 +1,133 @@
+import os
+import stat as stat_module
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.core.cpu_pool import get_cpu_pool
+
+logger = logging.getLogger(__name__)
+
+# Read size of the manifest hashing, large reads keep BLAKE2 busy instead of the syscalls
+MANIFEST_READ_BYTES = 1 << 20
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """Stat tuple and content hash of one file of a repository."""
+
+    size: int
+    mtime_ns: int
+    inode: int
+    content_hash: str
+
+    def same_stat(self, stat: os.stat_result) -> bool:
+        return (self.size, self.mtime_ns, self.inode) == (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def content_digest() -> "hashlib.blake2b":
+    """Hash object of the manifest content hashes, for content that is not read from a file."""
+    return hashlib.blake2b(digest_size=20)
+
+
+def hash_file_blake2(file_path: str) -> Optional[str]:
+    """BLAKE2b of a file on disk, None if it cannot be read."""
+    digest = content_digest()
+    try:
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(MANIFEST_READ_BYTES), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _stat_tree(root: Path) -> Dict[str, os.stat_result]:
+    """Stat of every regular file under root, by slash-separated relative path, .git excluded."""
+    stats = {}
+    for directory, directory_names, file_names in os.walk(root):
+        directory_names[:] = [name for name in directory_names if name != ".git"]
+        for file_name in file_names:
+            # The .git of a working tree created by git worktree is a file pointing to its mirror
+            if file_name == ".git":
+                continue
+            path = os.path.join(directory, file_name)
+            try:
+                stat = os.stat(path, follow_symlinks=False)
+            except OSError:
+                continue
+            if stat_module.S_ISREG(stat.st_mode):
+                stats[os.path.relpath(path, root).replace(os.sep, "/")] = stat
+    return stats
+
+
+def scan_tree(root: Path, previous: Optional[Dict[str, ManifestEntry]] = None) -> Dict[str, ManifestEntry]:
+    """
+    Manifest of a directory, hashing only the files whose stat tuple changed.
+
+    Files whose (size, mtime_ns, inode) matches their entry in previous keep its
+    hash; the others are hashed in parallel by the CPU pool workers.
+
+    Args:
+        root (Path): Directory to scan
+        previous (dict): Last manifest saved for this directory
+
+    Returns:
+        dict: ManifestEntry by slash-separated relative path
+    """
+    previous = previous or {}
+    stats = _stat_tree(Path(root))
+    manifest = {}
+    to_hash = []
+    for relative_path, stat in stats.items():
+        entry = previous.get(relative_path)
+        if entry is not None and entry.same_stat(stat):
+            manifest[relative_path] = entry
+        else:
+            to_hash.append(relative_path)
+
+    hashes = get_cpu_pool().map(hash_file_blake2, [os.path.join(root, path) for path in to_hash])
+    for relative_path, content_hash in zip(to_hash, hashes):
+        if content_hash is None:
+            continue
+        stat = stats[relative_path]
+        manifest[relative_path] = ManifestEntry(stat.st_size, stat.st_mtime_ns, stat.st_ino, content_hash)
+    logger.info(f"Scanned {root}: {len(stats)} files, {len(to_hash)} hashed")
+    return manifest
+
+
+def rebase_manifest(root: Path, manifest: Dict[str, ManifestEntry]) -> Dict[str, ManifestEntry]:
+    """
+    Manifest of a copy of a scanned directory, with the stat tuples of the copy.
+
+    The hashes of manifest are trusted, nothing is read: meant for a directory
+    that was just copied from the one manifest describes.
+    """
+    stats = _stat_tree(Path(root))
+    return {
+        relative_path: ManifestEntry(stat.st_size, stat.st_mtime_ns, stat.st_ino, manifest[relative_path].content_hash)
+        for relative_path, stat in stats.items()
+        if relative_path in manifest
+    }
+
+
+def diff_manifests(
+    old: Dict[str, ManifestEntry], new: Dict[str, ManifestEntry]
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Changed, added and deleted relative paths between two manifests, in one pass over each.
+
+    Returns:
+        Tuple of (changed, added, deleted) relative paths
+    """
+    changed, added = [], []
+    for relative_path, entry in new.items():
+        old_entry = old.get(relative_path)
+        if old_entry is None:
+            added.append(relative_path)
+        elif old_entry.content_hash != entry.content_hash:
+            changed.append(relative_path)
+    deleted = [relative_path for relative_path in old if relative_path not in new]
+    return changed, added, deleted
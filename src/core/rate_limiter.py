@@ -0,0 +1,270 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-model limits, written as "model_a=rpm:tpm,model_b=rpm:tpm" (0 disables a limit)
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+
+# Limits of the models missing from LLM_RATE_LIMITS
+LLM_DEFAULT_RPM = int(os.getenv("LLM_DEFAULT_RPM", "1000"))
+LLM_DEFAULT_TPM = int(os.getenv("LLM_DEFAULT_TPM", "2000000"))
+
+# Rough characters-per-token ratio used to estimate prompts before dispatch
+CHARS_PER_TOKEN = 4
+
+
+def parse_rate_limits(value: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse per-model limits written as "model_a=2000:4000000,model_b=500:300000".
+
+    Args:
+        value (str): Content of the LLM_RATE_LIMITS environment variable
+
+    Returns:
+        dict: (requests per minute, tokens per minute) per model name
+    """
+    limits = {}
+    for item in value.split(","):
+        model_name, _, limit = item.strip().partition("=")
+        rpm, _, tpm = limit.partition(":")
+        if model_name and rpm.strip().isdigit():
+            limits[model_name.strip()] = (int(rpm), int(tpm) if tpm.strip().isdigit() else 0)
+    return limits
+
+
+def estimate_request_tokens(prompt: Any, max_output_tokens: int = 0) -> int:
+    """
+    Estimate the tokens a request will count against the TPM limit.
+
+    The prompt is measured by its length; a quarter of max_output_tokens is
+    reserved for the completion and corrected once the real usage is known.
+    """
+    return len(str(prompt)) // CHARS_PER_TOKEN + max_output_tokens // 4 + 1
+
+
+def hash_api_key(api_key: Optional[str]) -> str:
+    """Short hash identifying a key in bucket keys and stats, the key itself is never stored."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+
+
+class TokenBucket:
+    """
+    Bucket refilled continuously up to capacity per minute.
+
+    Reservations are taken immediately and may overdraw the bucket: the caller
+    waits until the debt is repaid. Later callers queue behind earlier ones,
+    which keeps the dispatch order first come, first served.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take amount from the bucket and return the seconds to wait before using it."""
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        # A single request larger than the whole bucket waits for a full bucket, not forever
+        self.available -= min(amount, self.capacity)
+        return max(0.0, -self.available / self.rate)
+
+    def adjust(self, amount: float, now: float) -> None:
+        """Give back (negative amount) or charge extra tokens once the real usage is known."""
+        if not self.enabled:
+            return
+        self._refill(now)
+        self.available = min(self.capacity, self.available - amount)
+
+
+class Reservation:
+    """Capacity reserved for one request, settled with its real token usage."""
+
+    def __init__(self, limiter: "ModelRateLimit", estimated_tokens: int, wait: float):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.wait = wait
+        self._settled = False
+
+    def settle(self, actual_tokens: Optional[int]) -> None:
+        """Replace the estimate with the real usage of the request, kept when the usage is unknown."""
+        if self._settled or not actual_tokens:
+            return
+        self._settled = True
+        self.limiter.adjust(actual_tokens - self.estimated_tokens)
+
+    def refund(self) -> None:
+        """Give the whole reservation back, for a request that was never sent."""
+        if self._settled:
+            return
+        self._settled = True
+        self.limiter.adjust(-self.estimated_tokens, request_delta=-1)
+
+
+class ModelRateLimit:
+    """RPM and TPM buckets of one (provider, model, API key)."""
+
+    def __init__(self, provider: str, model_name: str, key_hash: str, rpm: int, tpm: int):
+        self.provider = provider
+        self.model_name = model_name
+        self.key_hash = key_hash
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.dispatched = 0
+        self.total_wait = 0.0
+
+    def reserve(self, estimated_tokens: int) -> Reservation:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(estimated_tokens, now))
+            self.dispatched += 1
+            self.total_wait += wait
+        return Reservation(self, estimated_tokens, wait)
+
+    def adjust(self, token_delta: int, request_delta: int = 0) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens.adjust(token_delta, now)
+            if request_delta:
+                self.requests.adjust(request_delta, now)
+
+    def _enter_queue(self, wait: float) -> bool:
+        if wait <= 0:
+            return False
+        with self._lock:
+            self.queued += 1
+        logger.info(f"Rate limit of {self.provider}/{self.model_name}: request queued for {wait:.2f}s")
+        return True
+
+    def _leave_queue(self) -> None:
+        with self._lock:
+            self.queued -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                "provider": self.provider,
+                "model": self.model_name,
+                "key": self.key_hash,
+                "rpm": int(self.requests.capacity),
+                "tpm": int(self.tokens.capacity),
+                "available_requests": round(self.requests.available, 1) if self.requests.enabled else None,
+                "available_tokens": int(self.tokens.available) if self.tokens.enabled else None,
+                "queued": self.queued,
+                "dispatched": self.dispatched,
+                "total_wait_seconds": round(self.total_wait, 2),
+            }
+
+
+class RateLimiter:
+    """
+    Process-wide registry of rate limits keyed by (provider, model, API key hash).
+
+    Callers reserve capacity before dispatching a request and sleep until it is
+    available, so concurrent indexing jobs and chat queries sharing a key queue
+    behind each other instead of failing on 429s.
+    """
+
+    def __init__(
+        self,
+        model_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        default_rpm: int = LLM_DEFAULT_RPM,
+        default_tpm: int = LLM_DEFAULT_TPM,
+    ):
+        self.model_limits = model_limits if model_limits is not None else parse_rate_limits(LLM_RATE_LIMITS)
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self._limits: Dict[Tuple[str, str, str], ModelRateLimit] = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, provider: str, model_name: str, api_key: Optional[str]) -> ModelRateLimit:
+        key = (provider, model_name, hash_api_key(api_key))
+        with self._lock:
+            if key not in self._limits:
+                rpm, tpm = self.model_limits.get(model_name, (self.default_rpm, self.default_tpm))
+                self._limits[key] = ModelRateLimit(provider, model_name, key[2], rpm, tpm)
+            return self._limits[key]
+
+    def acquire(self, provider: str, model_name: str, api_key: Optional[str], estimated_tokens: int) -> Reservation:
+        """
+        Reserve capacity for one request, blocking the calling thread until it is available.
+
+        Args:
+            provider (str): "gemini", "openai" or "anthropic"
+            model_name (str): Name of the model
+            api_key (str): Key the request is sent with, empty for the environment key
+            estimated_tokens (int): Estimate from estimate_request_tokens
+
+        Returns:
+            Reservation: To settle with the real token usage of the response
+        """
+        limit = self.limit_for(provider, model_name, api_key)
+        reservation = limit.reserve(estimated_tokens)
+        if limit._enter_queue(reservation.wait):
+            try:
+                time.sleep(reservation.wait)
+            finally:
+                limit._leave_queue()
+        return reservation
+
+    async def acquire_async(
+        self, provider: str, model_name: str, api_key: Optional[str], estimated_tokens: int
+    ) -> Reservation:
+        """Same as acquire, waiting without blocking the event loop."""
+        limit = self.limit_for(provider, model_name, api_key)
+        reservation = limit.reserve(estimated_tokens)
+        if limit._enter_queue(reservation.wait):
+            try:
+                await asyncio.sleep(reservation.wait)
+            except asyncio.CancelledError:
+                # Cancelled while queued (hedge loser, timeout): the request is never sent
+                reservation.refund()
+                raise
+            finally:
+                limit._leave_queue()
+        return reservation
+
+    def stats(self) -> Dict[str, Any]:
+        """Configured limits, remaining capacity and queue depth of every bucket, for monitoring."""
+        with self._lock:
+            limits = list(self._limits.values())
+        return {
+            "default_rpm": self.default_rpm,
+            "default_tpm": self.default_tpm,
+            "buckets": [limit.stats() for limit in limits],
+        }
+
+
+# Module-level singleton shared by every LLM call of the process
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Initialize and return the process-wide rate limiter."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+    return _rate_limiter
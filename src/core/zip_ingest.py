@@ -0,0 +1,192 @@
+import os
+import stat as stat_module
+import logging
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.core.manifest import MANIFEST_READ_BYTES, ManifestEntry, content_digest
+
+logger = logging.getLogger(__name__)
+
+# Members of an uploaded archive, directories included, above which the upload is rejected
+ZIP_MAX_ENTRIES = int(os.getenv("ZIP_MAX_ENTRIES", "200000"))
+
+# Uncompressed size of the kept files of an upload above which it is rejected
+ZIP_MAX_TOTAL_BYTES = int(os.getenv("ZIP_MAX_TOTAL_BYTES", str(4 << 30)))
+
+# Files larger than this are left out of an upload, nothing that big is worth indexing
+ZIP_MAX_FILE_BYTES = int(os.getenv("ZIP_MAX_FILE_BYTES", str(50 << 20)))
+
+# Compression ratio of a member above which the upload is rejected as a zip bomb
+ZIP_MAX_COMPRESSION_RATIO = int(os.getenv("ZIP_MAX_COMPRESSION_RATIO", "200"))
+
+# Metadata folders added by archivers, never part of the repository
+_ARCHIVER_FOLDERS = {"__MACOSX"}
+
+# Suffix of the files being written, renamed over their final path once the whole archive is read
+_PART_SUFFIX = ".zip-part"
+
+
+@dataclass
+class ZipIngestResult:
+    """Outcome of ingest_zip."""
+
+    # Manifest of the target tree after ingestion, usable to detect the changes of the next upload
+    manifest: Dict[str, ManifestEntry] = field(default_factory=dict)
+    changed: List[str] = field(default_factory=list)
+    added: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    skipped: int = 0
+
+
+def _member_parts(info: zipfile.ZipInfo) -> Tuple[str, ...]:
+    name = info.filename.replace("\\", "/")
+    if name.startswith("/") or (len(name) > 1 and name[1] == ":"):
+        raise ValueError(f"Zip file contains unsafe path: {info.filename}")
+    parts = tuple(part for part in name.split("/") if part and part != ".")
+    if ".." in parts:
+        raise ValueError(f"Zip file contains unsafe path: {info.filename}")
+    return parts
+
+
+def zip_root(archive: zipfile.ZipFile, default_name: str) -> Tuple[str, Optional[str]]:
+    """
+    Repository name of an archive, read from its central directory only.
+
+    Returns:
+        tuple: (repository name, top-level folder to strip from the member paths or None).
+        An archive holding a single top-level folder is named after it, any other
+        archive after default_name.
+    """
+    roots = set()
+    nested = True
+    for info in archive.infolist():
+        parts = _member_parts(info)
+        if not parts or parts[0] in _ARCHIVER_FOLDERS:
+            continue
+        roots.add(parts[0])
+        if len(parts) == 1 and not info.is_dir():
+            nested = False
+    if len(roots) == 1 and nested:
+        root = roots.pop()
+        return root, root
+    if not roots:
+        raise ValueError("Zip file is empty or contains unexpected structure.")
+    return default_name, None
+
+
+def _is_symlink(info: zipfile.ZipInfo) -> bool:
+    return stat_module.S_ISLNK(info.external_attr >> 16)
+
+
+def ingest_zip(
+    archive: zipfile.ZipFile,
+    root: Optional[str],
+    target_dir: Path,
+    previous: Optional[Dict[str, ManifestEntry]] = None,
+) -> ZipIngestResult:
+    """
+    Stream the members of an archive into a repository folder, in a single pass.
+
+    Members are read from the archive, hashed and written in the same loop,
+    without extracting the archive anywhere else. Paths the indexer ignores
+    (see indexer/discovery.py) are skipped before anything is written, and so
+    are symlinks and files over ZIP_MAX_FILE_BYTES. A file whose hash matches
+    previous is left in place. New contents go to temporary files, renamed over
+    their final path once the whole archive was read, so that a failing upload
+    leaves target_dir untouched. Files of previous absent from the archive are
+    deleted.
+
+    Args:
+        archive (ZipFile): Uploaded archive
+        root (str): Top-level folder stripped from the member paths (see zip_root)
+        target_dir (Path): Repository folder, created when missing
+        previous (dict): Manifest of target_dir, empty for a new repository
+
+    Returns:
+        ZipIngestResult: Manifest of target_dir and relative paths of the changes
+
+    Raises:
+        ValueError: If the archive has unsafe paths or exceeds the ZIP_MAX_* limits
+        zipfile.BadZipFile: If a member is corrupted
+    """
+    from indexer.discovery import RULE_FILES, DiscoveryConfig, NameMatcher
+
+    previous = previous or {}
+    matcher = NameMatcher(DiscoveryConfig.for_listing(include_md=True).ignore_patterns)
+    infos = archive.infolist()
+    if len(infos) > ZIP_MAX_ENTRIES:
+        raise ValueError(f"Zip file has {len(infos)} entries, the limit is {ZIP_MAX_ENTRIES}")
+
+    # Select the members from the central directory and check the limits before writing anything
+    result = ZipIngestResult()
+    # By relative path, a path repeated in the archive keeps its last member like extractall did
+    members: Dict[str, zipfile.ZipInfo] = {}
+    total_bytes = 0
+    for info in infos:
+        parts = _member_parts(info)
+        if root is not None:
+            parts = parts[1:] if parts[:1] == (root,) else ()
+        if not parts or info.is_dir():
+            continue
+        if (
+            parts[0] in _ARCHIVER_FOLDERS
+            or _is_symlink(info)
+            or any(matcher.matches(part) for part in parts[:-1])
+            or (matcher.matches(parts[-1]) and parts[-1] not in RULE_FILES)
+            or info.file_size > ZIP_MAX_FILE_BYTES
+        ):
+            result.skipped += 1
+            continue
+        if info.file_size > (1 << 20) and info.file_size > ZIP_MAX_COMPRESSION_RATIO * max(info.compress_size, 1):
+            raise ValueError(f"Zip file member {info.filename} has a suspicious compression ratio")
+        total_bytes += info.file_size
+        if total_bytes > ZIP_MAX_TOTAL_BYTES:
+            raise ValueError(f"Zip file content exceeds {ZIP_MAX_TOTAL_BYTES} bytes")
+        members["/".join(parts)] = info
+
+    target_dir = Path(target_dir)
+    written: List[Tuple[str, Path, str]] = []
+    try:
+        for relative_path, info in members.items():
+            final_path = target_dir / relative_path
+            part_path = final_path.with_name(final_path.name + _PART_SUFFIX)
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            digest = content_digest()
+            # zipfile stops at the declared size and checks the CRC, a lying header cannot write more
+            with archive.open(info) as source, open(part_path, "wb") as destination:
+                for chunk in iter(lambda: source.read(MANIFEST_READ_BYTES), b""):
+                    digest.update(chunk)
+                    destination.write(chunk)
+            content_hash = digest.hexdigest()
+            entry = previous.get(relative_path)
+            if entry is not None and entry.content_hash == content_hash:
+                part_path.unlink()
+                result.manifest[relative_path] = entry
+                continue
+            written.append((relative_path, part_path, content_hash))
+    except BaseException:
+        for relative_path in members:
+            final_path = target_dir / relative_path
+            final_path.with_name(final_path.name + _PART_SUFFIX).unlink(missing_ok=True)
+        raise
+
+    for relative_path, part_path, content_hash in written:
+        final_path = part_path.with_name(part_path.name[: -len(_PART_SUFFIX)])
+        os.replace(part_path, final_path)
+        stat = final_path.stat()
+        result.manifest[relative_path] = ManifestEntry(stat.st_size, stat.st_mtime_ns, stat.st_ino, content_hash)
+        (result.changed if relative_path in previous else result.added).append(relative_path)
+
+    for relative_path in previous:
+        if relative_path not in members:
+            (target_dir / relative_path).unlink(missing_ok=True)
+            result.deleted.append(relative_path)
+
+    logger.info(
+        f"Ingested {len(members)} files into {target_dir}: {len(result.changed)} changed, "
+        f"{len(result.added)} added, {len(result.deleted)} deleted, {result.skipped} skipped"
+    )
+    return result
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, ValidationInfo, model_validator
 from typing import List
 
 
@@ -19,71 +19,79 @@ class FileClassifaction(BaseModel):
     )
 
 
-def create_file_classification(
-    file_name_for_verification: List[str], scores
-) -> BaseModel:
+def file_classification_context(file_batch: List[dict], scores=None) -> dict:
     """
-    input :
-    file_name_for_verification  is used to check that all file are classified
+    Validation context of FileClassifications for one batch.
 
-    ouput :
-        A type FileClassifications which all constrain used to classify files
+    Args:
+        file_batch (list): Files of the batch, dicts with file_name and file_id
+        scores (list): Optional one-element counter incremented on each validation attempt
     """
+    return {
+        "original_files": {
+            (file_info["file_name"], file_info["file_id"]) for file_info in file_batch
+        },
+        "scores": scores,
+    }
 
-    class FileClassifications(BaseModel):
+
+class FileClassifications(BaseModel):
+    """
+    Model Used to classify files
+    """
+
+    file_classifications: List[FileClassifaction] = Field(
+        description="List of file classifications",
+        example=[
+            {"file_name": "example.pdf", "classification": "doc_file"},
+            {"file_name": "example.txt", "classification": "code_file"},
+        ],
+    )
+
+    @model_validator(mode="after")
+    def check_file_classification(self, info: ValidationInfo):
         """
-        Model Used to classify files
+        Check that all the files of the batch, given as "original_files" in the
+        validation context (see file_classification_context), are classified
+        and that no other file is. Without context, nothing is checked.
         """
-
-        file_classifications: List[FileClassifaction] = Field(
-            description="List of file classifications",
-            example=[
-                {"file_name": "example.pdf", "classification": "doc_file"},
-                {"file_name": "example.txt", "classification": "code_file"},
-            ],
-        )
-
-        @model_validator(mode="after")
-        def check_file_classification(cls, values):
-            scores[0] += 1
-
-            # Create sets of dictionaries for comparison
-            classified_files = {
-                (file_classification.file_name, file_classification.file_id)
-                for file_classification in values.file_classifications
-            }
-
-            original_files = {
-                (file_info["file_name"], file_info["file_id"])
-                for file_info in file_name_for_verification
-            }
-
-            # Find missing and hallucinated files
-            missing_files = original_files - classified_files
-            hallucinated_files = classified_files - original_files
-
-            # Prepare error message if needed
-            error_messages = []
-
-            if missing_files:
-                missing_files_str = ", ".join(
-                    f"(name: {name}, id: {id})" for name, id in missing_files
-                )
-                error_messages.append(
-                    f"All files must be classified, you forgot these files: {missing_files_str}"
-                )
-
-            if hallucinated_files:
-                hallucinated_files_str = ", ".join(
-                    f"(name: {name}, id: {id})" for name, id in hallucinated_files
-                )
-                error_messages.append(
-                    f"The original file names should be maintained, you hallucinated these files: {hallucinated_files_str}"
-                )
-
-            if error_messages:
-                raise ValueError(" ".join(error_messages))
-
-            return values
-
-    return FileClassifications
+        context = info.context or {}
+        if context.get("scores") is not None:
+            context["scores"][0] += 1
+        original_files = context.get("original_files")
+        if original_files is None:
+            return self
+
+        # Create sets of dictionaries for comparison
+        classified_files = {
+            (file_classification.file_name, file_classification.file_id)
+            for file_classification in self.file_classifications
+        }
+
+        # Find missing and hallucinated files
+        missing_files = original_files - classified_files
+        hallucinated_files = classified_files - original_files
+
+        # Prepare error message if needed
+        error_messages = []
+
+        if missing_files:
+            missing_files_str = ", ".join(
+                f"(name: {name}, id: {id})" for name, id in missing_files
+            )
+            error_messages.append(
+                f"All files must be classified, you forgot these files: {missing_files_str}"
+            )
+
+        if hallucinated_files:
+            hallucinated_files_str = ", ".join(
+                f"(name: {name}, id: {id})" for name, id in hallucinated_files
+            )
+            error_messages.append(
+                f"The original file names should be maintained, you hallucinated these files: {hallucinated_files_str}"
+            )
+
+        if error_messages:
+            raise ValueError(" ".join(error_messages))
+
+        return self
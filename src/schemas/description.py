@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field, model_validator
+import re
+from pydantic import BaseModel, Field, ValidationInfo, model_validator
 from typing import List, Dict, Optional, Any
 from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
@@ -35,159 +36,180 @@ class TemplateManager:
 
 
 
-def generate_code_structure_model_consize(code_text: str):
-    class FunctionInfo(BaseModel):
-        """
-        Represents information about a function
-        """
+# Identifiers of a source file, names given by the model are checked against this set
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
 
-        function_name: str = Field(
-            description="Name of the function", example="calculate_average"
-        )
-        function_description: str = Field(
-            description="Description of what the function does",
-            example="Calculate the average of a list of numbers",
-        )
 
-    class AttributeInfo(BaseModel):
-        """
-        Represents information about a class attribute
-        """
+def identifier_tokens(code_text: str) -> frozenset:
+    """
+    Tokenize a source file into the set of its identifiers, built once per file
+    so that name checks are set lookups instead of substring scans of the file.
+    """
+    return frozenset(IDENTIFIER_PATTERN.findall(code_text))
 
-        attribute_name: str = Field(
-            description="Name of the attribute", example="data_store"
-        )
-        attribute_description: str = Field(
-            description="Description of the attribute",
-            example="Stores processed data in memory",
-        )
 
-    class ClassInfo(BaseModel):
-        """
-        Represents information about a class including its attributes and methods
-        """
+def name_in_identifiers(name: str, identifiers: frozenset) -> bool:
+    """Whether every identifier of a (possibly dotted) name appears in the file."""
+    tokens = IDENTIFIER_PATTERN.findall(name)
+    return bool(tokens) and all(token in identifiers for token in tokens)
 
-        class_name: str = Field(description="Name of the class", example="DataStore")
-        class_description: str = Field(
-            description="Description of the class",
-            example="Handles data storage and retrieval",
-        )
-        attributes: List[AttributeInfo] = Field(
-            description="Attribus of the class",
-            example={
-                """
-                [
-                {
-                    "attribute_name": "data",
-                    "attribute_description": "Data storage for the class"
-                }
-                ]
-                """
-            },
-        )
-        functions_in_class: List[FunctionInfo] = Field(
-            description="Fonctions of the class",
-            example={
-                """
-                [
-                {
-                    "function_name": "calculate_average",
-                    "function_description": "Calculate the average of a list of numbers"
-                }
-                ]
-                """
-            },
-        )
 
-    def generate_code_structure_model(code_text: str) -> BaseModel:
-        """
-        Generates a Pydantic model based on the provided code text.
-        """
+def code_structure_context(code_text: str) -> Dict[str, Any]:
+    """Validation context of CodeStructure for one file."""
+    return {"identifiers": identifier_tokens(code_text)}
 
-        class CodeStructure(BaseModel):
+
+class FunctionInfo(BaseModel):
+    """
+    Represents information about a function
+    """
+
+    function_name: str = Field(
+        description="Name of the function", example="calculate_average"
+    )
+    function_description: str = Field(
+        description="Description of what the function does",
+        example="Calculate the average of a list of numbers",
+    )
+
+
+class AttributeInfo(BaseModel):
+    """
+    Represents information about a class attribute
+    """
+
+    attribute_name: str = Field(
+        description="Name of the attribute", example="data_store"
+    )
+    attribute_description: str = Field(
+        description="Description of the attribute",
+        example="Stores processed data in memory",
+    )
+
+
+class ClassInfo(BaseModel):
+    """
+    Represents information about a class including its attributes and methods
+    """
+
+    class_name: str = Field(description="Name of the class", example="DataStore")
+    class_description: str = Field(
+        description="Description of the class",
+        example="Handles data storage and retrieval",
+    )
+    attributes: List[AttributeInfo] = Field(
+        description="Attribus of the class",
+        example={
             """
-            Root model representing the entire code structure
+            [
+            {
+                "attribute_name": "data",
+                "attribute_description": "Data storage for the class"
+            }
+            ]
+            """
+        },
+    )
+    functions_in_class: List[FunctionInfo] = Field(
+        description="Fonctions of the class",
+        example={
             """
+            [
+            {
+                "function_name": "calculate_average",
+                "function_description": "Calculate the average of a list of numbers"
+            }
+            ]
+            """
+        },
+    )
 
-            global_code_description: str = Field(
-                description="Description of the entire code",
-                example="This code contains functions for mathematical operations",
-            )
-            functions_out_class: Optional[List[FunctionInfo]] = Field(
-                None,
-                description="List of functions not belonging to any class",
-                example=[
-                    """
-                [
-                    {
-                    "function_name": "calculate_sum",
-                    "function_description": "Calculate the sum of a list of numbers"
-                    }
-                ]
-                """
-                ],
-            )
-            classes: Optional[List[ClassInfo]] = Field(
-                None,
-                description="List of classes in the code",
-                example=[
-                    """
-                    [
+
+class CodeStructure(BaseModel):
+    """
+    Root model representing the entire code structure
+    """
+
+    global_code_description: str = Field(
+        description="Description of the entire code",
+        example="This code contains functions for mathematical operations",
+    )
+    functions_out_class: Optional[List[FunctionInfo]] = Field(
+        None,
+        description="List of functions not belonging to any class",
+        example=[
+            """
+        [
+            {
+            "function_name": "calculate_sum",
+            "function_description": "Calculate the sum of a list of numbers"
+            }
+        ]
+        """
+        ],
+    )
+    classes: Optional[List[ClassInfo]] = Field(
+        None,
+        description="List of classes in the code",
+        example=[
+            """
+            [
+                {
+                    "class_name": "DataStore",
+                    "class_description": "Handles data storage and retrieval",
+                    "attributes": [
+                        {
+                            "attribute_name": "data",
+                            "attribute_description": "Data storage for the class"
+                        }
+                    ],
+                    "functions_in_class": [
                         {
-                            "class_name": "DataStore",
-                            "class_description": "Handles data storage and retrieval",
-                            "attributes": [
-                                {
-                                    "attribute_name": "data",
-                                    "attribute_description": "Data storage for the class"
-                                }
-                            ],
-                            "functions_in_class": [
-                                {
-                                    "function_name": "calculate_average",
-                                    "function_description": "Calculate the average of a list of numbers"
-                                }
-                            ]
+                            "function_name": "calculate_average",
+                            "function_description": "Calculate the average of a list of numbers"
                         }
                     ]
-                    """
-                ],
-            )
-
-            @model_validator(mode="after")
-            def check_names_are_in_file(cls, values):
-                """
-                Ensure that all names mentioned in the model are present in the provided code text.
-                Accumulate all errors and raise them once if the accumlation string is not empty
-                """
-                errors = []
-                for function in values.functions_out_class:
-                    if function.function_name not in code_text:
-                        errors.append(
-                            f"Function {function.function_name} not found in code"
-                        )
-                for class_info in values.classes:
-                    if class_info.class_name not in code_text:
-                        errors.append(
-                            f"Class {class_info.class_name} not found in code"
-                        )
-                    for attribute in class_info.attributes:
-                        if attribute.attribute_name not in code_text:
-                            errors.append(
-                                f"Attribute {attribute.attribute_name} not found in code"
-                            )
-                    for function in class_info.functions_in_class:
-                        if function.function_name not in code_text:
-                            errors.append(
-                                f"Function {function.function_name} not found in code"
-                            )
-                if errors:
-                    raise ValueError("\n".join(errors))
-                return values
-
-        return CodeStructure
+                }
+            ]
+            """
+        ],
+    )
 
-    return generate_code_structure_model(code_text)
+    @model_validator(mode="after")
+    def check_names_are_in_file(self, info: ValidationInfo):
+        """
+        Ensure that all names mentioned in the model are present in the code text,
+        whose identifiers are given as "identifiers" in the validation context
+        (see code_structure_context). Without context, names are not checked.
+        Accumulate all errors and raise them once if the accumlation string is not empty
+        """
+        identifiers = (info.context or {}).get("identifiers")
+        if identifiers is None:
+            return self
+        errors = []
+        for function in self.functions_out_class or []:
+            if not name_in_identifiers(function.function_name, identifiers):
+                errors.append(
+                    f"Function {function.function_name} not found in code"
+                )
+        for class_info in self.classes or []:
+            if not name_in_identifiers(class_info.class_name, identifiers):
+                errors.append(
+                    f"Class {class_info.class_name} not found in code"
+                )
+            for attribute in class_info.attributes:
+                if not name_in_identifiers(attribute.attribute_name, identifiers):
+                    errors.append(
+                        f"Attribute {attribute.attribute_name} not found in code"
+                    )
+            for function in class_info.functions_in_class:
+                if not name_in_identifiers(function.function_name, identifiers):
+                    errors.append(
+                        f"Function {function.function_name} not found in code"
+                    )
+        if errors:
+            raise ValueError("\n".join(errors))
+        return self
 
 
 ##########################################################################################################################################################
@@ -474,3 +496,83 @@ class YamlBrief(BaseModel):
         default=[],
         description="List of key-value pairs not part of a distinct section",
     )
+
+
+##############################################################################
+#### describe the undocumented symbols of a python file
+
+
+def symbol_descriptions_context(symbol_names: List[str]) -> Dict[str, Any]:
+    """Validation context of SymbolDescriptions for one request."""
+    return {"symbol_names": list(symbol_names)}
+
+
+class SymbolDescription(BaseModel):
+    """
+    Description of one symbol of the file
+    """
+
+    symbol_name: str = Field(
+        description="Name of the symbol, exactly as given", example="DataStore.load"
+    )
+    description: str = Field(
+        description="One or two sentences describing what the symbol does",
+        example="Load the stored records from disk into memory",
+    )
+
+
+class SymbolDescriptions(BaseModel):
+    """
+    Descriptions of the undocumented symbols of a file
+    """
+
+    descriptions: List[SymbolDescription] = Field(
+        description="One description per requested symbol"
+    )
+
+    @model_validator(mode="after")
+    def check_all_symbols_described(self, info: ValidationInfo):
+        """
+        Ensure that every requested symbol (the "symbol_names" of the validation
+        context) is described and no other symbol is invented.
+        """
+        symbol_names = (info.context or {}).get("symbol_names")
+        if symbol_names is None:
+            return self
+        described = {description.symbol_name for description in self.descriptions}
+        errors = [f"Symbol {name} is not described" for name in symbol_names if name not in described]
+        errors += [f"Symbol {name} was not requested" for name in described if name not in symbol_names]
+        if errors:
+            raise ValueError("\n".join(errors))
+        return self
+
+
+##############################################################################
+#### summarize several small files in one request
+
+class PackedSummary(BaseModel):
+    """
+    Summary of one file of a packed request
+    """
+
+    file_path: str = Field(
+        description="Path of the file, exactly as written in its '# File:' header",
+        example="config/settings.yaml",
+    )
+    # Loosely typed: a malformed summary must not reject the other entries of the response
+    summary: Dict[str, Any] = Field(
+        description="Summary of this file alone, following the summary schema given in the prompt"
+    )
+
+
+class PackedSummaries(BaseModel):
+    """
+    Summaries of all the files of a packed request, one entry per file.
+    Each summary is validated on its own by the caller against the summary model
+    of the category (YamlBrief, DocumentCompression or CodeStructure), so that
+    only the invalid entries are summarized again.
+    """
+
+    summaries: List[PackedSummary] = Field(
+        description="One entry per file, in the order of the files"
+    )
@@ -1,52 +1,57 @@
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, ValidationInfo, model_validator
 from typing import List, Dict, Optional
 
 
-def get_necesary_files(documentation: dict) -> BaseModel:
-    class File(BaseModel):
-        file_name: str = Field(
-            description="The name of the file as it appears as file_name in the documentation",
-            examples=["main.py", "utils.py"],
-        )
-        file_id: str = Field(
-            description="The file id of the file as it appears as file_id in the documentation",
-            examples=["241", "54"],
-        )
+def necesary_files_context(documentation: dict) -> dict:
+    """
+    Validation context of ChosenFiles: the (file_name, file_id) pairs of the
+    documentation, built once per request so each chosen file is a set lookup.
+    """
+    return {
+        "documented_files": {
+            (doc_file.get("file_name"), str(doc_file.get("file_id")))
+            for doc_file in documentation.get("documentation") or []
+        }
+    }
 
-    class ChosenFiles(BaseModel):
-        justification: str = Field(
-            description="The reasoning behind choosing the files, explaining why they are relevant",
-        )
 
-        files_list: List[File] = Field(
-            description="The list of files that the user needs to look into to achieve their goal",
-            examples=[
-                [
-                    {"file_name": "main.py", "file_id": "241"},
-                    {"file_name": "utils.py", "file_id": "54"},
-                ]
-            ],
-        )
+class File(BaseModel):
+    file_name: str = Field(
+        description="The name of the file as it appears as file_name in the documentation",
+        examples=["main.py", "utils.py"],
+    )
+    file_id: str = Field(
+        description="The file id of the file as it appears as file_id in the documentation",
+        examples=["241", "54"],
+    )
+
+
+class ChosenFiles(BaseModel):
+    justification: str = Field(
+        description="The reasoning behind choosing the files, explaining why they are relevant",
+    )
+
+    files_list: List[File] = Field(
+        description="The list of files that the user needs to look into to achieve their goal",
+        examples=[
+            [
+                {"file_name": "main.py", "file_id": "241"},
+                {"file_name": "utils.py", "file_id": "54"},
+            ]
+        ],
+    )
 
-        @model_validator(mode="after")
-        def validate_files_list(cls, values):
-            """
-            checking that filename and file_id are in documentation["documentation"] file_list,
-            Accumulating all errors to raise them only once
-            """
-            print(values)
-            files_list = values.files_list
-            errors = []
-            documentation_files = documentation.get("documentation")
-            for file in files_list:
-                found = False
-                for doc_file in documentation_files:
-                    if file.file_name == doc_file.get(
-                        "file_name"
-                    ) and file.file_id == str(doc_file.get("file_id")):
-                        found = True
-                        break
-                if not found:
+    @model_validator(mode="after")
+    def validate_files_list(self, info: ValidationInfo):
+        """
+        checking that filename and file_id are in the "documented_files" of the validation
+        context (see necesary_files_context), Accumulating all errors to raise them only once
+        """
+        documented_files = (info.context or {}).get("documented_files")
+        errors = []
+        if documented_files is not None:
+            for file in self.files_list:
+                if (file.file_name, file.file_id) not in documented_files:
                     errors.append(
                         f"File {file.file_name} with id {file.file_id} not found in documentation. "
                     )
@@ -56,17 +61,15 @@ def get_necesary_files(documentation: dict) -> BaseModel:
                         )
                     )
 
-            # make sure the justification is present to
-            if not values.justification:
-                errors.append("Justification is required")
-
-            if errors:
-                raise ValueError(
-                    "\n".join(errors) + "correct all this errors. Respect the rules."
-                )
-            return values
+        # make sure the justification is present to
+        if not self.justification:
+            errors.append("Justification is required")
 
-    return ChosenFiles
+        if errors:
+            raise ValueError(
+                "\n".join(errors) + "correct all this errors. Respect the rules."
+            )
+        return self
 
 
 class GoalRewriteModel(BaseModel):